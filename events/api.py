@@ -6,25 +6,28 @@ import re
 import struct
 import time
 import urllib.parse
+from collections import OrderedDict
 from copy import deepcopy
 from datetime import datetime
 from datetime import time as datetime_time
 from datetime import timedelta
+from decimal import Decimal, InvalidOperation
 from functools import partial
+from itertools import chain
 
 import bleach
 import django_filters
 import pytz
 from django.contrib.gis.db import models as gis_models
 from django.conf import settings
-from django.contrib.postgres.search import TrigramSimilarity
-from django.core.cache import caches
-from django.core.exceptions import PermissionDenied
-from django.db.models import Q, QuerySet
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.core.exceptions import FieldDoesNotExist, PermissionDenied
+from django.db.models import F, Prefetch, Q, QuerySet
+from django.db.models.constants import LOOKUP_SEP
 from django.db.models.functions import Greatest
 from django.db.transaction import atomic
 from django.db.utils import IntegrityError
-from django.http import Http404, HttpResponsePermanentRedirect
+from django.http import Http404, HttpResponsePermanentRedirect, StreamingHttpResponse
 from django.urls import NoReverseMatch
 from django.utils import timezone, translation
 from django.utils.encoding import force_text
@@ -36,8 +39,10 @@ from modeltranslation.translator import NotRegistered, translator
 from munigeo.api import (GeoModelAPIView, geom_to_json,
                          build_bbox_filter, srid_to_srs, DEFAULT_SRS)
 from munigeo.models import AdministrativeDivision
+from psycopg2.extras import DateTimeTZRange
 from rest_framework import (filters, generics, mixins, permissions, relations,
                             serializers, status, viewsets)
+from rest_framework.decorators import action
 from rest_framework.exceptions import APIException, ParseError
 from rest_framework.exceptions import PermissionDenied as DRFPermissionDenied
 from rest_framework.fields import DateTimeField
@@ -51,18 +56,25 @@ from rest_framework.views import get_view_name as original_get_view_name
 from rest_framework_bulk import (BulkListSerializer, BulkModelViewSet,
                                  BulkSerializerMixin)
 
-from events import utils
-from events.api_pagination import LargeResultsSetPagination
+from events import dump, local_event_index, projection, utils
+from events.api_pagination import ChangeFeedPagination, EventPagination, LargeResultsSetPagination
 from events.auth import ExternalAuth, ApiKeyAuth, ApiKeyUser
+from events.conditional_requests import ConditionalListMixin
 from events.custom_elasticsearch_search_backend import \
     CustomEsSearchQuerySet as SearchQuerySet
 from events.extensions import (apply_select_and_prefetch,
                                get_extensions_from_request)
-from events.models import (PUBLICATION_STATUSES, DataSource, Event, EventLink,
+from events.models import (EVENT_COMPUTED_FIELDS, PUBLICATION_STATUSES, Change, DataSource, Event, EventLink,
                            Image, Keyword, KeywordSet, Language, License,
                            Offer, OpeningHoursSpecification, Place,
-                           PublicationStatus, Video)
-from events.renderers import DOCXRenderer
+                           PublicationStatus, Video, keyword_replacements)
+from events.organization_tree import OrganizationTreeResolver, tree_ranges_query
+from events.permissions import UserModelPermissionMixin
+from events.renderers import DOCXRenderer, NDJSONRenderer
+from events.response_cache import ResponseCacheMixin
+from events.signals import bulk_offer_writes
+from events.sql import (TEXT_SEARCH_CONFIGS, TRIGRAM_SIMILARITY_THRESHOLD, get_similar_keywords,
+                        trigram_similarity_threshold)
 from events.translation import EventTranslationOptions, PlaceTranslationOptions
 from helevents.models import User
 
@@ -169,27 +181,26 @@ def get_publisher_query(publisher):
     versa.
 
     :param publisher: a or a list of filtering organizations
-    :type publisher: str, Organization, list
+    :type publisher: str, Organization, list, QuerySet
     :return: the query that check both replaced and new organization
     """
-    if isinstance(publisher, list):
-        q = Q(
-            publisher__in=publisher,
-        ) | Q(
-            publisher__replaced_by__in=publisher,
-        ) | Q(
-            publisher__replaced_organization__in=publisher,
-        )
+    if isinstance(publisher, QuerySet):
+        publisher = publisher.values('pk')
     else:
-        q = Q(
-            publisher=publisher,
+        if not isinstance(publisher, list):
+            publisher = [publisher]
+        publisher = [getattr(org, 'pk', org) for org in publisher]
+    # the organizations are resolved in a subquery, so that the publisher is not joined
+    publishers = Organization.objects.filter(
+        Q(
+            id__in=publisher,
         ) | Q(
-            publisher__replaced_by=publisher,
+            replaced_by__in=publisher,
         ) | Q(
-            publisher__replaced_organization=publisher,
+            replaced_organization__in=publisher,
         )
-
-    return q
+    ).values('id')
+    return Q(publisher__in=publishers)
 
 
 def clean_text_fields(data, allowed_html_fields=[]):
@@ -229,6 +240,18 @@ def validate_hours(val, param):
     return hour, 0
 
 
+def validate_weekdays(val, param):
+    try:
+        weekdays = [int(weekday) for weekday in val]
+    except ValueError:
+        raise ParseError(f'Weekdays should be passed as numbers in {param}. For example: 1,2,3 for Monday to '
+                         'Wednesday.')
+    for weekday in weekdays:
+        if not (1 <= weekday <= 7):
+            raise ParseError(f'Weekdays should be between 1 (Monday) and 7 (Sunday) in {param}. You passed {weekday}.')
+    return weekdays
+
+
 def validate_bool(val, param):
     if val.lower() == 'true':
         return True
@@ -254,6 +277,9 @@ class JSONLDRelatedField(relations.HyperlinkedRelatedField):
         self.related_serializer = kwargs.pop('serializer', None)
         self.hide_ld_context = kwargs.pop('hide_ld_context', False)
         self.expanded = kwargs.pop('expanded', False)
+        self._expanded_serializer = None
+        # links by related object id, as the same objects are linked from many events
+        self._links = {}
         super(JSONLDRelatedField, self).__init__(*args, **kwargs)
 
     def use_pk_only_optimization(self):
@@ -267,19 +293,34 @@ class JSONLDRelatedField(relations.HyperlinkedRelatedField):
             self.related_serializer = globals().get(self.related_serializer, None)
 
         if self.is_expanded():
-            context = self.context.copy()
-            # To avoid infinite recursion, only include sub/super events one level at a time
-            if 'include' in context:
-                context['include'] = [x for x in context['include'] if x != 'sub_events' and x != 'super_event']
-            return self.related_serializer(obj, hide_ld_context=self.hide_ld_context,
-                                           context=context).data
-        link = super(JSONLDRelatedField, self).to_representation(obj)
+            serializer = self.get_expanded_serializer()
+            # the serializer represents the object as if it had been created for it
+            serializer.instance = obj
+            return serializer.to_representation(obj)
+        if obj.pk not in self._links:
+            self._links[obj.pk] = super(JSONLDRelatedField, self).to_representation(obj)
+        link = self._links[obj.pk]
         if link is None:
             return None
         return {
             '@id': link
         }
 
+    def get_expanded_serializer(self):
+        # a single serializer is used for all the objects expanded by the field, instead of creating
+        # a serializer with all its fields for each related object of each serialized object
+        if self._expanded_serializer is None:
+            context = self.context.copy()
+            # sparse fieldsets select the fields of the listed objects only
+            context.pop('fields', None)
+            context.pop('omit', None)
+            # To avoid infinite recursion, only include sub/super events one level at a time
+            if 'include' in context:
+                context['include'] = [x for x in context['include'] if x != 'sub_events' and x != 'super_event']
+            self._expanded_serializer = self.related_serializer(hide_ld_context=self.hide_ld_context,
+                                                                context=context)
+        return self._expanded_serializer
+
     def to_internal_value(self, value):
         # TODO: JA If @id is missing, this will complain just about value not being JSON
         if not isinstance(value, dict) or '@id' not in value:
@@ -346,32 +387,38 @@ class ISO8601DurationField(serializers.Field):
 
 
 class MPTTModelSerializer(serializers.ModelSerializer):
-    def __init__(self, *args, **kwargs):
-        super(MPTTModelSerializer, self).__init__(*args, **kwargs)
+    def get_fields(self):
+        fields = super(MPTTModelSerializer, self).get_fields()
         for field_name in 'lft', 'rght', 'tree_id', 'level':
-            if field_name in self.fields:
-                del self.fields[field_name]
+            if field_name in fields:
+                del fields[field_name]
+        return fields
+
+
+def get_translated_fields(model):
+    try:
+        trans_opts = translator.get_options_for_model(model)
+    except NotRegistered:
+        return ()
+    return tuple(trans_opts.fields.keys())
 
 
 class TranslatedModelSerializer(serializers.ModelSerializer):
     def __init__(self, *args, **kwargs):
         super(TranslatedModelSerializer, self).__init__(*args, **kwargs)
-        model = self.Meta.model
-        try:
-            trans_opts = translator.get_options_for_model(model)
-        except NotRegistered:
-            self.translated_fields = []
-            return
+        self.translated_fields = get_translated_fields(self.Meta.model)
 
-        self.translated_fields = trans_opts.fields.keys()
+    def get_fields(self):
+        fields = super(TranslatedModelSerializer, self).get_fields()
         lang_codes = utils.get_fixed_lang_codes()
         # Remove the pre-existing data in the bundle.
-        for field_name in self.translated_fields:
+        for field_name in get_translated_fields(self.Meta.model):
             for lang in lang_codes:
                 key = "%s_%s" % (field_name, lang)
-                if key in self.fields:
-                    del self.fields[key]
-            del self.fields[field_name]
+                if key in fields:
+                    del fields[key]
+            del fields[field_name]
+        return fields
 
     # def get_field(self, model_field):
     #     kwargs = {}
@@ -439,10 +486,15 @@ class TranslatedModelSerializer(serializers.ModelSerializer):
         
         return data
 
+    def get_lang_codes(self):
+        # the languages may be restricted for the whole response
+        return self.context.get('output_languages') or utils.get_fixed_lang_codes()
+
     def translated_fields_to_representation(self, obj, ret):
+        lang_codes = self.get_lang_codes()
         for field_name in self.translated_fields:
             d = {}
-            for lang in utils.get_fixed_lang_codes():
+            for lang in lang_codes:
                 key = "%s_%s" % (field_name, lang)
                 val = getattr(obj, key, None)
                 if val is None:
@@ -481,6 +533,15 @@ class LinkedEventsSerializer(TranslatedModelSerializer, MPTTModelSerializer):
     """
     system_generated_fields = ('created_time', 'last_modified_time', 'created_by', 'last_modified_by')
     only_admin_visible_fields = ('created_by', 'last_modified_by')
+    # fields needed to represent other fields, kept in sparse fieldsets along with them
+    sparse_field_dependencies = {}
+    # model fields read when representing the serializer fields, in addition to their sources
+    sparse_field_columns = {}
+    # model fields read when representing any object
+    required_columns = ()
+    # compiled field plans, i.e. the unbound fields of each serializer class, shared by all serializers
+    # and requests, as building the fields of model serializers is much slower than copying them
+    _field_plans = {}
 
     def __init__(self, instance=None, files=None,
                  context=None, partial=False, many=None, skip_fields=set(),
@@ -498,10 +559,17 @@ class LinkedEventsSerializer(TranslatedModelSerializer, MPTTModelSerializer):
             self.user = context['user']
         if 'admin_tree_ids' in context:
             self.admin_tree_ids = context['admin_tree_ids']
+        # permission context of the user, resolved once per request in the view
+        self.permission_context = context.get('permission_context')
 
         # by default, admin fields are skipped
         self.skip_fields = skip_fields | set(self.only_admin_visible_fields)
 
+        # sparse fieldsets drop the fields that are not displayed before anything is represented
+        self.omitted_sources = frozenset()
+        if context.get('fields') is not None or context.get('omit'):
+            self.select_fields(context.get('fields'), context.get('omit', frozenset()))
+
         if context is not None:
             # query allows non-skipped fields to be expanded
             include_fields = context.get('include', [])
@@ -540,6 +608,71 @@ class LinkedEventsSerializer(TranslatedModelSerializer, MPTTModelSerializer):
                 if not instance.is_user_editable():
                     raise PermissionDenied()
 
+    def select_fields(self, fields, omit):
+        """
+        Drop the fields not selected by a sparse fieldset. The id is always displayed.
+
+        :param fields: names of the displayed fields, or None to display all fields
+        :type fields: Iterable[str]|None
+        :param omit: names of the fields not displayed
+        :type omit: Iterable[str]
+        """
+        selected = {field_name for field_name in chain(self.fields, self.translated_fields)
+                    if field_name == 'id' or ((fields is None or field_name in fields) and field_name not in omit)}
+        for field_name, dependencies in self.sparse_field_dependencies.items():
+            if field_name in selected:
+                selected.update(dependencies)
+        omitted_sources = set()
+        for field_name in list(self.fields):
+            if field_name not in selected:
+                omitted_sources.add(self.fields[field_name].source.split('.')[0])
+                del self.fields[field_name]
+        omitted_sources -= {field.source.split('.')[0] for field in self.fields.values()}
+        self.omitted_sources = frozenset(omitted_sources)
+        self.translated_fields = tuple(field_name for field_name in self.translated_fields if field_name in selected)
+
+    def get_required_columns(self):
+        """
+        Get the names of the model fields read when representing objects with the fields of the serializer.
+        """
+        opts = self.Meta.model._meta
+        columns = {opts.pk.name}
+        columns.update(self.required_columns)
+        # the publisher decides the visibility of admin fields
+        if any(field.name == 'publisher' for field in opts.concrete_fields):
+            columns.add('publisher')
+        for field_name, field in self.fields.items():
+            columns.update(self.sparse_field_columns.get(field_name, ()))
+            try:
+                model_field = opts.get_field(field.source.split('.')[0])
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete and not model_field.many_to_many:
+                columns.add(model_field.name)
+        lang_codes = self.get_lang_codes()
+        for field_name in self.translated_fields:
+            columns.update('%s_%s' % (field_name, lang) for lang in lang_codes)
+        return columns
+
+    def get_field_plan_key(self):
+        context = self.context or {}
+        request = context.get('request')
+        extensions = tuple(ext.identifier for ext in context.get('extensions', ()))
+        return type(self), getattr(request, 'version', None), extensions
+
+    def compile_fields(self):
+        return super().get_fields()
+
+    def get_fields(self):
+        key = self.get_field_plan_key()
+        fields = self._field_plans.get(key)
+        if fields is None:
+            fields = self.compile_fields()
+            self._field_plans[key] = fields
+        # every serializer binds fields of its own. The expansion of the included fields does not survive
+        # copying the fields, so it is done in __init__
+        return deepcopy(fields)
+
     def to_internal_value(self, data):
         for field in self.system_generated_fields:
             if field in data:
@@ -619,15 +752,22 @@ class LinkedEventsSerializer(TranslatedModelSerializer, MPTTModelSerializer):
                         {'given': str(value), 'data_source': self.data_source}})
         return value
 
+    def _may_publish_as(self, organization):
+        # users may publish as their admin organizations, their descendants and member organizations,
+        # and as the organizations replacing any of them
+        permission_context = self.permission_context or self.user.get_permission_context()
+
+        def allowed(org):
+            return permission_context.is_admin(org) or permission_context.is_member(org)
+        if allowed(organization):
+            return True
+        replaced = Organization.objects.filter(replaced_by=organization).first()
+        return replaced is not None and allowed(replaced)
+
     def validate_publisher(self, value):
         # a single POST always comes from a single source
         if value and self.method == 'POST':
-            if value not in (set(self.user.get_admin_organizations_and_descendants())
-                             | set(map(lambda x: getattr(x, 'replaced_by'),
-                                   self.user.get_admin_organizations_and_descendants()))
-                             | set(self.user.organization_memberships.all())
-                             | set(map(lambda x: getattr(x, 'replaced_by'),
-                                   self.user.organization_memberships.all()))):
+            if not self._may_publish_as(value):
                 raise serializers.ValidationError(
                     {'publisher': _(
                         "Setting publisher to %(given)s " +
@@ -701,16 +841,22 @@ class JSONAPIViewMixin(object):
             if u'\x00' in param:
                 raise ParseError("A string literal cannot contain NUL (0x00) characters. "
                                  "Please fix query parameter " + param)
+        # the user object may be reused across requests, e.g. in tests, so permissions are cached for a request only
+        if isinstance(request.user, UserModelPermissionMixin):
+            request.user.clear_permission_cache()
         return ret
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        # user admin ids must be injected to the context for nested serializers, to avoid duplicating work
+        # user permissions must be injected to the context for nested serializers, to avoid duplicating work
         user = context['request'].user
-        admin_tree_ids = set()
+        permission_context = None
+        admin_tree_ids = frozenset()
         if user and user.is_authenticated:
-            admin_tree_ids = user.get_admin_tree_ids()
+            permission_context = user.get_permission_context()
+            admin_tree_ids = permission_context.admin_tree_ids
         context['user'] = user
+        context['permission_context'] = permission_context
         context['admin_tree_ids'] = admin_tree_ids
         include = self.request.query_params.get('include', '')
         context['include'] = [x.strip() for x in include.split(',') if x]
@@ -719,6 +865,218 @@ class JSONAPIViewMixin(object):
         return context
 
 
+def _parse_field_names(value):
+    names = frozenset(name.strip() for name in value.split(',') if name.strip())
+    return names or None
+
+
+class SparseFieldsetMixin(object):
+    """
+    View mixin selecting the displayed fields of the objects with the fields and omit parameters.
+
+    The fields that are not displayed are dropped from the serializer, the related objects they
+    display are not prefetched, and the columns only they need are not read from the database.
+    """
+    def get_sparse_fieldset(self):
+        """
+        Get the fields and omit parameters of the request.
+
+        :return: names of the displayed fields, or None for all fields, and names of the omitted fields
+        :rtype: tuple[frozenset|None, frozenset]
+        """
+        # the docx renderer needs all the fields
+        if self.request.method not in SAFE_METHODS or self.request.accepted_renderer.format == 'docx':
+            return None, frozenset()
+        fields = _parse_field_names(self.request.query_params.get('fields', ''))
+        omit = _parse_field_names(self.request.query_params.get('omit', '')) or frozenset()
+        return fields, omit
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'], context['omit'] = self.get_sparse_fieldset()
+        return context
+
+    def get_sparse_serializer(self):
+        if getattr(self, '_sparse_serializer', None) is None:
+            self._sparse_serializer = self.get_serializer()
+        return self._sparse_serializer
+
+    def get_omitted_sources(self):
+        """Get the names of the model fields and relations displayed by the omitted fields only."""
+        fields, omit = self.get_sparse_fieldset()
+        if fields is None and not omit:
+            return frozenset()
+        return self.get_sparse_serializer().omitted_sources
+
+    def apply_sparse_fieldset(self, queryset):
+        """
+        Restrict the columns and related objects fetched by the queryset to those needed by the sparse fieldset.
+        """
+        fields, omit = self.get_sparse_fieldset()
+        if fields is None and not omit:
+            return queryset
+        serializer = self.get_sparse_serializer()
+        opts = queryset.model._meta
+        columns = serializer.get_required_columns()
+        # keyset pagination reads the ordering fields of the objects
+        for name in queryset.query.order_by:
+            try:
+                field = opts.get_field(str(name).lstrip('-'))
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.many_to_many:
+                columns.add(field.name)
+
+        def needed(lookup):
+            root = lookup.split(LOOKUP_SEP)[0]
+            if root in serializer.omitted_sources:
+                return False
+            try:
+                field = opts.get_field(root)
+            except FieldDoesNotExist:
+                return True
+            # deferred foreign keys cannot be followed with select_related
+            return not (field.concrete and field.many_to_one) or field.name in columns
+
+        prefetches = [lookup for lookup in queryset._prefetch_related_lookups
+                      if needed(lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup)]
+        queryset = queryset.prefetch_related(None).prefetch_related(*prefetches)
+        if isinstance(queryset.query.select_related, dict):
+            related = [lookup for lookup in _select_related_lookups(queryset.query.select_related) if needed(lookup)]
+            queryset = queryset.select_related(None).select_related(*related)
+        return queryset.only(*columns)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            queryset = self.apply_sparse_fieldset(queryset)
+        return queryset
+
+
+class OutputLanguageMixin(object):
+    """
+    View mixin restricting the translated fields of the response to the languages given in the
+    output_language parameter.
+
+    The translation columns of the other languages are not read from the database for lists.
+    """
+    def get_output_languages(self):
+        """
+        Get the languages of the output_language parameter as translation field suffixes.
+
+        :return: language codes, or None if all languages are displayed
+        :rtype: tuple[str]|None
+        """
+        value = self.request.query_params.get('output_language', '')
+        # the docx renderer needs all the languages
+        if not value or self.request.accepted_renderer.format == 'docx':
+            return None
+        lang_codes = utils.get_fixed_lang_codes()
+        languages = []
+        for language in value.split(','):
+            language = language.strip().lower().replace('-', '_')
+            if language not in lang_codes:
+                raise ParseError(_('output_language must be one of %(languages)s.') %
+                                 {'languages': ', '.join(lang_codes)})
+            if language not in languages:
+                languages.append(language)
+        return tuple(languages)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['output_languages'] = self.get_output_languages()
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        languages = self.get_output_languages()
+        if self.action == 'list' and languages:
+            other_languages = [lang for lang in utils.get_fixed_lang_codes() if lang not in languages]
+            queryset = queryset.defer(*['%s_%s' % (field_name, lang)
+                                        for field_name in get_translated_fields(queryset.model)
+                                        for lang in other_languages])
+        return queryset
+
+
+class StreamingListMixin(object):
+    """
+    View mixin streaming list responses with stream=true, for large pages.
+
+    The page is paginated as objects with their ordering fields only. The objects of the page are
+    then fetched with their related objects, serialized and encoded a chunk at a time as the
+    response is consumed, so the memory used does not grow with the page size. An error while
+    streaming truncates the response, as its status has already been sent.
+    """
+    stream_query_param = 'stream'
+
+    def is_stream_requested(self):
+        value = self.request.query_params.get(self.stream_query_param)
+        return (bool(value) and validate_bool(value, self.stream_query_param) and
+                hasattr(self.request.accepted_renderer, 'render_stream'))
+
+    def get_stream_chunk(self, queryset):
+        """Fetch a chunk of the streamed objects from the given queryset, along with their related objects."""
+        return list(queryset)
+
+    def iter_stream_representations(self, queryset, pks):
+        serializer = self.get_serializer([], many=True).child
+        chunk_size = getattr(settings, 'STREAM_CHUNK_SIZE', 100)
+        for start in range(0, len(pks), chunk_size):
+            chunk_pks = pks[start:start + chunk_size]
+            objects = {obj.pk: obj for obj in self.get_stream_chunk(queryset.filter(pk__in=chunk_pks))}
+            for pk in chunk_pks:
+                if pk in objects:
+                    yield serializer.to_representation(objects[pk])
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_stream_requested():
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = {queryset.model._meta.pk.name}
+        for name in queryset.query.order_by:
+            try:
+                field = queryset.model._meta.get_field(str(name).lstrip('-'))
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.many_to_many:
+                columns.add(field.name)
+        page = self.paginate_queryset(queryset.select_related(None).prefetch_related(None).only(*columns))
+        meta = None
+        if page is None:
+            pks = list(queryset.values_list('pk', flat=True))
+        else:
+            pks = [obj.pk for obj in page]
+            meta = self.get_paginated_response([]).data['meta']
+        renderer = request.accepted_renderer
+        renderer_context = self.get_renderer_context()
+        content = renderer.render_stream(self.iter_stream_representations(queryset, pks), meta,
+                                         request.accepted_media_type, renderer_context)
+        content_type = '%s; charset=%s' % (request.accepted_media_type, renderer.charset)
+        return StreamingHttpResponse(content, content_type=content_type)
+
+
+class BulkDumpMixin(object):
+    """
+    View mixin adding the dump route, which streams all the objects matching the list filters
+    as newline-delimited JSON, in one response instead of pages.
+    """
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer])
+    def dump(self, request, *args, **kwargs):
+        # primary key order keeps consecutive dumps comparable
+        queryset = self.filter_queryset(self.get_queryset()).order_by('pk')
+        serializer = self.get_serializer([], many=True).child
+        objects = dump.iter_objects(queryset, getattr(settings, 'STREAM_CHUNK_SIZE', 100))
+        return dump.get_response(request, dump.iter_lines(objects, serializer))
+
+
+def _select_related_lookups(select_related, prefix=''):
+    lookups = []
+    for name, nested in select_related.items():
+        lookups.append(prefix + name)
+        lookups += _select_related_lookups(nested, prefix + name + LOOKUP_SEP)
+    return lookups
+
+
 class EditableLinkedEventsObjectSerializer(LinkedEventsSerializer):
 
     def create(self, validated_data):
@@ -799,6 +1157,7 @@ class KeywordSerializer(EditableLinkedEventsObjectSerializer):
 
 
 class KeywordRetrieveViewSet(JSONAPIViewMixin,
+                             OutputLanguageMixin,
                              mixins.RetrieveModelMixin,
                              mixins.UpdateModelMixin,
                              mixins.DestroyModelMixin,
@@ -854,16 +1213,25 @@ class KeywordDeprecatedException(APIException):
     default_code = 'gone'
 
 
-class KeywordListViewSet(JSONAPIViewMixin,
+class KeywordListViewSet(ConditionalListMixin,
+                         ResponseCacheMixin,
+                         StreamingListMixin,
+                         BulkDumpMixin,
+                         JSONAPIViewMixin,
+                         SparseFieldsetMixin,
+                         OutputLanguageMixin,
                          mixins.ListModelMixin,
                          mixins.CreateModelMixin,
                          viewsets.GenericViewSet):
     queryset = Keyword.objects.all()
     queryset = queryset.select_related('publisher').prefetch_related('alt_labels__name')
     serializer_class = KeywordSerializer
+    response_cache_dependencies = ('keyword',)
     filter_backends = (filters.OrderingFilter,)
     ordering_fields = ('n_events', 'id', 'name', 'data_source')
     ordering = ('-data_source', '-n_events', 'name')
+    # free_text only returns the most similar keywords, so that the candidates are a bounded list of ids
+    free_text_max_results = 1000
 
     def get_queryset(self):
         """
@@ -892,8 +1260,18 @@ class KeywordListViewSet(JSONAPIViewMixin,
             val = self.request.query_params.get('free_text')
             # no need to search English if there are accented letters
             langs = ['fi', 'sv'] if re.search('[\u00C0-\u00FF]', val) else ['fi', 'sv', 'en']
+            # the candidates are retrieved from the trigram indexes with the % operator before ranking them.
+            # the most similar ones are fetched right away, as the threshold of the operator only lasts for the
+            # transaction
+            candidates = Q()
+            for lang in langs:
+                candidates |= Q(**{f'name_{lang}__trigram_similar': val})
             tri = [TrigramSimilarity(f'name_{i}', val) for i in langs]
-            queryset = queryset.annotate(simile=Greatest(*tri)).filter(simile__gt=0.2)
+            with trigram_similarity_threshold():
+                candidate_ids = list(queryset.filter(candidates).annotate(simile=Greatest(*tri)).filter(
+                    simile__gt=TRIGRAM_SIMILARITY_THRESHOLD).order_by('-simile', 'id').values_list(
+                    'id', flat=True)[:self.free_text_max_results])
+            queryset = queryset.filter(id__in=candidate_ids).annotate(simile=Greatest(*tri))
             self.ordering_fields = ('simile', *self.ordering_fields)
             self.ordering = ('-simile', *self.ordering)
         else:
@@ -912,8 +1290,9 @@ class KeywordListViewSet(JSONAPIViewMixin,
         return queryset
 
 
-register_view(KeywordRetrieveViewSet, 'keyword')
+# the list routes, such as keyword/dump/, are registered before the detail route matching any id
 register_view(KeywordListViewSet, 'keyword')
+register_view(KeywordRetrieveViewSet, 'keyword')
 
 
 class KeywordSetSerializer(EditableLinkedEventsObjectSerializer):
@@ -1024,9 +1403,10 @@ def filter_division(queryset, name, value):
             # we assume human name
             names.append(item.title())
     if hasattr(queryset, 'distinct'):
-        # do the join with Q objects (not querysets) in case the queryset has extra fields that would crash qs join
+        # do the join with Q objects (not querysets) in case the queryset has extra fields that would crash qs join.
+        # The join is done in a semi-join subquery, so that the objects need not be made distinct
         query = Q(**{name + '__ocd_id__in': ocd_ids}) | Q(**{name + '__name__in': names})
-        return (queryset.filter(query)).distinct()
+        return queryset.filter(pk__in=queryset.model._default_manager.filter(query).values('pk'))
     else:
         # Haystack SearchQuerySet does not support distinct, so we only support one type of search at a time:
         if ocd_ids:
@@ -1071,6 +1451,8 @@ class PlaceSerializer(EditableLinkedEventsObjectSerializer):
                 continue
             geo_fields.append(field_name)
         for field_name in geo_fields:
+            if field_name not in ret:
+                continue
             val = getattr(obj, field_name)
             if val is None:
                 ret[field_name] = None
@@ -1097,6 +1479,7 @@ class PlaceFilter(django_filters.rest_framework.FilterSet):
 
 
 class PlaceRetrieveViewSet(JSONAPIViewMixin,
+                           OutputLanguageMixin,
                            GeoModelAPIView,
                            mixins.RetrieveModelMixin,
                            mixins.UpdateModelMixin,
@@ -1158,14 +1541,21 @@ class PlaceDeletedException(APIException):
     default_code = 'gone'
 
 
-class PlaceListViewSet(GeoModelAPIView,
+class PlaceListViewSet(ConditionalListMixin,
+                       ResponseCacheMixin,
+                       StreamingListMixin,
+                       BulkDumpMixin,
+                       GeoModelAPIView,
                        JSONAPIViewMixin,
+                       SparseFieldsetMixin,
+                       OutputLanguageMixin,
                        mixins.ListModelMixin,
                        mixins.CreateModelMixin,
                        viewsets.GenericViewSet):
     queryset = Place.objects.all()
     queryset = queryset.select_related('publisher')
     serializer_class = PlaceSerializer
+    response_cache_dependencies = ('place',)
     filter_backends = (django_filters.rest_framework.DjangoFilterBackend, filters.OrderingFilter)
     filterset_class = PlaceFilter
     ordering_fields = ('n_events', 'id', 'name', 'data_source', 'street_address', 'postal_code')
@@ -1210,8 +1600,9 @@ class PlaceListViewSet(GeoModelAPIView,
         return queryset
 
 
-register_view(PlaceRetrieveViewSet, 'place')
+# the list routes, such as place/dump/, are registered before the detail route matching any id
 register_view(PlaceListViewSet, 'place')
+register_view(PlaceRetrieveViewSet, 'place')
 
 
 class OpeningHoursSpecificationSerializer(LinkedEventsSerializer):
@@ -1334,6 +1725,7 @@ class OfferSerializer(TranslatedModelSerializer):
 
 class ImageSerializer(EditableLinkedEventsObjectSerializer):
     view_name = 'image-detail'
+    sparse_field_dependencies = {'url': ('image',)}
     license = serializers.PrimaryKeyRelatedField(queryset=License.objects.all(), required=False)
     created_time = DateTimeField(default_timezone=pytz.UTC, required=False, allow_null=True)
     last_modified_time = DateTimeField(default_timezone=pytz.UTC, required=False, allow_null=True)
@@ -1352,9 +1744,9 @@ class ImageSerializer(EditableLinkedEventsObjectSerializer):
     def to_representation(self, obj):
         # the url field is customized based on image and url
         representation = super().to_representation(obj)
-        if representation['image']:
-            representation['url'] = representation['image']
-        representation.pop('image')
+        image = representation.pop('image', None)
+        if image and 'url' in representation:
+            representation['url'] = image
         return representation
 
     def validate(self, data):
@@ -1368,7 +1760,7 @@ class ImageSerializer(EditableLinkedEventsObjectSerializer):
         return data
 
 
-class ImageViewSet(JSONAPIViewMixin, viewsets.ModelViewSet):
+class ImageViewSet(StreamingListMixin, JSONAPIViewMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Image.objects.all()
     queryset = queryset.select_related('publisher')
     serializer_class = ImageSerializer
@@ -1423,6 +1815,20 @@ class VideoSerializer(serializers.ModelSerializer):
         exclude = ['id', 'event']
 
 
+def _format_date_only_times(event, data):
+    # only the times present in the data are formatted, the others may not even be fetched
+    if 'start_time' in data and event.start_time and not event.has_start_time:
+        # Return only the date part
+        data['start_time'] = event.start_time.astimezone(LOCAL_TZ).strftime('%Y-%m-%d')
+    if 'end_time' in data and event.end_time and not event.has_end_time:
+        # If we're storing only the date part, do not pretend we have the exact time.
+        # Timestamp is of the form %Y-%m-%dT00:00:00, so we report the previous date.
+        data['end_time'] = (event.end_time - timedelta(days=1)).astimezone(LOCAL_TZ).strftime('%Y-%m-%d')
+        # Unless the event is short, then no need for end time
+        if event.start_time and event.end_time - event.start_time <= timedelta(days=1):
+            data['end_time'] = None
+
+
 class EventSerializer(BulkSerializerMixin, EditableLinkedEventsObjectSerializer, GeoModelAPIView):
     id = serializers.CharField(required=False)
     location = JSONLDRelatedField(serializer=PlaceSerializer, required=False, allow_null=True,
@@ -1454,6 +1860,11 @@ class EventSerializer(BulkSerializerMixin, EditableLinkedEventsObjectSerializer,
 
     view_name = 'event-detail'
     fields_needed_to_publish = ('keywords', 'location', 'start_time', 'short_description', 'description')
+    sparse_field_columns = {
+        'start_time': ('has_start_time',),
+        'end_time': ('has_end_time', 'start_time'),
+    }
+    required_columns = ('deleted',)
     created_time = DateTimeField(default_timezone=pytz.UTC, required=False, allow_null=True)
     last_modified_time = DateTimeField(default_timezone=pytz.UTC, required=False, allow_null=True)
     date_published = DateTimeField(default_timezone=pytz.UTC, required=False, allow_null=True)
@@ -1468,9 +1879,11 @@ class EventSerializer(BulkSerializerMixin, EditableLinkedEventsObjectSerializer,
         # testing and debugging.
         self.skip_empties = skip_empties
 
-        if self.context:
-            for ext in self.context.get('extensions', ()):
-                self.fields['extension_{}'.format(ext.identifier)] = ext.get_extension_serializer()
+    def compile_fields(self):
+        fields = super().compile_fields()
+        for ext in (self.context or {}).get('extensions', ()):
+            fields['extension_{}'.format(ext.identifier)] = ext.get_extension_serializer()
+        return fields
 
     def parse_datetimes(self, data):
         # here, we also set has_start_time and has_end_time accordingly
@@ -1599,8 +2012,9 @@ class EventSerializer(BulkSerializerMixin, EditableLinkedEventsObjectSerializer,
         event = super().create(validated_data)
 
         # create and add related objects
-        for offer in offers:
-            Offer.objects.create(event=event, **offer)
+        with bulk_offer_writes(event):
+            for offer in offers:
+                Offer.objects.create(event=event, **offer)
         for link in links:
             EventLink.objects.create(event=event, **link)
         for video in videos:
@@ -1665,9 +2079,10 @@ class EventSerializer(BulkSerializerMixin, EditableLinkedEventsObjectSerializer,
 
         # update offers
         if isinstance(offers, list):
-            instance.offers.all().delete()
-            for offer in offers:
-                Offer.objects.create(event=instance, **offer)
+            with bulk_offer_writes(instance):
+                instance.offers.all().delete()
+                for offer in offers:
+                    Offer.objects.create(event=instance, **offer)
 
         # update ext links
         if isinstance(links, list):
@@ -1704,18 +2119,9 @@ class EventSerializer(BulkSerializerMixin, EditableLinkedEventsObjectSerializer,
             ret['start_time_obj'] = obj.start_time
             ret['location'] = obj.location
 
-        if obj.start_time and not obj.has_start_time:
-            # Return only the date part
-            ret['start_time'] = obj.start_time.astimezone(LOCAL_TZ).strftime('%Y-%m-%d')
-        if obj.end_time and not obj.has_end_time:
-            # If we're storing only the date part, do not pretend we have the exact time.
-            # Timestamp is of the form %Y-%m-%dT00:00:00, so we report the previous date.
-            ret['end_time'] = (obj.end_time - timedelta(days=1)).astimezone(LOCAL_TZ).strftime('%Y-%m-%d')
-            # Unless the event is short, then no need for end time
-            if obj.start_time and obj.end_time - obj.start_time <= timedelta(days=1):
-                ret['end_time'] = None
-        del ret['has_start_time']
-        del ret['has_end_time']
+        _format_date_only_times(obj, ret)
+        ret.pop('has_start_time', None)
+        ret.pop('has_end_time', None)
         if hasattr(obj, 'days_left'):
             ret['days_left'] = int(obj.days_left)
         if self.skip_empties:
@@ -1730,20 +2136,41 @@ class EventSerializer(BulkSerializerMixin, EditableLinkedEventsObjectSerializer,
         request = self.context.get('request')
         if request:
             if not request.user.is_authenticated:
-                del ret['publication_status']
+                ret.pop('publication_status', None)
 
-        if ret['sub_events']:
-            sub_events_relation = self.fields['sub_events'].child_relation
-            undeleted_sub_events = []
-            for sub_event in obj.sub_events.filter(deleted=False):
-                undeleted_sub_events.append(sub_events_relation.to_representation(sub_event))
-            ret['sub_events'] = undeleted_sub_events
+        if ret.get('sub_events'):
+            ret['sub_events'] = self.get_sub_events_representation(obj, ret['sub_events'])
 
         return ret
 
+    def get_sub_events_representation(self, obj, sub_events_data):
+        sub_events_relation = self.fields['sub_events'].child_relation
+        summary = self.context.get('sub_events_summary', False) and not sub_events_relation.is_expanded()
+        prefetched = 'sub_events' in getattr(obj, '_prefetched_objects_cache', {})
+        if prefetched and not summary:
+            # the view prefetches undeleted sub events only
+            return sub_events_data
+        if prefetched:
+            sub_events = obj.sub_events.all()
+        else:
+            sub_events = obj.sub_events.filter(deleted=False)
+
+        # the times of the sub events are displayed even if the times of the event are not
+        time_field = DateTimeField(default_timezone=pytz.UTC)
+        undeleted_sub_events = []
+        for sub_event in sub_events:
+            data = sub_events_relation.to_representation(sub_event)
+            if summary:
+                data['id'] = sub_event.id
+                data['start_time'] = time_field.to_representation(sub_event.start_time)
+                data['end_time'] = time_field.to_representation(sub_event.end_time)
+                _format_date_only_times(sub_event, data)
+            undeleted_sub_events.append(data)
+        return undeleted_sub_events
+
     class Meta:
         model = Event
-        exclude = ()
+        exclude = EVENT_COMPUTED_FIELDS
         list_serializer_class = BulkListSerializer
 
 
@@ -1763,6 +2190,14 @@ class EventSerializerV0_1(EventSerializer):
         kwargs.setdefault('context', {}).setdefault('include', []).append('image')
         super(EventSerializerV0_1, self).__init__(*args, **kwargs)
 
+    def select_fields(self, fields, omit):
+        # the image is represented from the images
+        if fields is not None and 'image' in fields:
+            fields = fields | {'images'}
+        if 'image' in omit:
+            omit = omit | {'images'}
+        super().select_fields(fields, omit)
+
     def to_representation(self, obj):
         ret = super(EventSerializerV0_1, self).to_representation(obj)
         _format_images_v0_1(ret)
@@ -1773,17 +2208,6 @@ class LinkedEventsOrderingFilter(filters.OrderingFilter):
     ordering_param = 'sort'
 
 
-class EventOrderingFilter(LinkedEventsOrderingFilter):
-    def filter_queryset(self, request, queryset, view):
-        queryset = super(EventOrderingFilter, self).filter_queryset(request, queryset, view)
-        ordering = self.get_ordering(request, queryset, view)
-        if not ordering:
-            ordering = []
-        if 'duration' in ordering or '-duration' in ordering:
-            queryset = queryset.extra(select={'duration': 'end_time - start_time'})
-        return queryset
-
-
 def parse_duration_string(duration):
     """
     Parse duration string expressed in format
@@ -1810,32 +2234,120 @@ def parse_duration_string(duration):
     return int(val) * mul
 
 
-def _filter_event_queryset(queryset, params, srs=None):
+def _resolve_keyword_ids(val):
+    """
+    Resolve comma separated keyword ids to the keywords replacing them, for backwards compatibility.
+
+    :return: list of keyword ids and whether all the given keywords were found
+    """
+    keyword_ids = val.split(',')
+    replacements = keyword_replacements.resolve(keyword_ids)
+    return [replacements.get(kid, kid) for kid in keyword_ids], len(replacements) == len(set(keyword_ids))
+
+
+def _text_substring_qset(val):
+    val = val.lower()
+    qset = Q()
+
+    # Free string search from all translated event fields
+    event_fields = EventTranslationOptions.fields
+    for field in event_fields:
+        # check all languages for each field
+        qset |= _text_qset_by_translated_field(field, val)
+
+    # Free string search from all translated place fields
+    place_fields = PlaceTranslationOptions.fields
+    for field in place_fields:
+        location_field = 'location__' + field
+        # check all languages for each field
+        qset |= _text_qset_by_translated_field(location_field, val)
+    return qset
+
+
+def _text_search_query(val):
+    """
+    Get the full text search query matching events that have all the words of the text as word prefixes.
+
+    The text is stemmed in all the text search configurations, as its language is not known.
+    """
+    words = re.findall(r'\w+', val)
+    if not words:
+        # match nothing rather than everything
+        return SearchQuery('', config='simple')
+    raw_query = ' & '.join(word + ':*' for word in words)
+    query = SearchQuery(raw_query, config='simple', search_type='raw')
+    for config in TEXT_SEARCH_CONFIGS.values():
+        query |= SearchQuery(raw_query, config=config, search_type='raw')
+    return query
+
+
+def _keyword_query(keyword_ids):
+    """
+    Get the query for events having any of the given keywords, either as keywords or as audience.
+
+    The keywords are matched in semi-join subqueries instead of joins, so that the events need
+    not be made distinct.
+    """
+    keywords = Event.keywords.through.objects.filter(keyword_id__in=keyword_ids).values('event_id')
+    audience = Event.audience.through.objects.filter(keyword_id__in=keyword_ids).values('event_id')
+    return Q(pk__in=keywords) | Q(pk__in=audience)
+
+
+def _custom_data_pairs(val, param):
+    """
+    Parse the comma-separated custom data key value pairs of a param, using : as key value separator.
+    """
+    pairs = []
+    for pair in val.split(','):
+        key, separator, value = pair.partition(':')
+        if not key or not separator:
+            raise ParseError(_('Custom data should be passed as key:value pairs in %(param)s. You passed %(pair)s.')
+                             % {'param': param, 'pair': pair})
+        pairs.append((key, value))
+    return pairs
+
+
+def _custom_data_query(pairs):
+    """
+    Get the query for events having all the given custom data key value pairs.
+
+    The pairs are merged in a single containment, which is answered from the GIN index of the custom data.
+    """
+    custom_data = {}
+    for key, value in pairs:
+        if custom_data.setdefault(key, value) != value:
+            # a key cannot have two values at once
+            return Q(pk__in=[])
+    return Q(custom_data__contains=custom_data)
+
+
+def _filter_event_queryset(queryset, params, srs=None, organization_tree=None):
     """
     Filter events queryset by params
     (e.g. self.request.query_params in EventViewSet)
+
+    The organization tree resolver of the request may be given to reuse the resolved organizations.
     """
-    # Filter by string (case insensitive). This searches from all fields
-    # which are marked translatable in translation.py
+    if organization_tree is None:
+        organization_tree = OrganizationTreeResolver()
+    # Filter by text search from all fields which are marked translatable in translation.py.
+    # By default, the text is searched with the full text search vector of the event, and the results are ranked
+    # by relevance unless sorted otherwise. With text_mode=substring, the text is searched case insensitively as
+    # a substring, without using any index.
+    text_mode = params.get('text_mode', 'search')
+    if text_mode not in ('search', 'substring'):
+        raise ParseError(_('text_mode must be one of search, substring.'))
+
     val = params.get('text', None)
     if val:
-        val = val.lower()
-        qset = Q()
-
-        # Free string search from all translated event fields
-        event_fields = EventTranslationOptions.fields
-        for field in event_fields:
-            # check all languages for each field
-            qset |= _text_qset_by_translated_field(field, val)
-
-        # Free string search from all translated place fields
-        place_fields = PlaceTranslationOptions.fields
-        for field in place_fields:
-            location_field = 'location__' + field
-            # check all languages for each field
-            qset |= _text_qset_by_translated_field(location_field, val)
-
-        queryset = queryset.filter(qset)
+        if text_mode == 'substring':
+            queryset = queryset.filter(_text_substring_qset(val))
+        else:
+            query = _text_search_query(val)
+            queryset = queryset.filter(search_vector=query)
+            if 'sort' not in params:
+                queryset = queryset.annotate(text_rank=SearchRank(F('search_vector'), query))
+                queryset = queryset.order_by('-text_rank', '-last_modified_time')
 
     #  Filter by event translated fields and keywords combined. The code is
     #  repeated as this is the first iteration, which will be replaced by a similarity
@@ -1843,39 +2355,28 @@ def _filter_event_queryset(queryset, params, srs=None):
     val = params.get('combined_text', None)
     if val:
         val = val.lower()
-        qset = Q()
         vals = val.split(',')
+        # the three keywords most similar to each term are found in a single query
+        similar_keywords = get_similar_keywords(vals, limit=3)
         qsets = []
         for val in vals:
-            # Free string search from all translated event fields
-            event_fields = EventTranslationOptions.fields
-            for field in event_fields:
-                # check all languages for each field
-                qset |= _text_qset_by_translated_field(field, val)
-
-            # Free string search from all translated place fields
-            place_fields = PlaceTranslationOptions.fields
-            for field in place_fields:
-                location_field = 'location__' + field
-                # check all languages for each field
-                qset |= _text_qset_by_translated_field(location_field, val)
+            if text_mode == 'substring':
+                qset = _text_substring_qset(val)
+            else:
+                qset = Q(search_vector=_text_search_query(val))
 
-            langs = ['fi', 'sv'] if re.search('[\u00C0-\u00FF]', val) else ['fi', 'sv', 'en']
-            tri = [TrigramSimilarity(f'name_{i}', val) for i in langs]
-            keywords = Keyword.objects.annotate(simile=Greatest(*tri)).filter(simile__gt=0.2).order_by('-simile')[:3]
-            if keywords:
-                qset |= Q(keywords__in=keywords)
+            keyword_ids = similar_keywords.get(val)
+            if keyword_ids:
+                qset |= Q(pk__in=Event.keywords.through.objects.filter(keyword_id__in=keyword_ids).values('event_id'))
             qsets.append(qset)
-            qset = Q()
         queryset = queryset.filter(*qsets)
 
     #  This filtering param requires populate_local_event_cache management command
     val = params.get('combined_local_ongoing', None)
     if val:
-        cache = caches['ongoing_local']
-        val = val.lower()
         vals = val.split(',')
-        ids = {k for k, v in cache.get('ids').items() if any(val in v for val in vals)}
+        # no events are found before the index has been built
+        ids = local_event_index.search(vals) or set()
         queryset = queryset.filter(id__in=ids)
 
     val = params.get('last_modified_since', None)
@@ -1906,24 +2407,20 @@ def _filter_event_queryset(queryset, params, srs=None):
         start = today.isoformat()
         end = (today + timedelta(days=days)).isoformat()
 
-    if not end:
+    # the occurrence of the event tells when it is considered to take place, see events.sql.EVENT_OCCURRENCE_SQL.
+    # One-day events with no known end time (but known start) are excluded after they started.
+    start_dt = utils.parse_time(start, is_start=True)[0] if start else None
+    end_dt = utils.parse_time(end, is_start=False)[0] if end else None
+    if start_dt and end_dt and start_dt > end_dt:
+        # an inverted range is not a range, the events must overlap both bounds
+        queryset = queryset.filter(occurrence__overlap=DateTimeTZRange(start_dt, None, '[)'))
+        queryset = queryset.filter(occurrence__overlap=DateTimeTZRange(None, end_dt, '(]'))
+    elif end_dt:
+        queryset = queryset.filter(occurrence__overlap=DateTimeTZRange(start_dt, end_dt, '[]'))
+    elif start_dt:
         # postponed events are considered to be "far" in the future and should be included if end is *not* given
-        postponed_Q = Q(event_status=Event.Status.POSTPONED)
-    else:
-        postponed_Q = Q()
-
-    if start:
-        dt = utils.parse_time(start, is_start=True)[0]
-        # only return events with specified end times, or unspecified start times, during the whole of the event
-        # this gets of rid pesky one-day events with no known end time (but known start) after they started
-        queryset = queryset.filter(Q(end_time__gt=dt, has_end_time=True) |
-                                   Q(end_time__gt=dt, has_start_time=False) |
-                                   Q(start_time__gte=dt) |
-                                   postponed_Q)
-
-    if end:
-        dt = utils.parse_time(end, is_start=False)[0]
-        queryset = queryset.filter(Q(end_time__lt=dt) | Q(start_time__lte=dt))
+        queryset = queryset.filter(Q(occurrence__overlap=DateTimeTZRange(start_dt, None, '[)')) |
+                                   Q(event_status=Event.Status.POSTPONED))
 
     val = params.get('bbox', None)
     if val:
@@ -1970,60 +2467,59 @@ def _filter_event_queryset(queryset, params, srs=None):
     # Filter by custom value key value pairs using : as key value separator
     val = params.get('custom_data', None)
     if val:
-        val = val.split(',')
-        for custom_data_filter in val:
-            custom_data_filter = custom_data_filter.split(":")
-            queryset = queryset.filter(custom_data__contains={custom_data_filter[0]: custom_data_filter[1]})
+        queryset = queryset.filter(_custom_data_query(_custom_data_pairs(val, 'custom_data')))
+
+    # 'custom_data_OR' returns the events having any of the key value pairs
+    val = params.get('custom_data_OR', None)
+    if val:
+        qset = Q(pk__in=[])
+        for pair in _custom_data_pairs(val, 'custom_data_OR'):
+            qset |= _custom_data_query([pair])
+        queryset = queryset.filter(qset)
+
+    # Filter by custom data keys, multiple keys separated by comma
+    val = params.get('custom_data_has_key', None)
+    if val:
+        queryset = queryset.filter(custom_data__has_keys=val.split(','))
+
+    val = params.get('custom_data_has_any_key', None)
+    if val:
+        queryset = queryset.filter(custom_data__has_any_keys=val.split(','))
 
     # Filter by keyword id, multiple ids separated by comma
     val = params.get('keyword', None)
     if val:
-        val = val.split(',')
-        try:
-            # replaced keywords are looked up for backwards compatibility
-            val = [getattr(Keyword.objects.get(id=kid).replaced_by, 'id', None) or kid for kid in val]
-        except Keyword.DoesNotExist:
+        val, all_found = _resolve_keyword_ids(val)
+        if not all_found:
             # the user asked for an unknown keyword
             queryset = queryset.none()
-        queryset = queryset.filter(Q(keywords__pk__in=val) | Q(audience__pk__in=val)).distinct()
+        queryset = queryset.filter(_keyword_query(val))
 
     # 'keyword_OR' behaves the same way as 'keyword'
     val = params.get('keyword_OR', None)
     if val:
-        val = val.split(',')
-        try:
-            # replaced keywords are looked up for backwards compatibility
-            val = [getattr(Keyword.objects.get(id=kid).replaced_by, 'id', None) or kid for kid in val]
-        except Keyword.DoesNotExist:
+        val, all_found = _resolve_keyword_ids(val)
+        if not all_found:
             # the user asked for an unknown keyword
             queryset = queryset.none()
-        queryset = queryset.filter(Q(keywords__pk__in=val) | Q(audience__pk__in=val)).distinct()
+        queryset = queryset.filter(_keyword_query(val))
 
     # Filter by keyword ids requiring all keywords to be present in event
     val = params.get('keyword_AND', None)
     if val:
-        val = val.split(',')
+        val, all_found = _resolve_keyword_ids(val)
+        if not all_found:
+            # the user asked for an unknown keyword
+            queryset = queryset.none()
         for keyword_id in val:
-            try:
-                # replaced keywords are looked up for backwards compatibility
-                val = getattr(Keyword.objects.get(id=keyword_id).replaced_by, 'id', None) or keyword_id
-            except Keyword.DoesNotExist:
-                # the user asked for an unknown keyword
-                queryset = queryset.none()
-            queryset = queryset.filter(Q(keywords__pk=keyword_id) | Q(audience__pk=keyword_id))
-        queryset = queryset.distinct()
+            queryset = queryset.filter(_keyword_query([keyword_id]))
 
     # Negative filter for keyword ids
     val = params.get('keyword!', None)
     if val:
-        val = val.split(',')
-        try:
-            # replaced keywords are looked up for backwards compatibility
-            val = [getattr(Keyword.objects.get(id=kid).replaced_by, 'id', None) or kid for kid in val]
-        except Keyword.DoesNotExist:
-            # the user asked for an unknown keyword
-            pass
-        queryset = queryset.exclude(Q(keywords__pk__in=val) | Q(audience__pk__in=val)).distinct()
+        # unknown keywords are not present in any event
+        val, all_found = _resolve_keyword_ids(val)
+        queryset = queryset.exclude(_keyword_query(val))
 
     # filter only super or non-super events. to be deprecated?
     val = params.get('recurring', None)
@@ -2041,14 +2537,12 @@ def _filter_event_queryset(queryset, params, srs=None):
     val = params.get('max_duration', None)
     if val:
         dur = parse_duration_string(val)
-        cond = 'end_time - start_time <= %s :: interval'
-        queryset = queryset.extra(where=[cond], params=[str(dur)])
+        queryset = queryset.filter(duration__lte=timedelta(seconds=dur))
 
     val = params.get('min_duration', None)
     if val:
         dur = parse_duration_string(val)
-        cond = 'end_time - start_time >= %s :: interval'
-        queryset = queryset.extra(where=[cond], params=[str(dur)])
+        queryset = queryset.filter(duration__gte=timedelta(seconds=dur))
 
     # Filter by publisher, multiple sources separated by comma
     val = params.get('publisher', None)
@@ -2061,15 +2555,9 @@ def _filter_event_queryset(queryset, params, srs=None):
     val = params.get('publisher_ancestor', None)
     if val:
         val = val.split(',')
-        ancestors = Organization.objects.filter(id__in=val)
-
-        # Get ids of ancestors and all their descendants
-        publishers = Organization.objects.none()
-        for org in ancestors.all():
-            publishers |= org.get_descendants(include_self=True)
-        publisher_ids = [org['id'] for org in publishers.all().values('id')]
-
-        q = get_publisher_query(publisher_ids)
+        # Get the ancestors and all their descendants as tree ranges instead of listing them
+        ranges = organization_tree.get_tree_ranges(val)
+        q = get_publisher_query(Organization.objects.filter(tree_ranges_query(ranges)))
         queryset = queryset.filter(q)
 
     # Filter by publication status
@@ -2094,71 +2582,53 @@ def _filter_event_queryset(queryset, params, srs=None):
     val = params.get('language', None)
     if val:
         val = val.split(',')
-        q = Q()
-        for lang in val:
-            if lang in utils.get_fixed_lang_codes():
-                # check string content if language has translations available
-                name_arg = {'name_' + lang + '__isnull': False}
-                desc_arg = {'description_' + lang + '__isnull': False}
-                short_desc_arg = {'short_description_' + lang + '__isnull': False}
-                q = q | Q(in_language__id=lang) | Q(**name_arg) | Q(**desc_arg) | Q(**short_desc_arg)
-            else:
-                q = q | Q(in_language__id=lang)
-        queryset = queryset.filter(q)
+        queryset = queryset.filter(Q(in_languages__overlap=val) | Q(content_languages__overlap=val))
 
     # Filter by in_language field only
     val = params.get('in_language', None)
     if val:
         val = val.split(',')
-        q = Q()
-        for lang in val:
-            q = q | Q(in_language__id=lang)
-        queryset = queryset.filter(q)
+        queryset = queryset.filter(in_languages__overlap=val)
 
     val = params.get('starts_after', None)
     param = 'starts_after'
     if val:
         split_time = val.split(':')
         hour, minute = validate_hours(split_time, param)
-        queryset = queryset.filter(start_time__time__gte=datetime_time(hour, minute))
+        queryset = queryset.filter(start_local_time__gte=datetime_time(hour, minute))
 
     val = params.get('starts_before', None)
     param = 'starts_before'
     if val:
         split_time = val.split(':')
         hour, minute = validate_hours(split_time, param)
-        queryset = queryset.filter(start_time__time__lte=datetime_time(hour, minute))
+        queryset = queryset.filter(start_local_time__lte=datetime_time(hour, minute))
 
     val = params.get('ends_after', None)
     param = 'ends_after'
     if val:
         split_time = val.split(':')
         hour, minute = validate_hours(split_time, param)
-        queryset = queryset.filter(end_time__time__gte=datetime_time(hour, minute))
+        queryset = queryset.filter(end_local_time__gte=datetime_time(hour, minute))
 
     val = params.get('ends_before', None)
     param = 'ends_before'
     if val:
         split_time = val.split(':')
         hour, minute = validate_hours(split_time, param)
-        queryset = queryset.filter(end_time__time__lte=datetime_time(hour, minute))
+        queryset = queryset.filter(end_local_time__lte=datetime_time(hour, minute))
+
+    # Filter by the local weekday the event starts on, ISO weekday numbers (1 is Monday) separated by comma
+    val = params.get('weekday', None)
+    if val:
+        queryset = queryset.filter(start_weekday__in=validate_weekdays(val.split(','), 'weekday'))
 
     # Filter by translation only
     val = params.get('translation', None)
     if val:
         val = val.split(',')
-        q = Q()
-        for lang in val:
-            if lang in utils.get_fixed_lang_codes():
-                # check string content if language has translations available
-                name_arg = {'name_' + lang + '__isnull': False}
-                desc_arg = {'description_' + lang + '__isnull': False}
-                short_desc_arg = {'short_description_' + lang + '__isnull': False}
-                q = q | Q(**name_arg) | Q(**desc_arg) | Q(**short_desc_arg)
-            else:
-                # language has no translations, matching condition must be false
-                q = q | Q(pk__in=[])
-        queryset = queryset.filter(q)
+        # languages without translations have no content
+        queryset = queryset.filter(content_languages__overlap=val)
 
     # Filter by audience min age
     val = params.get('audience_min_age', None) or params.get('audience_min_age_lt', None)
@@ -2206,10 +2676,18 @@ def _filter_event_queryset(queryset, params, srs=None):
     # Filter by free offer
     val = params.get('is_free', None)
     if val and val.lower() in ['true', 'false']:
-        if val.lower() == 'true':
-            queryset = queryset.filter(offers__is_free=True)
-        elif val.lower() == 'false':
-            queryset = queryset.exclude(offers__is_free=True)
+        queryset = queryset.filter(has_free_offer=val.lower() == 'true')
+
+    # Filter by the lowest price of the offers, including free offers
+    val = params.get('price_max', None)
+    if val:
+        try:
+            price_max = Decimal(val.replace(',', '.'))
+        except InvalidOperation:
+            raise ParseError(_('Maximum price must be a number.'))
+        if not price_max.is_finite():
+            raise ParseError(_('Maximum price must be a number.'))
+        queryset = queryset.filter(price_min__lte=price_max)
 
     return queryset
 
@@ -2262,19 +2740,23 @@ class EventDeletedException(APIException):
     default_code = 'gone'
 
 
-class EventViewSet(JSONAPIViewMixin, BulkModelViewSet, viewsets.ReadOnlyModelViewSet):
+class EventViewSet(ConditionalListMixin, ResponseCacheMixin, StreamingListMixin, BulkDumpMixin, JSONAPIViewMixin,
+                   SparseFieldsetMixin, OutputLanguageMixin, BulkModelViewSet, viewsets.ReadOnlyModelViewSet):
     queryset = Event.objects.all()
     # This exclude is, atm, a bit overkill, considering it causes a massive query and no such events exist.
     # queryset = queryset.exclude(super_event_type=Event.SuperEventType.RECURRING, sub_events=None)
     # Use select_ and prefetch_related() to reduce the amount of queries
     queryset = queryset.select_related('location', 'publisher')
     queryset = queryset.prefetch_related(
-        'offers', 'keywords', 'audience', 'images', 'images__publisher', 'external_links', 'sub_events', 'in_language',
-        'videos')
+        'offers', 'keywords', 'audience', 'images', 'images__publisher', 'external_links', 'in_language', 'videos')
     serializer_class = EventSerializer
-    filter_backends = (EventOrderingFilter, django_filters.rest_framework.DjangoFilterBackend,
+    filter_backends = (LinkedEventsOrderingFilter, django_filters.rest_framework.DjangoFilterBackend,
                        EventExtensionFilterBackend)
     filterset_class = EventFilter
+    pagination_class = EventPagination
+    # events embed their location and keywords
+    response_cache_dependencies = ('event', 'place', 'keyword')
+    response_cache_detail_dependency = 'event'
     ordering_fields = ('start_time', 'end_time', 'duration', 'last_modified_time', 'name')
     ordering = ('-last_modified_time',)
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [DOCXRenderer]
@@ -2283,6 +2765,9 @@ class EventViewSet(JSONAPIViewMixin, BulkModelViewSet, viewsets.ReadOnlyModelVie
         super().__init__(**kwargs)
         self.data_source = None
         self.organization = None
+        # the view is instantiated for every request, and filter_queryset is called more than once for
+        # conditional list requests
+        self.organization_tree = OrganizationTreeResolver()
 
     def initial(self, request, *args, **kwargs):
         super().initial(request, *args, **kwargs)
@@ -2297,17 +2782,60 @@ class EventViewSet(JSONAPIViewMixin, BulkModelViewSet, viewsets.ReadOnlyModelVie
     def get_serializer_class(self):
         return EventViewSet.get_serializer_class_for_version(self.request.version)
 
+    def use_values_projection(self):
+        """
+        Check whether the event list is serialized from lightweight rows instead of model instances.
+
+        The projection is selected with projection=values, and used for anonymous list requests
+        without includes or extensions. Otherwise, the events are serialized from model instances.
+        """
+        projection = self.request.query_params.get('projection', 'models')
+        if projection not in ('models', 'values'):
+            raise ParseError(_('projection must be one of models, values.'))
+        return (projection == 'values' and
+                self.action == 'list' and
+                not self.request.user.is_authenticated and
+                self.request.accepted_renderer.format != 'docx' and
+                not self.request.query_params.get('include') and
+                not get_extensions_from_request(self.request))
+
+    def paginate_queryset(self, queryset):
+        # streamed pages are projected a chunk at a time
+        if not self.use_values_projection() or self.is_stream_requested():
+            return super().paginate_queryset(queryset)
+        page = super().paginate_queryset(projection.project_events(queryset))
+        if page is not None:
+            projection.attach_related(page, omitted=self.get_omitted_sources())
+        return page
+
+    def get_stream_chunk(self, queryset):
+        if not self.use_values_projection():
+            return super().get_stream_chunk(queryset)
+        rows = list(projection.project_events(queryset))
+        projection.attach_related(rows, omitted=self.get_omitted_sources())
+        return rows
+
     def get_serializer_context(self):
         context = super(EventViewSet, self).get_serializer_context()
         context.setdefault('skip_fields', set()).update(set([
             'headline',
             'secondary_headline']))
         context['extensions'] = get_extensions_from_request(self.request)
+        sub_events_summary = self.request.query_params.get('sub_events_summary')
+        if sub_events_summary:
+            context['sub_events_summary'] = validate_bool(sub_events_summary, 'sub_events_summary')
         return context
 
     def get_queryset(self):
         queryset = super().get_queryset()
         context = self.get_serializer_context()
+        # deleted sub events are never displayed, so they need not be fetched either
+        sub_events = Event.objects.filter(deleted=False)
+        if 'sub_events' not in context.get('include', []):
+            # links and times are all that is displayed of sub events that are not included
+            sub_events = sub_events.only('id', 'super_event', 'start_time', 'end_time', 'has_start_time',
+                                         'has_end_time', 'deleted')
+        queryset = queryset.prefetch_related(Prefetch('sub_events', queryset=sub_events))
         # prefetch extra if the user want them included
         if 'include' in context:
             for included in context['include']:
@@ -2376,9 +2904,29 @@ class EventViewSet(JSONAPIViewMixin, BulkModelViewSet, viewsets.ReadOnlyModelVie
             queryset = self.request.user.get_editable_events(original_queryset)
 
         queryset = _filter_event_queryset(queryset, self.request.query_params,
-                                          srs=self.srs)
+                                          srs=self.srs, organization_tree=self.organization_tree)
         return queryset.filter()
 
+    @action(detail=False, methods=['get'])
+    def custom_data_ids(self, request, *args, **kwargs):
+        """
+        Map the given values of a custom data key to the ids of the events having them, e.g.
+        custom_data_ids/?key=partner_id&value=1,2. The list filters apply to the events.
+        """
+        key = request.query_params.get('key')
+        values = request.query_params.get('value')
+        if not key or not values:
+            raise ParseError(_('Both key and value must be given.'))
+        ids = OrderedDict((value, []) for value in values.split(','))
+        qset = Q(pk__in=[])
+        for value in ids:
+            qset |= _custom_data_query([(key, value)])
+        queryset = self.filter_queryset(self.get_queryset()).filter(qset)
+        queryset = queryset.select_related(None).prefetch_related(None).order_by('pk')
+        for event_id, custom_data in queryset.values_list('id', 'custom_data'):
+            ids[custom_data[key]].append(event_id)
+        return Response({'data': ids})
+
     def allow_bulk_destroy(self, qs, filtered):
         return False
 
@@ -2615,3 +3163,46 @@ class SearchViewSet(JSONAPIViewMixin, GeoModelAPIView, viewsets.ViewSetMixin, ge
 
 
 register_view(SearchViewSet, 'search', base_name='search')
+
+
+class ChangeSerializer(serializers.Serializer):
+    sequence = serializers.IntegerField()
+    resource = serializers.CharField()
+    id = serializers.CharField(source='object_id')
+    action = serializers.CharField()
+    time = serializers.DateTimeField(source='created_time')
+
+
+class ChangeViewSet(JSONAPIViewMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Feed of the changes of events, places and keywords, in the order they were committed.
+
+    Saved objects are fetched again from their endpoints, deleted ones are soft deleted and removed
+    ones no longer exist. Poll the feed with the next_since value of the previous page. Changes are
+    kept for settings.CHANGE_RETENTION_DAYS, so clients that poll less often must synchronise from
+    the dump endpoints instead. The changes of events that are not public are only listed to the
+    users who may edit them, as in the event list.
+    """
+    queryset = Change.objects.exclude(sequence=None)
+    serializer_class = ChangeSerializer
+    pagination_class = ChangeFeedPagination
+    resources = ('event', 'place', 'keyword')
+
+    def get_queryset(self):
+        hidden_events = Event.objects.exclude(publication_status=PublicationStatus.PUBLIC)
+        if self.request.user.is_authenticated:
+            hidden_events = hidden_events.exclude(
+                pk__in=self.request.user.get_editable_events(hidden_events).values('pk'))
+        return super().get_queryset().exclude(resource='event', object_id__in=hidden_events.values('id'))
+
+    def filter_queryset(self, queryset):
+        val = self.request.query_params.get('resource')
+        if val:
+            resources = val.split(',')
+            if not set(resources) <= set(self.resources):
+                raise ParseError(_('resource must be one of %s.') % ', '.join(self.resources))
+            queryset = queryset.filter(resource__in=resources)
+        return queryset
+
+
+register_view(ChangeViewSet, 'changes', base_name='change')
@@ -1,6 +1,118 @@
-from rest_framework.response import Response
+import base64
+import binascii
+import datetime
+import json
 from collections import OrderedDict
-from rest_framework import pagination
+from functools import partial, reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Count, Max, Q, QuerySet
+from django.utils.duration import duration_iso_string
+from django.utils.functional import cached_property
+from django.utils.translation import get_language
+from django.utils.translation import ugettext_lazy as _
+from modeltranslation.translator import NotRegistered, translator
+from modeltranslation.utils import build_localized_fieldname
+from rest_framework import filters, pagination
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from events.sql import estimate_count
+
+
+class PeekPage(Page):
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class ExactCountPaginator(Paginator):
+    """
+    Paginator counting the whole result set.
+
+    If last_modified_field is given, the latest modification time of the result set is aggregated
+    in the same query as the count, for the validators of conditional list requests.
+    """
+    def __init__(self, *args, last_modified_field=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_modified_field = last_modified_field
+        self.last_modified = None
+
+    @cached_property
+    def count(self):
+        if self.last_modified_field is None or not isinstance(self.object_list, QuerySet):
+            return super().count
+        aggregate = self.object_list.order_by().aggregate(count=Count('pk'),
+                                                          last_modified=Max(self.last_modified_field))
+        self.last_modified = aggregate['last_modified']
+        return aggregate['count']
+
+
+class CountlessPaginator(Paginator):
+    """
+    Paginator that never counts the whole result set.
+
+    The page is fetched with one extra row, which tells whether there is a next page.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._num_pages = 1
+
+    @cached_property
+    def count(self):
+        return None
+
+    @property
+    def num_pages(self):
+        # only the pages seen so far are known
+        return self._num_pages
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not object_list and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        has_next = len(object_list) > self.per_page
+        self._num_pages = number + 1 if has_next else number
+        return PeekPage(object_list[:self.per_page], number, self, has_next)
+
+
+class EstimatedCountPaginator(CountlessPaginator):
+    """
+    Paginator that counts exactly up to a threshold, and uses the query planner estimate above it.
+    """
+    count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return self.object_list.count()
+        threshold = getattr(settings, 'PAGINATION_COUNT_ESTIMATE_THRESHOLD', 10000)
+        count = self.object_list[:threshold + 1].count()
+        if count <= threshold:
+            return count
+        self.count_is_estimate = True
+        return max(estimate_count(self.object_list), threshold + 1)
 
 
 # This needs to be in its own file because of circular
@@ -8,6 +120,33 @@ from rest_framework import pagination
 class CustomPagination(pagination.PageNumberPagination):
     max_page_size = 100
     page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    # exact counts the whole result set, estimate counts it up to a threshold and
+    # none only checks whether there is a next page
+    count_paginator_classes = OrderedDict([
+        ('exact', ExactCountPaginator),
+        ('estimate', EstimatedCountPaginator),
+        ('none', CountlessPaginator),
+    ])
+
+    def get_count_strategy(self, request):
+        strategy = (request.query_params.get(self.count_query_param) or
+                    getattr(settings, 'PAGINATION_DEFAULT_COUNT', 'exact'))
+        if strategy not in self.count_paginator_classes:
+            raise ParseError(_('count must be one of %s.') % ', '.join(self.count_paginator_classes))
+        return strategy
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_strategy = self.get_count_strategy(request)
+        self.django_paginator_class = self.count_paginator_classes[self.count_strategy]
+        last_modified_field = getattr(view, 'conditional_last_modified_field', None)
+        if self.count_strategy == 'exact' and last_modified_field:
+            self.django_paginator_class = partial(self.django_paginator_class,
+                                                  last_modified_field=last_modified_field)
+        if (self.count_strategy != 'exact' and
+                request.query_params.get(self.page_query_param) in self.last_page_strings):
+            raise ParseError(_('The last page can only be requested with count=exact.'))
+        return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data):
         meta = OrderedDict([
@@ -15,6 +154,8 @@ class CustomPagination(pagination.PageNumberPagination):
             ('next', self.get_next_link()),
             ('previous', self.get_previous_link()),
         ])
+        if self.count_strategy == 'estimate':
+            meta['count_is_estimate'] = self.page.paginator.count_is_estimate
 
         return Response(OrderedDict([('meta', meta), ('data', data)]))
 
@@ -23,3 +164,252 @@ class LargeResultsSetPagination(CustomPagination):
     page_size = 1000
     page_size_query_param = 'page_size'
     max_page_size = 10000
+
+
+def _encode_cursor_value(value):
+    # DjangoJSONEncoder truncates microseconds, which would make the keyset skip rows
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    # durations are compared in the database, which parses ISO 8601 intervals
+    if isinstance(value, datetime.timedelta):
+        return duration_iso_string(value)
+    return str(value)
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Cursor pagination over the ordering of the view, without OFFSET and without count.
+
+    The cursor stores the values of every ordering field (plus a unique tiebreaker) of the
+    last row on the page, so the next page is a single keyset comparison that the database
+    can serve from the ordering index, no matter how deep the client has paged.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    tiebreaker = 'id'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.reverse, self.position = self.decode_cursor(request)
+        if self.position is not None and len(self.position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.get_position_filter(ordering, self.position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = []
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, filters.OrderingFilter):
+                ordering = list(backend().get_ordering(request, queryset, view) or [])
+                break
+        model = queryset.model
+        try:
+            translated_fields = translator.get_options_for_model(model).fields
+        except NotRegistered:
+            translated_fields = ()
+        language = get_language() or settings.LANGUAGE_CODE
+
+        localized = []
+        for field in ordering:
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            if name in translated_fields:
+                name = build_localized_fieldname(name, language)
+            try:
+                model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise ParseError(_('Cursor pagination is not supported when sorting by %s.') % name)
+            localized.append('-' + name if descending else name)
+
+        if self.tiebreaker not in [field.lstrip('-') for field in localized]:
+            descending = bool(localized) and localized[-1].startswith('-')
+            localized.append('-' + self.tiebreaker if descending else self.tiebreaker)
+        return localized
+
+    def get_position_filter(self, ordering, position):
+        # rows after the position: equal on all preceding fields and after on the current one.
+        # Postgres sorts nulls last in ascending and first in descending order.
+        after_qs = []
+        equal_q = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            if field.startswith('-'):
+                if value is None:
+                    after_q = Q(**{name + '__isnull': False})
+                else:
+                    after_q = Q(**{name + '__lt': value})
+            else:
+                if value is None:
+                    after_q = None
+                else:
+                    after_q = Q(**{name + '__gt': value}) | Q(**{name + '__isnull': True})
+            if after_q is not None:
+                after_qs.append(equal_q & after_q)
+            if value is None:
+                equal_q &= Q(**{name + '__isnull': True})
+            else:
+                equal_q &= Q(**{name: value})
+        if not after_qs:
+            return Q(pk__in=[])
+        return reduce(or_, after_qs)
+
+    def get_position(self, obj):
+        position = []
+        for field in self.ordering:
+            value = getattr(obj, obj._meta.get_field(field.lstrip('-')).attname)
+            position.append(None if value is None else _encode_cursor_value(value))
+        return position
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return bool(cursor['r']), list(cursor['p'])
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, reverse, position):
+        cursor = json.dumps({'r': int(reverse), 'p': position}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            return self.encode_cursor(False, self.get_position(self.page[-1]))
+        # an empty page reached by paging backwards, continue from where we came
+        return self.encode_cursor(False, self.position)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            return self.encode_cursor(True, self.get_position(self.page[0]))
+        return self.encode_cursor(True, self.position)
+
+    def get_paginated_response(self, data):
+        meta = OrderedDict([
+            ('count', None),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+
+        return Response(OrderedDict([('meta', meta), ('data', data)]))
+
+
+class EventPagination(CustomPagination):
+    """
+    Page number pagination, switching to keyset pagination if the cursor parameter is given.
+
+    Start cursor pagination with an empty cursor (?cursor=) and follow the next and previous links.
+    """
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_paginator = None
+        if self.keyset_pagination_class.cursor_query_param in request.query_params:
+            self.keyset_paginator = self.keyset_pagination_class()
+            self.keyset_paginator.page_size = self.page_size
+            self.keyset_paginator.max_page_size = self.max_page_size
+            self.display_page_controls = False
+            return self.keyset_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class ChangeFeedPagination(pagination.BasePagination):
+    """
+    Pagination of the change feed by sequence number.
+
+    A page lists the changes after the since parameter in sequence order. The next_since value of
+    the page is the since parameter of the next request, also when the feed has no more changes yet.
+    """
+    since_query_param = 'since'
+    page_size = 1000
+    page_size_query_param = 'page_size'
+    max_page_size = 10000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.since = self.get_since(request)
+        self.page_size = self.get_page_size(request)
+        results = list(queryset.filter(sequence__gt=self.since).order_by('sequence')[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_since(self, request):
+        value = request.query_params.get(self.since_query_param) or 0
+        try:
+            since = int(value)
+        except ValueError:
+            since = -1
+        if since < 0:
+            raise ParseError(_('since must be a non-negative integer.'))
+        return since
+
+    def get_next_since(self):
+        return self.page[-1].sequence if self.page else self.since
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.since_query_param, self.get_next_since())
+
+    def get_paginated_response(self, data):
+        meta = OrderedDict([
+            ('since', self.since),
+            ('next_since', self.get_next_since()),
+            ('next', self.get_next_link()),
+        ])
+        return Response(OrderedDict([('meta', meta), ('data', data)]))
@@ -1,18 +1,45 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 
 class EventsConfig(AppConfig):
     name = 'events'
 
     def ready(self):
-        from .signals import organization_post_save, user_post_save
+        from .signals import (offer_changed, organization_post_save, organization_tree_changed,
+                              organization_users_changed, synchronised_object_post_delete, user_post_save)
         from django.contrib.auth import get_user_model
+        from django_orghierarchy.models import Organization
         post_save.connect(
             organization_post_save,
             sender="django_orghierarchy.Organization",
             dispatch_uid='organization_post_save',
         )
+        for users in (Organization.admin_users, Organization.regular_users):
+            m2m_changed.connect(
+                organization_users_changed,
+                sender=users.through,
+                dispatch_uid='organization_users_changed_%s' % users.field.name,
+            )
+        for signal in (post_save, post_delete):
+            for sender in ('django_orghierarchy.Organization', 'events.DataSource'):
+                signal.connect(
+                    organization_tree_changed,
+                    sender=sender,
+                    dispatch_uid='organization_tree_changed_%s' % sender,
+                )
+        for sender in ('events.Event', 'events.Place', 'events.Keyword'):
+            post_delete.connect(
+                synchronised_object_post_delete,
+                sender=sender,
+                dispatch_uid='synchronised_object_post_delete_%s' % sender,
+            )
+        for signal in (post_save, post_delete):
+            signal.connect(
+                offer_changed,
+                sender='events.Offer',
+                dispatch_uid='offer_changed',
+            )
         post_save.connect(
             user_post_save,
             sender=get_user_model(),
@@ -202,7 +202,8 @@ class ApiKeyUser(get_user_model(), UserModelPermissionMixin):
         return self.data_source.owner
 
     def is_admin(self, publisher):
-        return publisher in self.data_source.owner.get_descendants(include_self=True)
+        # unlike user admins, an API key does not gain rights to the organization replacing its owner
+        return self.is_admin_of_tree(publisher, include_replacements=False)
 
     def is_regular_user(self, publisher):
         return False
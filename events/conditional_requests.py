@@ -0,0 +1,75 @@
+"""
+Conditional GET support (ETag, Last-Modified and 304 Not Modified) for list views.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class ConditionalListMixin(object):
+    """
+    View mixin answering conditional list requests with 304 Not Modified before serialization.
+
+    The validators are computed from the latest modification time and the number of objects in
+    the filtered queryset, in a single aggregate query. Changes to related objects that do not
+    modify the listed objects themselves are therefore not seen by the validators.
+
+    Only If-None-Match is answered with 304, as the latest modification time does not change when
+    objects are deleted or drop out of the filters. Unconditional responses get the validators only
+    if the page was counted exactly, in which case the paginator aggregates the latest modification
+    time along with the count (see events.api_pagination.ExactCountPaginator). Pages without counts
+    and cursor pages get no validators. Cached responses carry the validators they were cached with.
+
+    The validators describe the result set rather than the bytes of the response, so the ETag is weak.
+    """
+    conditional_last_modified_field = 'last_modified_time'
+
+    def make_list_validators(self, request, last_modified, count):
+        params = sorted((key, value) for key, values in request.query_params.lists() for value in values)
+        etag_parts = [
+            type(self).__name__, str(request.version), request.accepted_renderer.format,
+            str(request.user.pk), repr(params),
+            last_modified.isoformat() if last_modified else '', str(count),
+        ]
+        etag = 'W/"%s"' % hashlib.sha1('|'.join(etag_parts).encode('utf-8')).hexdigest()
+        return etag, int(last_modified.timestamp()) if last_modified else None
+
+    def get_list_validators(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        aggregate = queryset.aggregate(last_modified=Max(self.conditional_last_modified_field), count=Count('pk'))
+        return self.make_list_validators(request, aggregate['last_modified'], aggregate['count'])
+
+    def get_paginated_list_validators(self, request):
+        """
+        Get the validators from the count of the page, or None if the page was not counted exactly.
+        """
+        page = getattr(self.paginator, 'page', None)
+        if page is None or getattr(page.paginator, 'last_modified_field', None) is None:
+            return None
+        return self.make_list_validators(request, page.paginator.last_modified, page.paginator.count)
+
+    def list(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().list(request, *args, **kwargs)
+        if 'HTTP_IF_NONE_MATCH' not in request.META:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code == 200 and not response.has_header('ETag'):
+                validators = self.get_paginated_list_validators(request)
+                if validators:
+                    self.set_list_validators(response, *validators)
+            return response
+        etag, last_modified = self.get_list_validators(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            self.set_list_validators(response, etag, last_modified)
+        return response
+
+    @staticmethod
+    def set_list_validators(response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
@@ -0,0 +1,50 @@
+"""
+Bulk dumps of the listed objects as newline-delimited JSON.
+
+The objects are read from a server-side cursor, and their related objects are prefetched for a
+chunk of objects at a time, so that a dump of any size is made in a single pass with bounded memory.
+"""
+import re
+from itertools import islice
+
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+from events.renderers import NDJSONRenderer
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+def iter_objects(queryset, chunk_size):
+    """
+    Iterate the objects of the queryset from a server-side cursor, prefetching their related objects by chunks.
+    """
+    lookups = queryset._prefetch_related_lookups
+    # iterator() ignores prefetch_related, so the lookups are prefetched for each chunk instead
+    objects = queryset.prefetch_related(None).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(objects, chunk_size))
+        if not chunk:
+            return
+        prefetch_related_objects(chunk, *lookups)
+        yield from chunk
+
+
+def iter_lines(objects, serializer, renderer=None):
+    """Encode the representations of the objects by the serializer as lines of JSON."""
+    renderer = renderer or NDJSONRenderer()
+    for obj in objects:
+        yield renderer.render(serializer.to_representation(obj))
+
+
+def get_response(request, lines):
+    """Get a streaming response of the lines, gzipped if the client accepts it."""
+    if ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        response = StreamingHttpResponse(compress_sequence(lines), content_type=NDJSONRenderer.content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(lines, content_type=NDJSONRenderer.content_type)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
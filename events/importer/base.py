@@ -18,6 +18,7 @@ from .util import separate_scripts, clean_text
 from modeltranslation.translator import translator
 
 from events.models import Image, Language, Event, Offer, EventLink, Place
+from events.signals import bulk_offer_writes
 
 # Per module logger
 logger = logging.getLogger(__name__)
@@ -413,9 +414,10 @@ class Importer(object):
         if set(map(val, offers)) != set(map(val, obj.offers.all())):
             # this prevents overwriting manually added offers. do not update offers if we have added ones
             if not obj.is_user_edited() or len(set(map(val, offers))) >= obj.offers.count():
-                obj.offers.all().delete()
-                for o in offers:
-                    o.save()
+                with bulk_offer_writes(obj):
+                    obj.offers.all().delete()
+                    for o in offers:
+                        o.save()
                 obj._changed = True
                 obj._changed_fields.append('offers')
 
@@ -8,7 +8,7 @@ from django_orghierarchy.models import Organization
 from rdflib import RDF
 from rdflib.namespace import DCTERMS, OWL, SKOS
 
-from events.models import Keyword, KeywordLabel, DataSource, BaseModel, Language
+from events.models import Change, Keyword, KeywordLabel, DataSource, BaseModel, Language
 
 from .util import active_language
 from .sync import ModelSyncher
@@ -248,6 +248,8 @@ class YsoImporter(Importer):
             if keyword:
                 keywords.append(keyword)
         Keyword.objects.bulk_create(keywords, batch_size=1000)
+        # bulk_create does not call save(), which records the changes of keywords
+        Change.objects.record('keyword', [keyword.id for keyword in keywords])
 
     def save_alt_label(self, syncher, graph, label):
         label_text = str(label)
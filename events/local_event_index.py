@@ -0,0 +1,141 @@
+"""
+Inverted token index of the local ongoing events, used by the combined_local_ongoing filter.
+
+The index maps the tokens of the event texts to the ids of the events containing them. It is built
+by the populate_local_event_cache management command and stored in the ongoing_local cache in
+shards by the first two letters of the tokens, each shard split into chunks small enough for
+memcached. A search only fetches the shards of its own tokens.
+
+Every build is stored under a version of its own, and the index is switched to it only after all
+of its chunks have been stored, so concurrent builds and searches never see partial indexes.
+"""
+import pickle
+import re
+import uuid
+from collections import defaultdict
+
+from django.core.cache import caches
+from django.utils.html import strip_tags
+
+CACHE_NAME = 'ongoing_local'
+CURRENT_KEY = 'local_event_index:current'
+SHARD_PREFIX_LENGTH = 2
+# well below the default 1 MB item size limit of memcached
+MAX_CHUNK_SIZE = 512 * 1024
+# chunks of replaced versions expire after the searches still using them have finished
+REPLACED_VERSION_TIMEOUT = 60
+
+
+def get_cache():
+    return caches[CACHE_NAME]
+
+
+def tokenize(text):
+    return re.findall(r'\w+', strip_tags(text).lower())
+
+
+def _shard_of(token):
+    return token[:SHARD_PREFIX_LENGTH]
+
+
+def _chunk_key(version, shard, chunk):
+    # the shard may contain characters memcached does not accept in keys
+    return 'local_event_index:%s:%s:%d' % (version, shard.encode('utf-8').hex(), chunk)
+
+
+def _split_shard(postings):
+    chunks = []
+    chunk = {}
+    size = 0
+    for token, event_ids in sorted(postings.items()):
+        token_size = len(pickle.dumps((token, event_ids), pickle.HIGHEST_PROTOCOL))
+        if chunk and size + token_size > MAX_CHUNK_SIZE:
+            chunks.append(chunk)
+            chunk = {}
+            size = 0
+        chunk[token] = event_ids
+        size += token_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def build_index(event_texts):
+    """
+    Build the index from the texts of the events, and switch searches to it.
+
+    :param event_texts: dict of event id to the texts of the event
+    :type event_texts: dict[str, Iterable[str]]
+    :return: number of distinct tokens in the index
+    :rtype: int
+    """
+    shards = defaultdict(lambda: defaultdict(set))
+    for event_id, texts in event_texts.items():
+        for text in texts:
+            if not text:
+                continue
+            for token in tokenize(text):
+                shards[_shard_of(token)][token].add(event_id)
+
+    cache = get_cache()
+    version = uuid.uuid4().hex
+    manifest = {}
+    for shard, postings in shards.items():
+        chunks = _split_shard(postings)
+        cache.set_many({_chunk_key(version, shard, i): chunk for i, chunk in enumerate(chunks)}, timeout=None)
+        manifest[shard] = len(chunks)
+
+    replaced = cache.get(CURRENT_KEY)
+    cache.set(CURRENT_KEY, {'version': version, 'shards': manifest}, timeout=None)
+    if replaced:
+        for shard, chunk_count in replaced['shards'].items():
+            for i in range(chunk_count):
+                cache.touch(_chunk_key(replaced['version'], shard, i), REPLACED_VERSION_TIMEOUT)
+    return sum(len(postings) for postings in shards.values())
+
+
+def search(terms):
+    """
+    Get the ids of the events matching any of the given terms.
+
+    An event matches a term if each word of the term is the beginning of a word in the event texts.
+
+    :param terms: search terms
+    :type terms: Iterable[str]
+    :return: set of event ids, or None if the index has not been built
+    :rtype: set[str]|None
+    """
+    cache = get_cache()
+    current = cache.get(CURRENT_KEY)
+    if current is None:
+        return None
+    version, manifest = current['version'], current['shards']
+
+    term_tokens = [tokenize(term) for term in terms]
+    term_tokens = [tokens for tokens in term_tokens if tokens]
+    shards = {shard for tokens in term_tokens for token in tokens for shard in manifest
+              if shard.startswith(token[:SHARD_PREFIX_LENGTH])}
+    keys = [_chunk_key(version, shard, i) for shard in shards for i in range(manifest[shard])]
+    postings = {}
+    for chunk in cache.get_many(keys).values():
+        postings.update(chunk)
+
+    def matching(token):
+        # the tokens of the event texts starting with the token of the term
+        event_ids = set()
+        for indexed_token, token_event_ids in postings.items():
+            if indexed_token.startswith(token):
+                event_ids |= token_event_ids
+        return event_ids
+
+    event_ids = set()
+    for tokens in term_tokens:
+        # longest first, as the longer tokens tend to match fewer events
+        term_event_ids = None
+        for token in sorted(tokens, key=len, reverse=True):
+            token_event_ids = matching(token)
+            term_event_ids = token_event_ids if term_event_ids is None else term_event_ids & token_event_ids
+            if not term_event_ids:
+                break
+        event_ids |= term_event_ids or set()
+    return event_ids
@@ -0,0 +1,64 @@
+import gzip
+import sys
+import urllib.parse
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import get_script_prefix, resolve, reverse, set_script_prefix
+
+
+class Command(BaseCommand):
+    help = "Dump the events, places or keywords matching the given list filters as newline-delimited JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=('event', 'place', 'keyword'))
+        parser.add_argument('--base-url', required=True,
+                            help='URL the API is served at, used in the links of the dumped objects, '
+                                 'e.g. https://api.hel.fi/linkedevents')
+        parser.add_argument('--filters', default='',
+                            help='list filters as a query string, e.g. "start=today&division=helsinki"')
+        parser.add_argument('--api-version', default='v1', choices=('v1', 'v0.1'))
+        parser.add_argument('--output', help='file to write the dump to, standard output by default')
+        parser.add_argument('--gzip', action='store_true', help='gzip the dump')
+
+    def handle(self, *args, **options):
+        base_url = urllib.parse.urlsplit(options['base_url'])
+        if base_url.scheme not in ('http', 'https') or not base_url.netloc:
+            raise CommandError("The base URL must be an absolute http or https URL.")
+        # the dump is made by the API view itself, so that it is identical to the dump endpoint
+        path = reverse('%s-dump' % options['resource'], kwargs={'version': options['api_version']})
+        match = resolve(path)
+        script_prefix = base_url.path.rstrip('/')
+        factory = RequestFactory(HTTP_HOST=base_url.netloc, SCRIPT_NAME=script_prefix)
+        request = factory.get(path, data=urllib.parse.parse_qsl(options['filters']),
+                              secure=base_url.scheme == 'https', HTTP_ACCEPT='application/x-ndjson')
+
+        original_script_prefix = get_script_prefix()
+        # the links of the objects are reversed with the script prefix of the API
+        set_script_prefix(script_prefix + '/')
+        try:
+            response = match.func(request, *match.args, **match.kwargs)
+            if response.status_code != 200:
+                response.render()
+                raise CommandError("Dumping failed: %s" % response.content.decode('utf-8'))
+            count = self.write(response.streaming_content, options['output'], options['gzip'])
+        finally:
+            set_script_prefix(original_script_prefix)
+        self.stderr.write("Dumped %d %ss." % (count, options['resource']))
+
+    def write(self, lines, path, use_gzip):
+        output = open(path, 'wb') if path else sys.stdout.buffer
+        stream = gzip.GzipFile(fileobj=output, mode='wb') if use_gzip else output
+        count = 0
+        try:
+            for line in lines:
+                stream.write(line)
+                count += 1
+        finally:
+            if stream is not output:
+                stream.close()
+            if path:
+                output.close()
+            else:
+                output.flush()
+        return count
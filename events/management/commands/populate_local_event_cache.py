@@ -1,19 +1,17 @@
 from datetime import datetime
 
 import pytz
-from django.core.cache import caches
 from django.core.management import BaseCommand
 
+from events import local_event_index
 from events.models import Event
 from linkedevents.settings import MUNIGEO_MUNI
 
 
 class Command(BaseCommand):
-    help = "Update local ongoing and upcoming events cache."
+    help = "Update the search index of local ongoing and upcoming events."
 
     def handle(self, *args, **options):
-        cache = caches['ongoing_local']
-
         local_events = Event.objects.filter(location__divisions__ocd_id__endswith=MUNIGEO_MUNI,
                                             end_time__gte=datetime.utcnow().replace(tzinfo=pytz.utc),
                                             deleted=False,
@@ -30,6 +28,5 @@ class Command(BaseCommand):
             event_dict[i[0]].update(i[1:])
             event_dict[i[0]].discard(None)
 
-        event_strings = {k: " ".join(v) for k, v in event_dict.items()}
-
-        cache.set('ids', event_strings)
+        token_count = local_event_index.build_index(event_dict)
+        print("Indexed %d local ongoing events with %d distinct tokens." % (len(event_dict), token_count))
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from events.models import BaseModel, Change
+from events.sql import assign_change_sequence_numbers
+
+
+class Command(BaseCommand):
+    help = "Delete the changes older than the retention period from the change feed. Run it periodically."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days',
+                            type=int,
+                            default=settings.CHANGE_RETENTION_DAYS,
+                            help='Keep the changes of this many days (default: %(default)s)')
+
+    def handle(self, days, **kwargs):
+        # changes are numbered when they are committed, this numbers any left over by an interrupted process
+        assign_change_sequence_numbers()
+        count = Change.objects.prune(BaseModel.now() - timedelta(days=days))
+        print("Deleted %d changes older than %d days." % (count, days))
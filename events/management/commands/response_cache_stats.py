@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+
+from events import response_cache
+
+
+class Command(BaseCommand):
+    help = "Show hit and miss statistics of the anonymous response cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset',
+                            default=False,
+                            action='store_true',
+                            help='Reset the statistics after showing them')
+
+    def handle(self, reset=False, **kwargs):
+        stats = response_cache.get_statistics()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        print("Response cache hits: %d, misses: %d, hit ratio: %.1f %%" % (stats['hits'], stats['misses'],
+                                                                           100 * ratio))
+        if reset:
+            response_cache.reset_statistics()
+            print("Statistics reset.")
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from events.sql import update_event_search_vectors
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full text search vectors of all events, e.g. after updating events or places with raw SQL."
+
+    def handle(self, *args, **options):
+        update_event_search_vectors(all=True)
+        print("Event search vectors updated.")
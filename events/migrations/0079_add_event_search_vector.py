@@ -0,0 +1,31 @@
+# Generated by Django 2.2.13 on 2020-08-17 10:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def forward(apps, schema_editor):
+    from events.sql import update_event_search_vectors
+    update_event_search_vectors(all=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0078_add_data_source_past_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'],
+                                                           name='events_event_search_vector_gin'),
+        ),
+        migrations.RunPython(forward, migrations.RunPython.noop),
+    ]
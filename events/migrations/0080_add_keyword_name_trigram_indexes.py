@@ -0,0 +1,29 @@
+# Generated by Django 2.2.13 on 2020-08-18 09:41
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0079_add_event_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='keyword',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name_fi'], name='events_keyword_name_fi_trgm',
+                                                           opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='keyword',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name_sv'], name='events_keyword_name_sv_trgm',
+                                                           opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='keyword',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name_en'], name='events_keyword_name_en_trgm',
+                                                           opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.13 on 2020-08-24 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0080_add_keyword_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('sequence', models.BigIntegerField(blank=True, null=True, unique=True)),
+                ('resource', models.CharField(max_length=16)),
+                ('object_id', models.CharField(max_length=100)),
+                ('action', models.CharField(choices=[('saved', 'Saved'), ('deleted', 'Deleted'),
+                                                     ('removed', 'Removed')], default='saved', max_length=16)),
+                ('created_time', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(condition=models.Q(sequence__isnull=True), fields=['id'],
+                               name='events_change_pending'),
+        ),
+        migrations.RunSQL('CREATE SEQUENCE events_change_sequence;', 'DROP SEQUENCE events_change_sequence;'),
+    ]
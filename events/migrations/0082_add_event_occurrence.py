@@ -0,0 +1,31 @@
+# Generated by Django 2.2.13 on 2020-08-25 09:30
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+def forward(apps, schema_editor):
+    from events.sql import update_event_time_fields
+    update_event_time_fields(all=True, fields=['occurrence'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0081_add_change'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='occurrence',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['occurrence'],
+                                                            name='events_event_occurrence_gist'),
+        ),
+        migrations.RunPython(forward, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.13 on 2020-08-26 11:05
+
+from django.db import migrations, models
+
+
+def forward(apps, schema_editor):
+    from events.sql import update_event_time_fields
+    update_event_time_fields(all=True, fields=['start_local_time', 'end_local_time', 'start_weekday'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0082_add_event_occurrence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='start_local_time',
+            field=models.TimeField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='end_local_time',
+            field=models.TimeField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='start_weekday',
+            field=models.SmallIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(forward, migrations.RunPython.noop),
+    ]
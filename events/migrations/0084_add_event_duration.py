@@ -0,0 +1,24 @@
+# Generated by Django 2.2.13 on 2020-08-27 08:47
+
+from django.db import migrations, models
+
+
+def forward(apps, schema_editor):
+    from events.sql import update_event_time_fields
+    update_event_time_fields(all=True, fields=['duration'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0083_add_event_local_times'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='duration',
+            field=models.DurationField(db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(forward, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.13 on 2020-08-28 13:20
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def forward(apps, schema_editor):
+    from events.sql import update_event_languages
+    update_event_languages(all=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0084_add_event_duration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='content_languages',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=10),
+                                                            default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='in_languages',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=10),
+                                                            default=list, editable=False, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['content_languages'],
+                                                           name='events_event_content_lang_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['in_languages'],
+                                                           name='events_event_in_lang_gin'),
+        ),
+        migrations.RunPython(forward, migrations.RunPython.noop),
+    ]
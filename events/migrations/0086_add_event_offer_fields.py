@@ -0,0 +1,67 @@
+# Generated by Django 2.2.13 on 2020-08-28 15:05
+
+import re
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+
+# copy of the price parsing of events.models at the time of this migration
+PRICE = r'(?:€\s*)?(\d{1,7}(?:[.,]\d{1,2})?)(?:\s*(?:€|e|eur|euro[a-zä]*|,-))?'
+PRICE_TEXT_RE = re.compile(r'^\s*{price}(?:\s*[-–/]\s*{price})*\s*$'.format(price=PRICE), re.IGNORECASE)
+PRICE_RE = re.compile(PRICE, re.IGNORECASE)
+
+
+def parse_price_range(price):
+    if not price or not PRICE_TEXT_RE.match(price):
+        return None
+    prices = [Decimal(value.replace(',', '.')) for value in PRICE_RE.findall(price)]
+    return min(prices), max(prices)
+
+
+def forward(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Offer = apps.get_model('events', 'Offer')
+    price_fields = ['price_%s' % code.replace('-', '_') for code, name in settings.LANGUAGES]
+    offer_fields = {}
+    for offer in Offer.objects.values('event_id', 'is_free', *price_fields).order_by('event_id'):
+        has_free_offer, price_ranges = offer_fields.setdefault(offer['event_id'], (False, []))
+        if offer['is_free']:
+            price_range = (0, 0)
+        else:
+            price_range = next(filter(None, (parse_price_range(offer[field]) for field in price_fields)), None)
+        if price_range:
+            price_ranges.append(price_range)
+        offer_fields[offer['event_id']] = (has_free_offer or offer['is_free'], price_ranges)
+    for event_id, (has_free_offer, price_ranges) in offer_fields.items():
+        Event.objects.filter(pk=event_id).update(
+            has_free_offer=has_free_offer,
+            price_min=min(low for low, high in price_ranges) if price_ranges else None,
+            price_max=max(high for low, high in price_ranges) if price_ranges else None,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0085_add_event_languages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='has_free_offer',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='price_min',
+            field=models.DecimalField(db_index=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='price_max',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.RunPython(forward, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.13 on 2020-08-31 10:12
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0086_add_event_offer_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['custom_data'],
+                                                           name='events_event_custom_data_gin'),
+        ),
+    ]
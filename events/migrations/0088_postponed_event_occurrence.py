@@ -0,0 +1,26 @@
+# Generated by Django 2.2.13 on 2020-09-01 09:40
+
+from django.db import migrations, models
+
+
+def forward(apps, schema_editor):
+    from events.sql import update_event_time_fields
+    Event = apps.get_model('events', 'Event')
+    # postponed events (status 3) no longer occur until further notice, but at their times like other events
+    postponed_ids = Event.objects.filter(event_status=3).values_list('id', flat=True)
+    update_event_time_fields(event_ids=postponed_ids, fields=['occurrence'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0087_add_event_custom_data_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(event_status=3), fields=['id'], name='events_event_postponed'),
+        ),
+        migrations.RunPython(forward, migrations.RunPython.noop),
+    ]
@@ -19,6 +19,10 @@ attribute to change @context when need to define schemas for custom fields.
 """
 import datetime
 import logging
+import re
+import time
+from collections import OrderedDict
+from decimal import Decimal
 from smtplib import SMTPException
 
 import pytz
@@ -26,7 +30,9 @@ from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db import models
-from django.contrib.postgres.fields import HStoreField
+from django.contrib.postgres.fields import ArrayField, DateTimeRangeField, HStoreField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.sites.models import Site
 from django.core.mail import send_mail
 from django.db import transaction
@@ -41,7 +47,10 @@ from munigeo.models import AdministrativeDivision
 from rest_framework.exceptions import ValidationError
 from reversion import revisions as reversion
 
-from events import translation_utils
+from events import response_cache, translation_utils
+from events.sql import (EVENT_CONTENT_FIELDS, EVENT_SEARCH_FIELDS, assign_change_sequence_numbers,
+                        get_keyword_replacements, insert_changes, update_event_languages,
+                        update_event_search_vectors, update_event_time_fields)
 from notifications.models import (NotificationTemplateException,
                                   NotificationType,
                                   render_notification_template)
@@ -287,6 +296,11 @@ class UpcomingEventsUpdater(models.Manager):
             qs = qs.filter(deprecated=False)
         elif self.model.__name__ == 'Place':
             qs = qs.filter(deleted=False)
+        resource = self.model._meta.model_name
+        Change.objects.record_queryset(
+            qs.filter(events__end_time__gte=now).exclude(has_upcoming_events=True), resource)
+        Change.objects.record_queryset(
+            qs.exclude(events__end_time__gte=now).filter(has_upcoming_events=True), resource)
         qs.filter(events__end_time__gte=now).update(has_upcoming_events=True)
         qs.exclude(events__end_time__gte=now).update(has_upcoming_events=False)
 
@@ -353,8 +367,17 @@ class Keyword(BaseModel, ImageMixin, ReplacedByMixin):
                 pass
 
         super().save(*args, **kwargs)
+        response_cache.bump_generation('keyword')
+        # the event count flag is internal, and not a change of the keyword
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) - {'n_events_changed'}:
+            Change.objects.record('keyword', [self.id])
+        # clear again on commit, in case the old replacements were memoized in the meantime
+        keyword_replacements.clear()
+        transaction.on_commit(keyword_replacements.clear)
 
         if not old_replaced_by == self.replaced_by:
+            response_cache.bump_generation('event')
             # Remap keyword sets
             qs = KeywordSet.objects.filter(keywords__id__exact=self.id)
             for kw_set in qs:
@@ -382,6 +405,49 @@ class Keyword(BaseModel, ImageMixin, ReplacedByMixin):
     class Meta:
         verbose_name = _('keyword')
         verbose_name_plural = _('keywords')
+        # trigram indexes for the similarity searches of keyword names
+        indexes = [
+            GinIndex(fields=['name_fi'], name='events_keyword_name_fi_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['name_sv'], name='events_keyword_name_sv_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['name_en'], name='events_keyword_name_en_trgm', opclasses=['gin_trgm_ops']),
+        ]
+
+
+class KeywordReplacementCache(object):
+    """
+    In-process memo of keyword ids to the ids of the keywords finally replacing them.
+
+    The memo is cleared when a keyword is saved in this process, and expires
+    after KEYWORD_REPLACEMENT_CACHE_TIMEOUT seconds to pick up the changes made in other processes.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._replacements = {}
+        self._expires = time.monotonic() + getattr(settings, 'KEYWORD_REPLACEMENT_CACHE_TIMEOUT', 300)
+
+    def resolve(self, keyword_ids):
+        """
+        Get the keywords finally replacing the given keywords, with at most one query.
+
+        :param keyword_ids: keyword ids
+        :type keyword_ids: Iterable[str]
+        :return: dict of keyword id to the id of the keyword replacing it, or itself if not replaced.
+                 Unknown keyword ids are left out.
+        :rtype: dict[str, str]
+        """
+        if time.monotonic() > self._expires:
+            self.clear()
+        replacements = self._replacements
+        keyword_ids = set(keyword_ids)
+        missing = keyword_ids - replacements.keys()
+        if missing:
+            replacements.update(get_keyword_replacements(missing))
+        return {kid: replacements[kid] for kid in keyword_ids if kid in replacements}
+
+
+keyword_replacements = KeywordReplacementCache()
 
 
 class KeywordSet(BaseModel, ImageMixin):
@@ -481,17 +547,31 @@ class Place(MPTTModel, BaseModel, SchemalessFieldMixin, ImageMixin, ReplacedByMi
 
         # needed to remap events to replaced location
         old_replaced_by = None
+        # needed to update the search vectors of the events in this place
+        search_fields_changed = False
         if self.id:
             try:
-                old_replaced_by = Place.objects.get(id=self.id).replaced_by
+                old_place = Place.objects.get(id=self.id)
+                old_replaced_by = old_place.replaced_by
+                search_fields_changed = any(getattr(old_place, field) != getattr(self, field)
+                                            for field in self.get_event_search_fields())
             except Place.DoesNotExist:
                 pass
 
         super().save(*args, **kwargs)
+        response_cache.bump_generation('place')
+        Change.objects.record('place', [self.id], Change.DELETED if self.deleted else Change.SAVED)
+
+        if search_fields_changed:
+            update_event_search_vectors(place_ids=[self.id])
 
         # needed to remap events to replaced location
         if not old_replaced_by == self.replaced_by:
+            Change.objects.record_queryset(Event.objects.filter(location=self), 'event')
             Event.objects.filter(location=self).update(location=self.replaced_by)
+            if self.replaced_by:
+                update_event_search_vectors(place_ids=[self.replaced_by.id])
+            response_cache.bump_generation('event')
             # Update doesn't call save so we update event numbers manually.
             # Not all of the below are necessarily present.
             ids_to_update = [event.id for event in (self, self.replaced_by, old_replaced_by) if event]
@@ -510,6 +590,15 @@ class Place(MPTTModel, BaseModel, SchemalessFieldMixin, ImageMixin, ReplacedByMi
         else:
             return user in self.publisher.admin_users.all()
 
+    @staticmethod
+    def get_event_search_fields():
+        """
+        Get the translated fields of places included in the search vectors of their events.
+        """
+        return ['%s_%s' % (field, code.replace('-', '_'))
+                for fields in EVENT_SEARCH_FIELDS.values() for alias, field in fields if alias == 'p'
+                for code, name in settings.LANGUAGES]
+
     def soft_delete(self, using=None):
         self.deleted = True
         self.save(update_fields=("deleted",), using=using, force_update=True)
@@ -549,6 +638,16 @@ class OpeningHoursSpecification(models.Model):
         verbose_name_plural = _('opening hour specifications')
 
 
+# updating fields with these prefixes changes the search vector of the event
+EVENT_SEARCH_FIELD_PREFIXES = tuple(
+    field for fields in EVENT_SEARCH_FIELDS.values() for alias, field in fields if alias == 'e') + ('location',)
+# updating these fields changes the fields computed from the times of the event
+EVENT_TIME_FIELDS = ('start_time', 'end_time', 'has_start_time', 'has_end_time')
+# fields computed from the other fields of the event for filtering, which are not part of the API
+EVENT_COMPUTED_FIELDS = ('search_vector', 'occurrence', 'start_local_time', 'end_local_time', 'start_weekday',
+                         'duration', 'content_languages', 'in_languages', 'has_free_offer', 'price_min', 'price_max')
+
+
 class Event(MPTTModel, BaseModel, SchemalessFieldMixin, ReplacedByMixin):
     jsonld_type = "Event/LinkedEvent"
     objects = BaseTreeQuerySet.as_manager()
@@ -645,9 +744,39 @@ class Event(MPTTModel, BaseModel, SchemalessFieldMixin, ReplacedByMixin):
     keywords = models.ManyToManyField(Keyword, related_name='events')
     audience = models.ManyToManyField(Keyword, related_name='audience_events', blank=True)
 
+    # full text search vector of the translated fields of the event and its location,
+    # maintained by save() with events.sql.update_event_search_vectors
+    search_vector = SearchVectorField(null=True, editable=False)
+    # time range matched by the start and end filters, maintained by save() with events.sql.update_event_time_fields
+    occurrence = DateTimeRangeField(null=True, editable=False)
+    # local times of day and ISO weekday (1 is Monday), maintained likewise
+    start_local_time = models.TimeField(null=True, editable=False, db_index=True)
+    end_local_time = models.TimeField(null=True, editable=False, db_index=True)
+    start_weekday = models.SmallIntegerField(null=True, editable=False, db_index=True)
+    # for filtering and sorting by duration, maintained likewise
+    duration = models.DurationField(null=True, editable=False, db_index=True)
+    # languages with content in the translated fields, and the in_language ids, maintained by save() and
+    # in_language changes with events.sql.update_event_languages
+    content_languages = ArrayField(models.CharField(max_length=10), default=list, editable=False)
+    in_languages = ArrayField(models.CharField(max_length=10), default=list, editable=False)
+    # summary of the offers of the event, maintained with update_offer_fields() whenever the event or its offers
+    # are saved
+    has_free_offer = models.BooleanField(default=False, editable=False, db_index=True)
+    price_min = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False, db_index=True)
+    price_max = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+
     class Meta:
         verbose_name = _('event')
         verbose_name_plural = _('events')
+        indexes = [
+            GinIndex(fields=['search_vector'], name='events_event_search_vector_gin'),
+            GistIndex(fields=['occurrence'], name='events_event_occurrence_gist'),
+            GinIndex(fields=['content_languages'], name='events_event_content_lang_gin'),
+            GinIndex(fields=['in_languages'], name='events_event_in_lang_gin'),
+            GinIndex(fields=['custom_data'], name='events_event_custom_data_gin'),
+            # postponed events (Status.POSTPONED) are listed when no end is given, whatever their occurrence
+            models.Index(fields=['id'], name='events_event_postponed', condition=models.Q(event_status=3)),
+        ]
 
     class MPTTMeta:
         parent_attr = 'super_event'
@@ -664,6 +793,8 @@ class Event(MPTTModel, BaseModel, SchemalessFieldMixin, ReplacedByMixin):
 
         # needed to cache location event numbers
         old_location = None
+        # needed to record the change of the sub events of the old super event
+        old_super_event_id = None
 
         # needed for notifications
         old_publication_status = None
@@ -675,6 +806,7 @@ class Event(MPTTModel, BaseModel, SchemalessFieldMixin, ReplacedByMixin):
                 event = Event.objects.get(id=self.id)
                 created = False
                 old_location = event.location
+                old_super_event_id = event.super_event_id
                 old_publication_status = event.publication_status
                 old_deleted = event.deleted
             except Event.DoesNotExist:
@@ -695,6 +827,23 @@ class Event(MPTTModel, BaseModel, SchemalessFieldMixin, ReplacedByMixin):
                                                  ". Please use up-to-date keywords.")})
 
         super(Event, self).save(*args, **kwargs)
+        # the super events list their sub events, so their cached responses are stale too
+        response_cache.bump_generation('event', self.id, self.super_event_id, old_super_event_id)
+        # both records are numbered together once committed
+        with transaction.atomic():
+            Change.objects.record('event', [self.id], Change.DELETED if self.deleted else Change.SAVED)
+            Change.objects.record('event', [self.super_event_id, old_super_event_id])
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or any(field.startswith(EVENT_SEARCH_FIELD_PREFIXES) for field in update_fields):
+            update_event_search_vectors(event_ids=[self.id])
+        if update_fields is None or set(update_fields) & set(EVENT_TIME_FIELDS):
+            update_event_time_fields(event_ids=[self.id])
+        if update_fields is None or any(field.startswith(EVENT_CONTENT_FIELDS) for field in update_fields):
+            update_event_languages(event_ids=[self.id])
+        if update_fields is None:
+            # a full save writes the offer summary of the instance, which may predate changes to the offers
+            self.update_offer_fields()
 
         # needed to cache location event numbers
         if not old_location and self.location:
@@ -750,6 +899,24 @@ class Event(MPTTModel, BaseModel, SchemalessFieldMixin, ReplacedByMixin):
         self.deleted = False
         self.save(update_fields=("deleted",), using=using, force_update=True)
 
+    def update_offer_fields(self):
+        """
+        Update the free offer flag and the price range of the event from its offers, if they have changed.
+        """
+        # the offers may have been prefetched before they were rewritten
+        offers = list(Offer.objects.filter(event=self))
+        price_ranges = [price_range for price_range in map(Offer.get_price_range, offers) if price_range]
+        values = {
+            'has_free_offer': any(offer.is_free for offer in offers),
+            'price_min': min(low for low, high in price_ranges) if price_ranges else None,
+            'price_max': max(high for low, high in price_ranges) if price_ranges else None,
+        }
+        if all(getattr(self, field) == value for field, value in values.items()):
+            return
+        for field, value in values.items():
+            setattr(self, field, value)
+        Event.objects.filter(pk=self.pk).update(**values)
+
     def _send_notification(self, notification_type, recipient_list, request=None):
         if len(recipient_list) == 0:
             logger.warning("No recipients for notification type '%s'" % notification_type, extra={'event': self})
@@ -807,11 +974,51 @@ def keyword_added_or_removed(sender, model=None,
     if action in ('post_add', 'post_remove'):
         if model is Keyword:
             Keyword.objects.filter(pk__in=pk_set).update(n_events_changed=True)
+            response_cache.bump_generation('event', instance.id)
+            Change.objects.record('event', [instance.id], Change.DELETED if instance.deleted else Change.SAVED)
         if model is Event:
+            Change.objects.record_queryset(Event.objects.filter(pk__in=pk_set), 'event')
             instance.n_events_changed = True
             instance.save(update_fields=("n_events_changed",))
 
 
+@receiver(m2m_changed, sender=Event.in_language.through)
+def in_language_changed(sender, model=None, instance=None, pk_set=None, action=None, **kwargs):
+    """
+    Listens to event language changes to keep the in_language ids of events up to date
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if model is Language:
+        update_event_languages(event_ids=[instance.id])
+    elif action == 'post_clear':
+        # the events of a cleared language are no longer known
+        update_event_languages(all=True)
+    else:
+        update_event_languages(event_ids=pk_set)
+
+
+# a price text consisting of prices only, e.g. "10 €", "8-12 e" or "€15 / €10"
+PRICE = r'(?:€\s*)?(\d{1,7}(?:[.,]\d{1,2})?)(?:\s*(?:€|e|eur|euro[a-zä]*|,-))?'
+PRICE_TEXT_RE = re.compile(r'^\s*{price}(?:\s*[-–/]\s*{price})*\s*$'.format(price=PRICE), re.IGNORECASE)
+PRICE_RE = re.compile(PRICE, re.IGNORECASE)
+
+
+def parse_price_range(price):
+    """
+    Parse the lowest and highest price from a price text, if the text consists of prices only.
+
+    :param price: price text of an offer
+    :type price: str|None
+    :return: tuple of the lowest and highest price, or None
+    :rtype: tuple[Decimal, Decimal]|None
+    """
+    if not price or not PRICE_TEXT_RE.match(price):
+        return None
+    prices = [Decimal(value.replace(',', '.')) for value in PRICE_RE.findall(price)]
+    return min(prices), max(prices)
+
+
 class Offer(models.Model, SimpleValueMixin):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, db_index=True, related_name='offers')
     price = models.CharField(verbose_name=_('Price'), blank=True, max_length=1000)
@@ -824,6 +1031,18 @@ class Offer(models.Model, SimpleValueMixin):
     def value_fields(self):
         return ['price', 'info_url', 'description', 'is_free']
 
+    def get_price_range(self):
+        """
+        Get the lowest and highest price of the offer, from the first translation of the price that can be parsed.
+        """
+        if self.is_free:
+            return Decimal(0), Decimal(0)
+        for code, name in settings.LANGUAGES:
+            price_range = parse_price_range(getattr(self, 'price_%s' % code.replace('-', '_'), None))
+            if price_range:
+                return price_range
+        return None
+
 
 reversion.register(Offer)
 
@@ -880,3 +1099,92 @@ class EventAggregate(models.Model):
 class EventAggregateMember(models.Model):
     event_aggregate = models.ForeignKey(EventAggregate, on_delete=models.CASCADE, related_name='members')
     event = models.OneToOneField(Event, on_delete=models.CASCADE)
+
+
+class ChangeManager(models.Manager):
+    def record(self, resource, object_ids, action='saved'):
+        """
+        Record a change of each of the given objects.
+
+        :param resource: name of the resource of the objects, e.g. event
+        :type resource: str
+        :param object_ids: ids of the changed objects, empty ids are skipped
+        :type object_ids: Iterable[str]
+        :param action: recorded action
+        :type action: str
+        """
+        now = BaseModel.now()
+        changes = self.bulk_create([self.model(resource=resource, object_id=object_id, action=action,
+                                               created_time=now)
+                                    for object_id in OrderedDict.fromkeys(object_ids) if object_id])
+        if changes:
+            self.number_on_commit()
+
+    def record_queryset(self, queryset, resource, action='saved'):
+        """
+        Record a change of each object of the given queryset, without fetching the objects.
+
+        Soft deleted objects are recorded as deleted, whatever the given action.
+        """
+        now = BaseModel.now()
+        if any(field.name == 'deleted' for field in queryset.model._meta.concrete_fields):
+            insert_changes(queryset.filter(deleted=False), resource, action, now)
+            insert_changes(queryset.filter(deleted=True), resource, self.model.DELETED, now)
+        else:
+            insert_changes(queryset, resource, action, now)
+        self.number_on_commit()
+
+    def number_on_commit(self):
+        # the changes are numbered in the order they are committed, see assign_change_sequence_numbers.
+        # all the changes of a transaction are numbered at once, and rolled back callbacks are discarded
+        connection = transaction.get_connection()
+        if not any(callback[1] is assign_change_sequence_numbers for callback in connection.run_on_commit):
+            transaction.on_commit(assign_change_sequence_numbers)
+
+    def prune(self, before, batch_size=10000):
+        """
+        Delete the numbered changes recorded before the given time, in batches.
+
+        :return: number of deleted changes
+        :rtype: int
+        """
+        count = 0
+        while True:
+            ids = list(self.filter(sequence__isnull=False, created_time__lt=before)
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return count
+            count += self.filter(id__in=ids).delete()[0]
+
+
+class Change(models.Model):
+    """
+    Change of an event, place or keyword, for clients synchronising the objects incrementally.
+
+    Changes are recorded in the transaction making them, and numbered right after it commits, so that
+    the sequence numbers grow in commit order. See events.sql.assign_change_sequence_numbers. The changes
+    older than settings.CHANGE_RETENTION_DAYS are deleted with the prune_changes management command.
+    """
+    SAVED = 'saved'
+    DELETED = 'deleted'
+    REMOVED = 'removed'
+    ACTIONS = (
+        (SAVED, _('Saved')),
+        (DELETED, _('Deleted')),
+        (REMOVED, _('Removed')),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    sequence = models.BigIntegerField(null=True, blank=True, unique=True)
+    resource = models.CharField(max_length=16)
+    object_id = models.CharField(max_length=100)
+    action = models.CharField(max_length=16, choices=ACTIONS, default=SAVED)
+    created_time = models.DateTimeField()
+
+    objects = ChangeManager()
+
+    class Meta:
+        indexes = [
+            # the changes yet to be numbered
+            models.Index(fields=['id'], name='events_change_pending', condition=models.Q(sequence__isnull=True)),
+        ]
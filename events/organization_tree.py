@@ -0,0 +1,89 @@
+"""
+Resolution of organizations and their descendants to MPTT tree ranges.
+
+The descendants of an organization are the organizations of the same tree whose lft and rght lie
+between those of the organization. A set of root organizations is resolved to such ranges in a
+single query, and the ranges are used as predicates instead of listing the ids of all descendants.
+"""
+from django.db.models import Q, QuerySet
+from django_orghierarchy.models import Organization
+
+
+def resolve_tree_ranges(organization_ids, include_replacements=True):
+    """
+    Get the tree ranges covering the given organizations and their descendants.
+
+    :param organization_ids: ids of the root organizations, or a values queryset resolved as a subquery
+    :type organization_ids: Iterable[str]|QuerySet
+    :param include_replacements: also cover the organizations replacing the given ones
+    :type include_replacements: bool
+    :return: tuple of (tree_id, lft, rght) ranges, none of which is contained in another
+    :rtype: tuple[tuple[int, int, int]]
+    """
+    if not isinstance(organization_ids, QuerySet):
+        organization_ids = list(organization_ids)
+        if not organization_ids:
+            return ()
+    query = Q(id__in=organization_ids)
+    if include_replacements:
+        query |= Q(replaced_organization__in=organization_ids)
+    rows = Organization.objects.filter(query).order_by('tree_id', 'lft').values_list('tree_id', 'lft', 'rght')
+    return merge_tree_ranges(rows)
+
+
+def merge_tree_ranges(rows):
+    """
+    Get the tree ranges of the given organizations, leaving out the ranges contained in others.
+
+    :param rows: (tree_id, lft, rght) of the organizations
+    :type rows: Iterable[tuple[int, int, int]]
+    :rtype: tuple[tuple[int, int, int]]
+    """
+    ranges = []
+    for tree_id, lft, rght in sorted(rows):
+        # mptt ranges are either nested or disjoint, and ancestors are sorted before their descendants
+        if ranges and ranges[-1][0] == tree_id and rght <= ranges[-1][2]:
+            continue
+        ranges.append((tree_id, lft, rght))
+    return tuple(ranges)
+
+
+def tree_ranges_query(ranges, prefix=''):
+    """
+    Get the query matching the organizations within the given tree ranges.
+
+    :param ranges: tree ranges returned by resolve_tree_ranges
+    :param prefix: lookup prefix of the organization, e.g. 'publisher__'
+    :return: Q object, matching nothing if there are no ranges
+    """
+    if not ranges:
+        return Q(**{prefix + 'pk__in': []})
+    query = Q()
+    for tree_id, lft, rght in ranges:
+        query |= Q(**{prefix + 'tree_id': tree_id, prefix + 'lft__gte': lft, prefix + 'rght__lte': rght})
+    return query
+
+
+def in_tree_ranges(organization, ranges):
+    """Check without queries whether the organization is within the given tree ranges."""
+    if organization is None:
+        return False
+    return any(organization.tree_id == tree_id and lft <= organization.lft and organization.rght <= rght
+               for tree_id, lft, rght in ranges)
+
+
+class OrganizationTreeResolver:
+    """
+    Memoizing resolver of tree ranges.
+
+    The ranges are not invalidated when the organizations change, so a resolver should only be used
+    for the duration of a single request.
+    """
+    def __init__(self):
+        self._ranges = {}
+
+    def get_tree_ranges(self, organization_ids, include_replacements=True):
+        key = (frozenset(organization_ids), include_replacements)
+        if key not in self._ranges:
+            self._ranges[key] = resolve_tree_ranges(key[0], include_replacements)
+        return self._ranges[key]
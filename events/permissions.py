@@ -1,7 +1,103 @@
-from functools import reduce
+import hashlib
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
 from .models import PublicationStatus
+from .organization_tree import in_tree_ranges, merge_tree_ranges, resolve_tree_ranges, tree_ranges_query
 from django_orghierarchy.models import Organization
 
+PERMISSION_CONTEXT_CACHE_PREFIX = 'permission_context'
+
+
+class PermissionContext(namedtuple('PermissionContext', [
+        'admin_organization_ids', 'admin_tree_ranges', 'own_admin_tree_ranges', 'admin_tree_ids',
+        'member_organization_ids'])):
+    """Immutable snapshot of the organizations of a user, answering permission checks without queries
+
+    admin_tree_ranges cover the admin organizations, the organizations replacing them and all their
+    descendants, own_admin_tree_ranges only the admin organizations and their descendants.
+    admin_tree_ids are the trees of the normal admin organizations and their replacements.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def build(cls, user):
+        admin_rows = list(user.admin_organizations.values_list(
+            'id', 'internal_type', 'tree_id', 'lft', 'rght', 'replaced_by__tree_id'))
+        admin_organization_ids = frozenset(row[0] for row in admin_rows)
+        admin_tree_ids = set()
+        for organization_id, internal_type, tree_id, lft, rght, replaced_by_tree_id in admin_rows:
+            if internal_type == Organization.NORMAL:
+                admin_tree_ids.add(tree_id)
+                if replaced_by_tree_id is not None:
+                    admin_tree_ids.add(replaced_by_tree_id)
+        # admins of replaced organizations have rights to the replacing organizations, too!
+        return cls(
+            admin_organization_ids=admin_organization_ids,
+            admin_tree_ranges=resolve_tree_ranges(admin_organization_ids),
+            own_admin_tree_ranges=merge_tree_ranges(row[2:5] for row in admin_rows),
+            admin_tree_ids=frozenset(admin_tree_ids),
+            member_organization_ids=frozenset(user.organization_memberships.values_list('id', flat=True)),
+        )
+
+    def is_admin(self, publisher, include_replacements=True):
+        ranges = self.admin_tree_ranges if include_replacements else self.own_admin_tree_ranges
+        return in_tree_ranges(publisher, ranges)
+
+    def is_member(self, publisher):
+        return publisher is not None and publisher.pk in self.member_organization_ids
+
+
+def _generation_key():
+    return '%s:generation' % PERMISSION_CONTEXT_CACHE_PREFIX
+
+
+def _context_key(generation, user):
+    # user ids may contain characters memcached does not accept in keys
+    digest = hashlib.md5(('%s:%s' % (type(user).__name__, user.pk)).encode('utf-8')).hexdigest()
+    return '%s:%s:%s' % (PERMISSION_CONTEXT_CACHE_PREFIX, generation, digest)
+
+
+def get_permission_context(user):
+    """
+    Get the permission context of the user, cached in the default cache if PERMISSION_CONTEXT_CACHE_TIMEOUT is set.
+
+    The cached contexts are invalidated together whenever organizations or their users change.
+    """
+    timeout = getattr(settings, 'PERMISSION_CONTEXT_CACHE_TIMEOUT', 0)
+    if timeout <= 0:
+        return PermissionContext.build(user)
+    cache = caches['default']
+    generation = cache.get(_generation_key())
+    if generation is None:
+        # an evicted counter must never restart from a value that was already used
+        generation = int(time.time() * 1000)
+        cache.add(_generation_key(), generation, timeout=None)
+    key = _context_key(generation, user)
+    context = cache.get(key)
+    if context is None:
+        context = PermissionContext.build(user)
+        cache.set(key, context, timeout=timeout)
+    return context
+
+
+def invalidate_permission_contexts():
+    """Invalidate the cached permission contexts of all users after the current transaction commits."""
+    if getattr(settings, 'PERMISSION_CONTEXT_CACHE_TIMEOUT', 0) <= 0:
+        return
+
+    def bump():
+        cache = caches['default']
+        try:
+            cache.incr(_generation_key())
+        except ValueError:
+            cache.set(_generation_key(), int(time.time() * 1000), timeout=None)
+    transaction.on_commit(bump)
+
 
 class UserModelPermissionMixin:
     """Permission mixin for user models
@@ -40,27 +136,40 @@ class UserModelPermissionMixin:
         return queryset.filter(
             publisher__in=self.get_admin_organizations_and_descendants()
         ) | queryset.filter(
-            publication_status=PublicationStatus.DRAFT, publisher__in=self.organization_memberships.all()
+            publication_status=PublicationStatus.DRAFT,
+            publisher__in=self.get_permission_context().member_organization_ids,
         )
 
+    def get_permission_context(self):
+        # the context is cached in the user object, which is cleared at the start of every request
+        context = getattr(self, '_permission_context', None)
+        if context is None:
+            context = get_permission_context(self)
+            self._permission_context = context
+        return context
+
+    def clear_permission_cache(self):
+        self._permission_context = None
+
     def get_admin_tree_ids(self):
         # returns tree ids for all normal admin organizations and their replacements
-        admin_queryset = self.admin_organizations.filter(internal_type='normal').select_related('replaced_by')
-        admin_tree_ids = admin_queryset.values('tree_id')
-        admin_replaced_tree_ids = admin_queryset.filter(replaced_by__isnull=False).values('replaced_by__tree_id')
-        return (set(value['tree_id'] for value in admin_tree_ids) |
-                set(value['replaced_by__tree_id'] for value in admin_replaced_tree_ids))
+        return set(self.get_permission_context().admin_tree_ids)
+
+    def get_admin_tree_ranges(self):
+        # returns the tree ranges of admin organizations, their replacements and their descendants
+        return self.get_permission_context().admin_tree_ranges
+
+    def is_admin_of_tree(self, publisher, include_replacements=True):
+        """Check if current user is an admin user of the publisher organization or any of its ancestors
+
+        With include_replacements, admins of replaced organizations are admins of the replacing organizations, too.
+        """
+        return self.get_permission_context().is_admin(publisher, include_replacements)
 
     def get_admin_organizations_and_descendants(self):
         # returns admin organizations and their descendants
-        if not self.admin_organizations.all():
+        ranges = self.get_admin_tree_ranges()
+        if not ranges:
             return Organization.objects.none()
         # regular admins have rights to all organizations below their level
-        admin_orgs = []
-        for admin_org in self.admin_organizations.all():
-            admin_orgs.append(admin_org.get_descendants(include_self=True))
-            if admin_org.replaced_by:
-                # admins of replaced organizations have these rights, too!
-                admin_orgs.append(admin_org.replaced_by.get_descendants(include_self=True))
-        # for multiple admin_orgs, we have to combine the querysets and filter distinct
-        return reduce(lambda a, b: a | b, admin_orgs).distinct()
+        return Organization.objects.filter(tree_ranges_query(ranges))
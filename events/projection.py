@@ -0,0 +1,147 @@
+"""
+Read-only projection of events into lightweight rows, for serializing event lists without model instances.
+
+The rows are fetched with values(), and carry the column values of the events as attributes, so that
+the event serializers represent them exactly like model instances. The related objects of a page of
+rows are fetched in one query per relation: links as (event id, related id) pairs from the relation
+tables, and the nested offers, links and videos as rows of their own.
+
+Only the relations displayed by the event serializer without includes or extensions are attached.
+"""
+from collections import defaultdict
+
+from rest_framework.relations import PKOnlyObject
+
+from events.models import EVENT_COMPUTED_FIELDS, Event, EventLink, Offer, Video
+
+# relations displayed as links to the related objects
+LINKED_RELATIONS = ('keywords', 'audience', 'in_language')
+# relations displayed as expanded objects, which are fetched as model instances
+EXPANDED_RELATIONS = ('images',)
+# reverse relations displayed as nested objects
+NESTED_RELATIONS = (('offers', Offer), ('external_links', EventLink), ('videos', Video))
+# sub events are displayed as links, and with their times in summary mode
+SUB_EVENT_FIELDS = ('id', 'super_event_id', 'start_time', 'end_time', 'has_start_time', 'has_end_time')
+# computed fields are never displayed, but the duration is needed for cursors when sorting by it
+EXCLUDED_FIELDS = tuple(name for name in EVENT_COMPUTED_FIELDS if name != 'duration')
+
+
+class RelatedRows(list):
+    """List of related rows, standing in for the related manager of a model instance."""
+    def all(self):
+        return self
+
+
+class ProjectedRow(object):
+    """Values of a database row as attributes, standing in for a model instance when serializing."""
+    _meta = None
+
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+    @property
+    def pk(self):
+        return getattr(self, self._meta.pk.attname)
+
+    def serializable_value(self, field_name):
+        return getattr(self, self._meta.get_field(field_name).attname)
+
+
+def _row_class(model):
+    attrs = {'_meta': model._meta}
+    if hasattr(model, 'jsonld_type'):
+        attrs['jsonld_type'] = model.jsonld_type
+    return type('Projected%s' % model.__name__, (ProjectedRow,), attrs)
+
+
+EventRow = _row_class(Event)
+ROW_CLASSES = {model: _row_class(model) for relation, model in NESTED_RELATIONS}
+
+
+def _project(queryset, row_class, field_names):
+    queryset = queryset.values(*field_names)
+    # values() yields dicts, the projected rows are built directly from them instead
+    values_iterable = queryset._iterable_class
+
+    class RowIterable(values_iterable):
+        def __iter__(self):
+            for values in super().__iter__():
+                yield row_class(values)
+    queryset._iterable_class = RowIterable
+    return queryset
+
+
+def project_events(queryset):
+    """
+    Get the given event queryset as a queryset of event rows.
+
+    Annotations and extra selects of the queryset, e.g. for ordering, are kept in the rows. If the
+    queryset is restricted with only() or defer(), the deferred columns are not fetched either.
+    """
+    deferred_names, defer = queryset.query.deferred_loading
+    fields = [field for field in Event._meta.concrete_fields if field.name not in EXCLUDED_FIELDS]
+    if defer:
+        fields = [field for field in fields if field.name not in deferred_names]
+    elif deferred_names:
+        fields = [field for field in fields if field.name in deferred_names or field.primary_key]
+    field_names = [field.attname for field in fields]
+    field_names += list(queryset.query.extra_select) + list(queryset.query.annotation_select)
+    return _project(queryset.select_related(None).prefetch_related(None), EventRow, field_names)
+
+
+def attach_related(rows, omitted=()):
+    """
+    Fetch the related objects of the given event rows, and attach them to the rows.
+
+    :param rows: event rows from project_events
+    :type rows: list[ProjectedRow]
+    :param omitted: names of the relations not displayed, which are not fetched
+    :type omitted: Iterable[str]
+    """
+    if not rows:
+        return
+    omitted = set(omitted)
+    event_ids = [row.id for row in rows]
+    related = defaultdict(lambda: defaultdict(RelatedRows))
+
+    for name in (name for name in LINKED_RELATIONS if name not in omitted):
+        field = Event._meta.get_field(name)
+        through = field.remote_field.through
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        pairs = through.objects.filter(**{source + '_id__in': event_ids}).values_list(source + '_id', target + '_id')
+        for event_id, related_id in pairs:
+            related[name][event_id].append(PKOnlyObject(pk=related_id))
+
+    for name in (name for name in EXPANDED_RELATIONS if name not in omitted):
+        field = Event._meta.get_field(name)
+        through = field.remote_field.through
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        links = through.objects.filter(**{source + '_id__in': event_ids}).select_related(target)
+        for link in links:
+            related[name][getattr(link, source + '_id')].append(getattr(link, target))
+
+    for name, model in NESTED_RELATIONS:
+        if name in omitted:
+            continue
+        fk = Event._meta.get_field(name).field
+        field_names = [field.attname for field in model._meta.concrete_fields]
+        for row in _project(model.objects.filter(**{fk.attname + '__in': event_ids}), ROW_CLASSES[model],
+                            field_names):
+            related[name][getattr(row, fk.attname)].append(row)
+
+    if 'sub_events' not in omitted:
+        # deleted sub events are never displayed
+        sub_events = _project(Event.objects.filter(super_event_id__in=event_ids, deleted=False), EventRow,
+                              SUB_EVENT_FIELDS)
+        for sub_event in sub_events:
+            related['sub_events'][sub_event.super_event_id].append(sub_event)
+
+    relation_names = LINKED_RELATIONS + EXPANDED_RELATIONS + tuple(name for name, model in NESTED_RELATIONS)
+    relation_names = tuple(name for name in relation_names if name not in omitted)
+    for row in rows:
+        for name in relation_names:
+            setattr(row, name, related[name].get(row.id, RelatedRows()))
+        if 'sub_events' not in omitted:
+            row.sub_events = related['sub_events'].get(row.id, RelatedRows())
+            # the serializer uses prefetched sub events as they are
+            row._prefetched_objects_cache = {'sub_events': row.sub_events}
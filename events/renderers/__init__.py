@@ -1,3 +1,3 @@
 # These are imported for package level imports elsewhere
-from events.renderers.json import JSONRenderer, JSONLDRenderer  # noqa
+from events.renderers.json import JSONRenderer, JSONLDRenderer, NDJSONRenderer  # noqa
 from events.renderers.docx import DOCXRenderer  # noqa
@@ -8,8 +8,50 @@ class JSONRenderer(renderers.JSONRenderer):
         return super(JSONRenderer, self).render(data, media_type,
                                                 renderer_context)
 
+    def render_stream(self, objects, meta=None, media_type=None, renderer_context=None):
+        """
+        Encode a list piece by piece, as it is consumed.
+
+        The output is the same as rendering {"meta": meta, "data": [objects]} at once, or only the
+        list of objects if there is no meta.
+
+        :param objects: representations of the listed objects
+        :type objects: Iterable[dict]
+        :param meta: pagination metadata
+        :type meta: dict|None
+        """
+        if meta is not None:
+            yield b'{"meta":' + self.render(meta, media_type, renderer_context) + b',"data":'
+        yield b'['
+        for i, obj in enumerate(objects):
+            if i:
+                yield b','
+            yield self.render(obj, media_type, renderer_context)
+        yield b']'
+        if meta is not None:
+            yield b'}'
+
 
 class JSONLDRenderer(JSONRenderer):
     media_type = 'application/ld+json'
     format = 'json-ld'
     charset = 'utf-8'
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """
+    Newline-delimited JSON, one line for each object of a list.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+    content_type = 'application/x-ndjson; charset=utf-8'
+    json_renderer_class = JSONRenderer
+
+    def render(self, data, media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        objects = data if isinstance(data, list) else [data]
+        json_renderer = self.json_renderer_class()
+        # compact JSON has no newlines, as they are escaped in strings
+        return b''.join(json_renderer.render(obj) + b'\n' for obj in objects)
@@ -0,0 +1,185 @@
+"""
+Shared cache for rendered anonymous read responses.
+
+Each cached response is keyed by the generations of the models it depends on. Saving a model
+bumps its generation, so stale entries are simply never read again and expire on their own.
+Event detail responses also depend on a generation of their own, so that saving one event does
+not invalidate the details of all the others.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+CACHE_PREFIX = 'response_cache'
+STATISTICS = ('hits', 'misses')
+# validators of conditional list requests, which are cached with the responses
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+
+def get_cache():
+    return caches['default']
+
+
+def is_enabled():
+    return getattr(settings, 'RESPONSE_CACHE_ENABLED', False)
+
+
+def _generation_key(name, obj_id=None):
+    if obj_id is None:
+        return '%s:generation:%s' % (CACHE_PREFIX, name)
+    # object ids may contain characters memcached does not accept in keys
+    digest = hashlib.md5(str(obj_id).encode('utf-8')).hexdigest()
+    return '%s:generation:%s:%s' % (CACHE_PREFIX, name, digest)
+
+
+def _new_generation():
+    # an evicted counter must never restart from a value that was already used
+    return int(time.time() * 1000)
+
+
+def get_generations(dependencies):
+    """
+    Get the current generations of the given dependencies in a single cache round trip.
+
+    :param dependencies: model names, or (model name, object id) tuples
+    :type dependencies: Iterable[str|tuple]
+    :return: list of generations in the same order
+    :rtype: list[int]
+    """
+    cache = get_cache()
+    keys = [_generation_key(*dep) if isinstance(dep, tuple) else _generation_key(dep) for dep in dependencies]
+    generations = cache.get_many(keys)
+    missing = {key: _new_generation() for key in keys if key not in generations}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        generations.update(missing)
+    return [generations[key] for key in keys]
+
+
+def _bump(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_generation(), timeout=None)
+
+
+def bump_generation(name, *obj_ids):
+    """
+    Invalidate the cached responses depending on the given model, or on the given objects of it.
+
+    The counters are bumped only after the current transaction commits, so that no response
+    rendered from uncommitted or partially written data is cached under the new generation.
+    """
+    if not is_enabled():
+        return
+    keys = [_generation_key(name)] + [_generation_key(name, obj_id) for obj_id in dict.fromkeys(obj_ids) if obj_id]
+
+    def bump():
+        for key in keys:
+            _bump(key)
+    transaction.on_commit(bump)
+
+
+def _count(statistic):
+    cache = get_cache()
+    key = '%s:stats:%s' % (CACHE_PREFIX, statistic)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_statistics():
+    cache = get_cache()
+    keys = ['%s:stats:%s' % (CACHE_PREFIX, statistic) for statistic in STATISTICS]
+    values = cache.get_many(keys)
+    return {statistic: values.get(key, 0) for statistic, key in zip(STATISTICS, keys)}
+
+
+def reset_statistics():
+    get_cache().delete_many(['%s:stats:%s' % (CACHE_PREFIX, statistic) for statistic in STATISTICS])
+
+
+class ResponseCacheMixin(object):
+    """
+    View mixin serving list and retrieve responses for anonymous users from the shared cache.
+
+    Views declare the models their responses depend on in response_cache_dependencies.
+    If response_cache_detail_dependency is set, detail responses depend on the generation of
+    the object instead of the generation of the whole model.
+    """
+    response_cache_dependencies = ()
+    response_cache_detail_dependency = None
+    response_cache_formats = ('json', 'json-ld')
+
+    def is_response_cacheable(self, request):
+        # streamed responses are never cached, so they are not counted as misses either
+        return (is_enabled() and
+                request.method in ('GET', 'HEAD') and
+                request.auth is None and
+                not request.user.is_authenticated and
+                request.accepted_renderer.format in self.response_cache_formats and
+                not (hasattr(self, 'is_stream_requested') and self.is_stream_requested()))
+
+    def get_response_cache_key(self, request, obj_id=None):
+        dependencies = list(self.response_cache_dependencies)
+        if obj_id is not None and self.response_cache_detail_dependency:
+            # the detail does not change when other objects of the same model are saved
+            dependencies.remove(self.response_cache_detail_dependency)
+            dependencies.append((self.response_cache_detail_dependency, obj_id))
+        generations = get_generations(dependencies)
+        params = sorted((key, value) for key, values in request.query_params.lists() for value in values)
+        # the responses contain absolute links to the host they were requested from
+        key_parts = [
+            type(self).__name__, self.action, str(obj_id), str(request.version),
+            request.accepted_renderer.format, request.scheme, request.get_host(), repr(params), repr(generations),
+        ]
+        digest = hashlib.sha1('|'.join(key_parts).encode('utf-8')).hexdigest()
+        return '%s:response:%s' % (CACHE_PREFIX, digest)
+
+    def get_cached_response(self, request, obj_id=None):
+        self.response_cache_key = None
+        if not self.is_response_cacheable(request):
+            return None
+        cache_key = self.get_response_cache_key(request, obj_id)
+        cached = get_cache().get(cache_key)
+        if cached is None:
+            _count('misses')
+            self.response_cache_key = cache_key
+            return None
+        _count('hits')
+        content, content_type, headers = cached
+        response = HttpResponse(content, content_type=content_type)
+        for header, value in headers.items():
+            response[header] = value
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        response = self.get_cached_response(request)
+        if response is not None:
+            return response
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self.get_cached_response(request, kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        if response is not None:
+            return response
+        return super().retrieve(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        cache_key = getattr(self, 'response_cache_key', None)
+        if cache_key and isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            headers = {header: response[header] for header in CACHED_HEADERS if response.has_header(header)}
+            get_cache().set(cache_key, (response.content, response['Content-Type'], headers),
+                            getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 60))
+            response['X-Cache'] = 'MISS'
+        return response
@@ -1,13 +1,20 @@
 import logging
+import threading
+from contextlib import contextmanager
 
 from django.core.mail import send_mail
 from django.contrib.auth import get_user_model
 from django.contrib.sites.models import Site
+from events.models import Change, Event, PublicationStatus
+from events.permissions import invalidate_permission_contexts
 from notifications.models import (NotificationType, NotificationTemplateException, render_notification_template)
 from smtplib import SMTPException
 
 logger = logging.getLogger(__name__)
 
+# ids of the events whose offers are being rewritten in bulk by the current thread
+_bulk_offer_writes = threading.local()
+
 
 def organization_post_save(sender, instance, created, **kwargs):
     if not created and instance.replaced_by:
@@ -21,6 +28,56 @@ def organization_post_save(sender, instance, created, **kwargs):
         instance.owned_systems.update(owner=new_org)
 
 
+def organization_users_changed(sender, instance, action, **kwargs):
+    # the permissions cached in a user object are stale when its organizations change
+    if not action.startswith('post_'):
+        return
+    if hasattr(instance, 'clear_permission_cache'):
+        instance.clear_permission_cache()
+    invalidate_permission_contexts()
+
+
+def organization_tree_changed(sender, **kwargs):
+    # saving an organization or data source may move organizations, replace them or change api key owners
+    invalidate_permission_contexts()
+
+
+def synchronised_object_post_delete(sender, instance, **kwargs):
+    # soft deletions are recorded on save, this records the objects removed from the database.
+    # events that were not public are not in the public change feed, so their removal is not recorded either
+    if isinstance(instance, Event) and instance.publication_status != PublicationStatus.PUBLIC:
+        return
+    Change.objects.record(sender._meta.model_name, [instance.pk], Change.REMOVED)
+
+
+@contextmanager
+def bulk_offer_writes(event):
+    """
+    Update the offer summary of the event once after the offers written in the block, instead of after each one.
+    """
+    event_ids = getattr(_bulk_offer_writes, 'event_ids', None)
+    if event_ids is None:
+        event_ids = _bulk_offer_writes.event_ids = set()
+    if event.pk in event_ids:
+        yield
+        return
+    event_ids.add(event.pk)
+    try:
+        yield
+    finally:
+        event_ids.discard(event.pk)
+    event.update_offer_fields()
+
+
+def offer_changed(sender, instance, raw=False, **kwargs):
+    # the offers are summarised in the event for filtering, however they are written
+    if raw or instance.event_id in getattr(_bulk_offer_writes, 'event_ids', ()):
+        return
+    event = Event.objects.filter(pk=instance.event_id).only('has_free_offer', 'price_min', 'price_max').first()
+    if event:
+        event.update_offer_fields()
+
+
 def user_post_save(sender, instance, created, **kwargs):
     if created:
         User = get_user_model()
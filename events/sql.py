@@ -1,4 +1,26 @@
-from django.db import connection
+import json
+import re
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+
+# text search configurations of the languages that have one, the other languages are indexed as plain words
+TEXT_SEARCH_CONFIGS = OrderedDict([('fi', 'finnish'), ('sv', 'swedish'), ('en', 'english')])
+# keyword names are matched with this trigram similarity threshold
+TRIGRAM_SIMILARITY_THRESHOLD = 0.2
+# key of the advisory lock held while numbering recorded changes
+CHANGE_SEQUENCE_LOCK = 7665676
+# translated fields of the event (e) and its location (p) in the event search vector, by weight
+EVENT_SEARCH_FIELDS = OrderedDict([
+    ('A', [('e', 'name')]),
+    ('B', [('e', 'headline'), ('e', 'secondary_headline'), ('e', 'short_description'), ('p', 'name')]),
+    ('C', [('e', 'description'), ('e', 'location_extra_info'), ('e', 'provider')]),
+    ('D', [('p', 'street_address'), ('p', 'address_locality')]),
+])
+# an event has content in the languages any of these translated fields is given in
+EVENT_CONTENT_FIELDS = ('name', 'description', 'short_description')
 
 
 def count_events_for_keywords(keyword_ids=(), all=False):
@@ -72,3 +94,291 @@ def count_events_for_places(place_ids=(), all=False):
         else:
             return {}
         return dict(cursor.fetchall())
+
+
+def explain(queryset):
+    """
+    Get the plan of the query planner for the given queryset, without executing the query.
+
+    :param queryset: queryset to explain
+    :type queryset: django.db.models.QuerySet
+    :return: the top level of the plan, as given by EXPLAIN (FORMAT JSON)
+    :rtype: dict
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    # psycopg2 parses the json column type, but be lenient in case it comes as text
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def _event_search_vector_sql():
+    vectors = []
+    for language in [code.replace('-', '_') for code, name in settings.LANGUAGES]:
+        config = TEXT_SEARCH_CONFIGS.get(language, 'simple')
+        for weight, fields in EVENT_SEARCH_FIELDS.items():
+            columns = ', '.join('%s.%s_%s' % (alias, field, language) for alias, field in fields)
+            vectors.append("setweight(to_tsvector('%s', concat_ws(' ', %s)), '%s')" % (config, columns, weight))
+    return ' || '.join(vectors)
+
+
+def update_event_search_vectors(event_ids=(), place_ids=(), all=False):
+    """
+    Update the full text search vectors of the given events, or of the events in the given places.
+
+    :param event_ids: set of event ids
+    :type event_ids: Iterable[str]
+    :param place_ids: set of place ids
+    :type place_ids: Iterable[str]
+    :param all: update all events instead
+    :type all: bool
+    """
+    event_ids = tuple(set(event_ids))
+    place_ids = tuple(set(place_ids))
+    if event_ids:
+        condition, params = 'e.id IN %s', [event_ids]
+    elif place_ids:
+        condition, params = 'e.location_id IN %s', [place_ids]
+    elif all:
+        condition, params = 'TRUE', []
+    else:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('''
+        UPDATE events_event e
+        SET search_vector = {vector}
+        FROM events_event s LEFT JOIN events_place p ON p.id = s.location_id
+        WHERE s.id = e.id AND {condition};
+        '''.format(vector=_event_search_vector_sql(), condition=condition), params)
+
+
+# the range of times an event occurs in, as matched by the start and end filters. Events without an end time
+# are considered to occur at their start time, and events without a start time at their end time. Postponed
+# events are matched by their status as well if no end is given, see _filter_event_queryset.
+EVENT_OCCURRENCE_SQL = '''
+CASE
+  WHEN e.start_time IS NULL AND e.end_time IS NULL THEN NULL
+  WHEN e.start_time IS NULL THEN tstzrange(e.end_time, e.end_time, '[]')
+  WHEN e.end_time IS NULL OR (e.has_start_time AND NOT e.has_end_time) OR e.end_time <= e.start_time
+    THEN tstzrange(e.start_time, e.start_time, '[]')
+  ELSE tstzrange(e.start_time, e.end_time, '[)')
+END
+'''
+# the fields computed from the times of an event, and their SQL expressions. The local times and weekdays
+# are in settings.TIME_ZONE, and must be updated for all events if it changes.
+EVENT_TIME_FIELDS_SQL = OrderedDict([
+    ('occurrence', EVENT_OCCURRENCE_SQL),
+    ('start_local_time', '(e.start_time AT TIME ZONE %(time_zone)s)::time'),
+    ('end_local_time', '(e.end_time AT TIME ZONE %(time_zone)s)::time'),
+    ('start_weekday', 'extract(isodow FROM e.start_time AT TIME ZONE %(time_zone)s)'),
+    ('duration', 'e.end_time - e.start_time'),
+])
+
+
+def _event_content_languages_sql():
+    languages = []
+    for language in [code.replace('-', '_') for code, name in settings.LANGUAGES]:
+        columns = ' OR '.join('e.%s_%s IS NOT NULL' % (field, language) for field in EVENT_CONTENT_FIELDS)
+        languages.append("CASE WHEN %s THEN '%s' END" % (columns, language))
+    return 'array_remove(ARRAY[%s]::varchar[], NULL)' % ', '.join(languages)
+
+
+def update_event_languages(event_ids=(), all=False):
+    """
+    Update the arrays of the languages the given events have content in, and of their in_language ids.
+
+    :param event_ids: set of event ids
+    :type event_ids: Iterable[str]
+    :param all: update all events instead
+    :type all: bool
+    """
+    event_ids = tuple(set(event_ids))
+    if event_ids:
+        condition, params = 'e.id IN %s', [event_ids]
+    elif all:
+        condition, params = 'TRUE', []
+    else:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('''
+        UPDATE events_event e
+        SET content_languages = {content_languages},
+            in_languages = ARRAY(
+              SELECT l.language_id FROM events_event_in_language l WHERE l.event_id = e.id ORDER BY l.language_id
+            )
+        WHERE {condition};
+        '''.format(content_languages=_event_content_languages_sql(), condition=condition), params)
+
+
+def update_event_time_fields(event_ids=(), all=False, fields=None):
+    """
+    Update the fields computed from the times of the given events, which are indexed for filtering.
+
+    :param event_ids: set of event ids
+    :type event_ids: Iterable[str]
+    :param all: update all events instead
+    :type all: bool
+    :param fields: names of the fields to update, all of them by default
+    :type fields: Iterable[str]|None
+    """
+    event_ids = tuple(set(event_ids))
+    if event_ids:
+        condition, params = 'e.id IN %(event_ids)s', {'event_ids': event_ids}
+    elif all:
+        condition, params = 'TRUE', {}
+    else:
+        return
+    params['time_zone'] = settings.TIME_ZONE
+    fields = fields or EVENT_TIME_FIELDS_SQL.keys()
+    with connection.cursor() as cursor:
+        cursor.execute('''
+        UPDATE events_event e
+        SET {assignments}
+        WHERE {condition};
+        '''.format(assignments=', '.join('%s = %s' % (field, EVENT_TIME_FIELDS_SQL[field]) for field in fields),
+                   condition=condition), params)
+
+
+def estimate_count(queryset):
+    """
+    Get the row estimate of the query planner for the given queryset.
+
+    Unlike COUNT(*), this does not execute the query, so the estimate may be off by orders of
+    magnitude for complex filters. Use it only where an indicative count is enough.
+
+    :param queryset: queryset to estimate
+    :type queryset: django.db.models.QuerySet
+    :return: estimated number of rows
+    :rtype: int
+    """
+    return int(explain(queryset)['Plan Rows'])
+
+
+def get_keyword_replacements(keyword_ids):
+    """
+    Get the keywords finally replacing the given keywords, following replaced_by chains.
+
+    :param keyword_ids: set of keyword ids
+    :type keyword_ids: Iterable[str]
+    :return: dict of keyword id to the id of the keyword replacing it, or itself if not replaced.
+             Unknown keyword ids are left out.
+    :rtype: dict[str, str]
+    """
+    keyword_ids = tuple(set(keyword_ids))
+    if not keyword_ids:
+        return {}
+    with connection.cursor() as cursor:
+        # the depth limit only guards against circular replacements, which Keyword.save prevents
+        cursor.execute('''
+        WITH RECURSIVE chain(origin_id, keyword_id, replaced_by_id, depth) AS (
+          SELECT id, id, replaced_by_id, 0 FROM events_keyword WHERE id IN %s
+          UNION ALL
+          SELECT c.origin_id, k.id, k.replaced_by_id, c.depth + 1
+          FROM chain c JOIN events_keyword k ON k.id = c.replaced_by_id
+          WHERE c.depth < 100
+        )
+        SELECT DISTINCT ON (origin_id) origin_id, keyword_id
+        FROM chain
+        ORDER BY origin_id, depth DESC;
+        ''', [keyword_ids])
+        return dict(cursor.fetchall())
+
+
+@contextmanager
+def trigram_similarity_threshold(threshold=TRIGRAM_SIMILARITY_THRESHOLD):
+    """
+    Set the similarity threshold of the trigram % operator for the queries run in the block.
+
+    Matching names with the % operator instead of comparing their similarity allows the planner to
+    use the trigram indexes to retrieve the candidates. The threshold is set for the transaction only,
+    so that it does not carry over to the later requests served by a persistent connection.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true);", [str(threshold)])
+        yield
+
+
+def get_similar_keywords(terms, limit=3):
+    """
+    Get the keywords whose names are the most similar to each of the given terms, in a single query.
+
+    Terms with accented letters are only compared to the Finnish and Swedish names.
+
+    :param terms: search terms
+    :type terms: Iterable[str]
+    :param limit: maximum number of keywords per term
+    :type limit: int
+    :return: dict of term to the ids of the most similar keywords, in descending order of similarity
+    :rtype: dict[str, list[str]]
+    """
+    terms = list(OrderedDict.fromkeys(terms))
+    if not terms:
+        return {}
+    use_english = [not re.search('[\u00C0-\u00FF]', term) for term in terms]
+    with trigram_similarity_threshold(), connection.cursor() as cursor:
+        cursor.execute('''
+        SELECT term, id
+        FROM (
+          SELECT t.term, k.id, row_number() OVER (
+            PARTITION BY t.term
+            ORDER BY GREATEST(similarity(k.name_fi, t.term), similarity(k.name_sv, t.term),
+                              CASE WHEN t.use_english THEN similarity(k.name_en, t.term) END) DESC, k.id
+          ) AS rank
+          FROM unnest(%s::text[], %s::boolean[]) AS t(term, use_english)
+          JOIN events_keyword k
+            ON k.name_fi %% t.term OR k.name_sv %% t.term OR (t.use_english AND k.name_en %% t.term)
+          WHERE GREATEST(similarity(k.name_fi, t.term), similarity(k.name_sv, t.term),
+                         CASE WHEN t.use_english THEN similarity(k.name_en, t.term) END) > %s
+        ) ranked
+        WHERE rank <= %s
+        ORDER BY term, rank;
+        ''', [terms, use_english, TRIGRAM_SIMILARITY_THRESHOLD, limit])
+        similar = OrderedDict((term, []) for term in terms)
+        for term, keyword_id in cursor.fetchall():
+            similar[term].append(keyword_id)
+        return similar
+
+
+def insert_changes(queryset, resource, action, time):
+    """
+    Record a change of each object of the given queryset, in a single statement without fetching the objects.
+
+    :param queryset: queryset of the changed objects
+    :type queryset: django.db.models.QuerySet
+    :param resource: name of the resource of the objects, e.g. event
+    :type resource: str
+    :param action: recorded action
+    :type action: str
+    :param time: time of the change
+    :type time: datetime.datetime
+    """
+    sql, params = queryset.order_by().values('pk').distinct().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('''
+        INSERT INTO events_change (resource, object_id, action, created_time)
+        SELECT %s, changed.id, %s, %s FROM ({}) AS changed;
+        '''.format(sql), [resource, action, time] + list(params))
+
+
+def assign_change_sequence_numbers():
+    """
+    Number the committed changes that have no sequence number yet, in the order they were recorded.
+
+    Only one transaction numbers changes at a time, so the numbers grow in the order they are committed,
+    and a change committed later never gets a smaller number than one already seen. The changes committed
+    while another transaction is numbering them are numbered after it, once it has released the lock.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s);', [CHANGE_SEQUENCE_LOCK])
+        cursor.execute('''
+        UPDATE events_change c
+        SET sequence = numbered.sequence
+        FROM (
+          SELECT pending.id, nextval('events_change_sequence') AS sequence
+          FROM (SELECT id FROM events_change WHERE sequence IS NULL ORDER BY id) pending
+        ) numbered
+        WHERE c.id = numbered.id;
+        ''')
@@ -2,6 +2,7 @@
 from datetime import timedelta, datetime
 
 # django
+from django.core.cache import caches
 from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -19,7 +20,7 @@ from django_orghierarchy.models import Organization
 # events
 from events.models import (
     DataSource, Place, Language, Keyword, KeywordLabel, Event,
-    Offer, KeywordSet)
+    Offer, KeywordSet, EventLink, Image, Video)
 from events.api import (
     KeywordSerializer, PlaceSerializer, LanguageSerializer
 )
@@ -720,3 +721,65 @@ def create_initial_licenses():
             'url': 'https://creativecommons.org/licenses/by/4.0/',
         }
     )
+
+
+@pytest.fixture
+def event_dataset(make_event, event2, keyword, keyword2, keyword3, languages, organization):
+    start_time = timezone.now() + timedelta(days=1)
+    image = Image.objects.create(name='kuva', url='http://example.com/kuva.png', publisher=organization)
+    super_event = make_event('projection-super', start_time, start_time + timedelta(days=2))
+    super_event.super_event_type = Event.SuperEventType.RECURRING
+    super_event.custom_data = {'key': 'value'}
+    super_event.save()
+    super_event.images.add(image)
+    for i in range(3):
+        # the start times and durations of the events differ, so that sorting by them is deterministic
+        sub_start_time = start_time + timedelta(hours=i + 1)
+        sub_event = make_event('projection-%d' % i, sub_start_time, sub_start_time + timedelta(hours=i + 1))
+        sub_event.super_event = super_event
+        sub_event.save()
+        # relations are added one by one, so that their order does not depend on the plan of the query
+        sub_event.keywords.add(keyword)
+        sub_event.keywords.add(keyword2)
+        sub_event.audience.add(keyword3)
+        sub_event.in_language.add(languages[0])
+        sub_event.in_language.add(languages[1])
+        Offer.objects.create(event=sub_event, price_fi='%d euroa' % i, is_free=False)
+        Offer.objects.create(event=sub_event, is_free=True)
+        EventLink.objects.create(event=sub_event, name='', language=languages[0], link='http://example.com/')
+        Video.objects.create(event=sub_event, name='video', url='http://example.com/video')
+    # an event with date only times and no relations
+    date_only_event = make_event('projection-date-only', start_time + timedelta(minutes=10),
+                                 start_time + timedelta(days=1))
+    date_only_event.has_start_time = False
+    date_only_event.has_end_time = False
+    date_only_event.save()
+    deleted_event = make_event('projection-deleted', start_time + timedelta(minutes=20),
+                               start_time + timedelta(days=3))
+    deleted_event.deleted = True
+    deleted_event.save()
+    return Event.objects.all()
+
+
+@pytest.fixture
+def locmem_caches(settings):
+    # the caches of the tests are cleared, so that no data is cached over from other tests
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'test-default',
+        },
+        'ongoing_local': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'test-ongoing-local',
+        },
+    }
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    return settings
+
+
+@pytest.fixture
+def cache_settings(locmem_caches):
+    locmem_caches.RESPONSE_CACHE_ENABLED = True
+    return locmem_caches
@@ -1,3 +1,4 @@
+from datetime import timedelta
 from unittest.mock import MagicMock
 
 import pytest
@@ -32,6 +33,105 @@ def test_api_page_size(api_client, event):
     assert len(resp.data['data']) <= 100
 
 
+@pytest.mark.django_db
+def test_api_count_strategies(api_client, event, settings):
+    event_count = 20
+    id_base = event.id
+    for i in range(0, event_count):
+        event.pk = '%s-%d' % (id_base, i)
+        event.save(force_insert=True)
+
+    resp = api_client.get(reverse('event-list') + '?page_size=10&count=none')
+    assert resp.status_code == 200
+    meta = resp.data['meta']
+    assert meta['count'] is None
+    assert meta['next']
+    resp = api_client.get(reverse('event-list') + '?page_size=10&count=none&page=3')
+    assert resp.status_code == 200
+    assert len(resp.data['data']) == 1
+    assert resp.data['meta']['next'] is None
+    resp = api_client.get(reverse('event-list') + '?page_size=10&count=none&page=4')
+    assert resp.status_code == 404
+
+    resp = api_client.get(reverse('event-list') + '?page_size=10&count=estimate')
+    assert resp.status_code == 200
+    assert resp.data['meta']['count'] == 21
+    assert resp.data['meta']['count_is_estimate'] is False
+
+    settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD = 5
+    resp = api_client.get(reverse('event-list') + '?page_size=10&count=estimate')
+    assert resp.status_code == 200
+    assert resp.data['meta']['count'] > 5
+    assert resp.data['meta']['count_is_estimate'] is True
+
+    settings.PAGINATION_DEFAULT_COUNT = 'none'
+    resp = api_client.get(reverse('event-list') + '?page_size=10')
+    assert resp.data['meta']['count'] is None
+    resp = api_client.get(reverse('event-list') + '?page_size=10&count=exact')
+    assert resp.data['meta']['count'] == 21
+
+    resp = api_client.get(reverse('event-list') + '?count=approximately')
+    assert resp.status_code == 400
+    resp = api_client.get(reverse('event-list') + '?count=none&page=last')
+    assert resp.status_code == 400
+
+
+@pytest.mark.django_db
+def test_api_cursor_pagination(api_client, event):
+    event_count = 25
+    id_base = event.id
+    for i in range(0, event_count):
+        event.pk = '%s-%d' % (id_base, i)
+        event.save(force_insert=True)
+    resp = api_client.get(reverse('event-list') + '?cursor=&page_size=10')
+    assert resp.status_code == 200
+    meta = resp.data['meta']
+    assert meta['count'] is None
+    assert meta['previous'] is None
+    assert len(resp.data['data']) == 10
+
+    seen_ids = [e['id'] for e in resp.data['data']]
+    pages = [seen_ids]
+    while resp.data['meta']['next']:
+        resp = api_client.get(resp.data['meta']['next'])
+        assert resp.status_code == 200
+        pages.append([e['id'] for e in resp.data['data']])
+        seen_ids += pages[-1]
+    assert len(seen_ids) == event_count + 1
+    assert len(set(seen_ids)) == event_count + 1
+    assert [len(page) for page in pages] == [10, 10, 6]
+
+    # the previous link returns the page before
+    resp = api_client.get(resp.data['meta']['previous'])
+    assert resp.status_code == 200
+    assert [e['id'] for e in resp.data['data']] == pages[1]
+
+
+@pytest.mark.django_db
+def test_api_cursor_pagination_invalid_cursor(api_client, event):
+    resp = api_client.get(reverse('event-list') + '?cursor=notacursor')
+    assert resp.status_code == 404
+
+
+@pytest.mark.django_db
+def test_api_cursor_pagination_by_duration(api_client, event):
+    id_base = event.id
+    for i in range(0, 5):
+        event.pk = '%s-%d' % (id_base, i)
+        event.end_time = event.start_time + timedelta(hours=i + 1, minutes=7)
+        event.save(force_insert=True)
+    expected_ids = [e['id'] for e in api_client.get(
+        reverse('event-list') + '?sort=-duration&page_size=10').data['data']]
+    resp = api_client.get(reverse('event-list') + '?cursor=&sort=-duration&page_size=2')
+    assert resp.status_code == 200
+    seen_ids = [e['id'] for e in resp.data['data']]
+    while resp.data['meta']['next']:
+        resp = api_client.get(resp.data['meta']['next'])
+        assert resp.status_code == 200
+        seen_ids += [e['id'] for e in resp.data['data']]
+    assert seen_ids == expected_ids
+
+
 @pytest.mark.django_db
 def test_get_authenticated_data_source_and_publisher(data_source):
     org = Organization.objects.create(
@@ -36,6 +36,18 @@ class TestApiKeyUser(TestCase):
         is_admin = self.user.is_admin(self.org_2)
         self.assertFalse(is_admin)
 
+    def test_is_not_admin_of_replacing_organization(self):
+        org_3 = Organization.objects.create(
+            data_source=self.data_source,
+            origin_id='org-3',
+        )
+        self.org_1.replaced_by = org_3
+        self.org_1.save()
+        self.user.clear_permission_cache()
+
+        self.assertTrue(self.user.is_admin(self.org_1))
+        self.assertFalse(self.user.is_admin(org_3))
+
     def test_is_regular_user(self):
         is_regular_user = self.user.is_regular_user(self.org_1)
         self.assertFalse(is_regular_user)
@@ -0,0 +1,141 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from events.models import Change, Event, PublicationStatus
+from events.utils import recache_n_events
+
+from .utils import get
+from .utils import versioned_reverse as reverse
+
+
+def get_changes(api_client, since=None, **params):
+    if since is not None:
+        params['since'] = since
+    return get(api_client, reverse('change-list'), data=params).json()
+
+
+def _records(response):
+    return [(change['resource'], change['id'], change['action']) for change in response['data']]
+
+
+# the changes are numbered once their transaction commits, so the tests need real transactions
+@pytest.mark.django_db(transaction=True)
+def test_change_feed_lists_changes_in_order(api_client, event, place, keyword):
+    response = get_changes(api_client)
+    sequences = [change['sequence'] for change in response['data']]
+    assert sequences == sorted(sequences)
+    assert ('event', event.id, Change.SAVED) in _records(response)
+    assert response['meta']['next_since'] == sequences[-1]
+    assert response['meta']['next'] is None
+
+    # nothing has changed since
+    since = response['meta']['next_since']
+    response = get_changes(api_client, since)
+    assert response['data'] == []
+    assert response['meta']['next_since'] == since
+
+    event.name_fi = 'muutettu'
+    event.save()
+    place.soft_delete()
+    keyword.save()
+    response = get_changes(api_client, since)
+    assert _records(response) == [
+        ('event', event.id, Change.SAVED),
+        ('place', place.id, Change.DELETED),
+        ('keyword', keyword.id, Change.SAVED),
+    ]
+    assert all(change['sequence'] > since for change in response['data'])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_change_feed_records_deletions(api_client, event):
+    since = get_changes(api_client)['meta']['next_since']
+    event_id = event.id
+    event.soft_delete()
+    Event.objects.filter(id=event_id).delete()
+    assert _records(get_changes(api_client, since)) == [
+        ('event', event_id, Change.DELETED),
+        ('event', event_id, Change.REMOVED),
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_change_feed_records_events_of_replaced_place(api_client, event, place, place2):
+    since = get_changes(api_client)['meta']['next_since']
+    place.replaced_by = place2
+    place.save()
+    records = _records(get_changes(api_client, since))
+    assert ('place', place.id, Change.DELETED) in records
+    assert ('event', event.id, Change.SAVED) in records
+
+
+@pytest.mark.django_db(transaction=True)
+def test_change_feed_records_changed_event_counts(api_client, event, keyword, keyword2):
+    event.keywords.add(keyword)
+    since = get_changes(api_client)['meta']['next_since']
+    recache_n_events([keyword.id, keyword2.id])
+    assert _records(get_changes(api_client, since)) == [('keyword', keyword.id, Change.SAVED)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_change_feed_pages(api_client, event, event2):
+    since = get_changes(api_client)['meta']['next_since']
+    for i in range(3):
+        event.save()
+    response = get_changes(api_client, since, page_size=2)
+    assert len(response['data']) == 2
+    assert 'since=%d' % response['meta']['next_since'] in response['meta']['next']
+    response = get_changes(api_client, response['meta']['next_since'], page_size=2)
+    assert len(response['data']) == 1
+    assert response['meta']['next'] is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_change_feed_resource_filter(api_client, event, place, keyword):
+    response = get_changes(api_client, resource='place,keyword')
+    assert {change['resource'] for change in response['data']} == {'place', 'keyword'}
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('params', [{'since': 'abc'}, {'since': '-1'}, {'resource': 'image'}])
+def test_change_feed_invalid_params(api_client, params):
+    response = api_client.get(reverse('change-list'), data=params)
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_prune_changes_command(api_client, event):
+    # the changes are numbered without reading the feed
+    assert Change.objects.exists()
+    assert not Change.objects.filter(sequence=None).exists()
+    Change.objects.update(created_time=Event.now() - timedelta(days=31))
+    event.save()
+    call_command('prune_changes', days=30)
+    assert _records(get_changes(api_client)) == [('event', event.id, Change.SAVED)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_change_feed_hides_non_public_events(api_client, event, user):
+    event.publication_status = PublicationStatus.DRAFT
+    event.save()
+    assert ('event', event.id, Change.SAVED) not in _records(get_changes(api_client))
+    api_client.force_authenticate(user=user)
+    assert ('event', event.id, Change.SAVED) in _records(get_changes(api_client))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changes_are_numbered_once_per_transaction(api_client, event, event2):
+    since = get_changes(api_client)['meta']['next_since']
+    with CaptureQueriesContext(connection) as queries:
+        with transaction.atomic():
+            event.save()
+            event2.save()
+    assert sum('pg_advisory_xact_lock' in query['sql'] for query in queries.captured_queries) == 1
+    assert _records(get_changes(api_client, since)) == [
+        ('event', event.id, Change.SAVED),
+        ('event', event2.id, Change.SAVED),
+    ]
@@ -0,0 +1,73 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .utils import versioned_reverse as reverse
+
+
+@pytest.mark.django_db
+def test_event_list_conditional_get(api_client, event, event2):
+    url = reverse('event-list')
+    response = api_client.get(url)
+    assert response.status_code == 200
+    etag = response['ETag']
+    assert etag.startswith('W/"')
+    assert response['Last-Modified']
+
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+    assert not response.content
+
+    # the validators depend on the query
+    response = api_client.get(url + '?data_source=' + event.data_source.id, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+    event.save()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+    # deleting changes the count even if the modification time stays the same
+    etag = response['ETag']
+    event2.soft_delete()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_event_list_if_modified_since_is_not_answered_alone(api_client, event, event2):
+    url = reverse('event-list')
+    last_modified = api_client.get(url)['Last-Modified']
+    # deleting an event may leave the latest modification time of the list as it was
+    event.soft_delete()
+    response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == 200
+    assert [e['id'] for e in response.json()['data']] == [event2.id]
+
+
+@pytest.mark.django_db
+def test_event_list_validators_are_only_computed_with_counts(api_client, event):
+    url = reverse('event-list')
+    assert 'ETag' in api_client.get(url)
+    assert 'ETag' not in api_client.get(url + '?count=none')
+    assert 'ETag' not in api_client.get(url + '?cursor=')
+
+
+@pytest.mark.django_db
+def test_event_list_validators_reuse_the_count(api_client, event, event2):
+    url = reverse('event-list')
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(url)
+    assert 'ETag' in response
+    assert len([q for q in queries if 'COUNT(' in q['sql'].upper()]) == 1
+    # the validators of the count are the same as those of a conditional request
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+
+@pytest.mark.django_db
+def test_place_and_keyword_list_conditional_get(api_client, place, keyword):
+    for view_name in ('place-list', 'keyword-list'):
+        url = reverse(view_name) + '?show_all_places=1&show_all_keywords=1'
+        etag = api_client.get(url)['ETag']
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
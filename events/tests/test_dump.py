@@ -0,0 +1,59 @@
+import gzip
+import json
+
+import pytest
+from django.core.management import call_command
+
+from .test_event_get import get_list
+from .utils import versioned_reverse as reverse
+
+
+def _lines(content):
+    return [json.loads(line) for line in content.decode('utf-8').splitlines()]
+
+
+def get_dump(api_client, resource, data=None, **extra):
+    response = api_client.get(reverse('%s-dump' % resource), data=data, **extra)
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == 'application/x-ndjson; charset=utf-8'
+    return response
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query_string', ['', 'sub_events_summary=true', 'keyword={keyword}'])
+def test_event_dump_matches_list(api_client, event_dataset, keyword, settings, query_string):
+    settings.STREAM_CHUNK_SIZE = 2
+    query_string = query_string.format(keyword=keyword.id)
+    list_data = get_list(api_client, query_string='&'.join(filter(None, (query_string, 'page_size=100')))).json()
+    response = get_dump(api_client, 'event', data=dict(param.split('=') for param in query_string.split('&') if param))
+    dumped = _lines(b''.join(response.streaming_content))
+    assert dumped
+    assert len(dumped) == len(list_data['data'])
+    assert {entry['id']: entry for entry in dumped} == {entry['id']: entry for entry in list_data['data']}
+
+
+@pytest.mark.django_db
+def test_event_dump_is_gzipped_if_accepted(api_client, event, event2):
+    response = get_dump(api_client, 'event', HTTP_ACCEPT_ENCODING='gzip, deflate')
+    assert response['Content-Encoding'] == 'gzip'
+    dumped = _lines(gzip.decompress(b''.join(response.streaming_content)))
+    assert {entry['id'] for entry in dumped} == {event.id, event2.id}
+
+
+@pytest.mark.django_db
+def test_place_and_keyword_dumps(api_client, place, keyword):
+    dumped = _lines(b''.join(get_dump(api_client, 'place', data={'show_all_places': 'true'}).streaming_content))
+    assert place.id in {entry['id'] for entry in dumped}
+    dumped = _lines(b''.join(get_dump(api_client, 'keyword', data={'show_all_keywords': 'true'}).streaming_content))
+    assert keyword.id in {entry['id'] for entry in dumped}
+
+
+@pytest.mark.django_db
+def test_dump_ndjson_command(event, event2, tmp_path):
+    output = tmp_path / 'events.ndjson.gz'
+    call_command('dump_ndjson', 'event', base_url='https://testserver/linkedevents', output=str(output),
+                 gzip=True)
+    dumped = _lines(gzip.decompress(output.read_bytes()))
+    assert {entry['id'] for entry in dumped} == {event.id, event2.id}
+    assert all(entry['@id'].startswith('https://testserver/linkedevents/v1/event/') for entry in dumped)
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime
+from datetime import datetime, timedelta
+from decimal import Decimal
 
 import dateutil.parser
 import pytest
@@ -7,9 +8,13 @@ import pytz
 from django.conf import settings
 from django.contrib.gis.gdal import CoordTransform, SpatialReference
 from django.contrib.gis.geos import Point
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from freezegun import freeze_time
 
-from events.models import Event, Language, PublicationStatus
+from events.models import Event, Language, Offer, PublicationStatus, keyword_replacements
+from events.signals import bulk_offer_writes
 
 from .utils import assert_fields_exist, get
 from .utils import versioned_reverse as reverse
@@ -136,6 +141,40 @@ def test_get_event_list_verify_text_filter(api_client, event, event2):
     assert event2.id not in [entry['id'] for entry in response.data['data']]
 
 
+@pytest.mark.django_db
+def test_get_event_list_text_search(api_client, event, event2, place):
+    event.name_en = 'Concert in the park'
+    event.save()
+    event2.description_en = '<p>Concerts for everyone</p>'
+    event2.save()
+
+    # all words are matched as word prefixes
+    response = get_list(api_client, data={'text': 'concert park'})
+    assert [entry['id'] for entry in response.data['data']] == [event.id]
+    # matches in the name rank higher than in the description
+    response = get_list(api_client, data={'text': 'concert'})
+    assert [entry['id'] for entry in response.data['data']] == [event.id, event2.id]
+    response = get_list(api_client, data={'text': 'concert', 'sort': 'name'})
+    assert {entry['id'] for entry in response.data['data']} == {event.id, event2.id}
+
+    # the search vector follows the location
+    place.name_fi = 'Puistolava'
+    place.save()
+    response = get_list(api_client, data={'text': 'puistolava'})
+    assert [entry['id'] for entry in response.data['data']] == [event.id]
+
+    # substrings are only matched in the substring mode
+    response = get_list(api_client, data={'text': 'oncert'})
+    assert not response.data['data']
+    response = get_list(api_client, data={'text': 'oncert', 'text_mode': 'substring'})
+    assert {entry['id'] for entry in response.data['data']} == {event.id, event2.id}
+
+    response = get_list(api_client, data={'text': '!!'})
+    assert not response.data['data']
+    response = get_list_no_code_assert(api_client, data={'text': 'concert', 'text_mode': 'fuzzy'})
+    assert response.status_code == 400
+
+
 @pytest.mark.django_db
 def test_get_event_list_verify_data_source_filter(api_client, data_source, event, event2):
     response = get_list(api_client, data={'data_source': data_source.id})
@@ -289,6 +328,53 @@ def test_get_event_list_end_hour_filter(api_client, keyword, event):
     assert event.id in [entry['id'] for entry in response.data['data']]
 
 
+@pytest.mark.django_db
+def test_get_event_list_local_time_and_weekday_filters(api_client, make_event):
+    local_tz = pytz.timezone(settings.TIME_ZONE)
+    # the same local time in winter and summer time, on a Wednesday and a Saturday
+    winter_event = make_event('winter', local_tz.localize(datetime(2020, 1, 1, 16, 30)),
+                              local_tz.localize(datetime(2020, 1, 1, 18, 0)))
+    summer_event = make_event('summer', local_tz.localize(datetime(2020, 7, 4, 16, 30)),
+                              local_tz.localize(datetime(2020, 7, 4, 18, 0)))
+
+    response = get_list(api_client, data={'starts_after': '16:30', 'starts_before': '16:30'})
+    assert_events_in_response([winter_event, summer_event], response)
+    response = get_list(api_client, data={'ends_after': '18:00', 'ends_before': '18:00'})
+    assert_events_in_response([winter_event, summer_event], response)
+
+    response = get_list(api_client, data={'weekday': '1,2,3,4,5', 'starts_after': '16'})
+    assert_events_in_response([winter_event], response)
+    response = get_list(api_client, data={'weekday': '6,7'})
+    assert_events_in_response([summer_event], response)
+    for weekday in ('0', '8', 'sunday'):
+        response = get_list_no_code_assert(api_client, data={'weekday': weekday})
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_get_event_list_duration_filters_and_sort(api_client, make_event):
+    start_time = timezone.now()
+    short_event = make_event('short', start_time, start_time + timedelta(minutes=30))
+    long_event = make_event('long', start_time, start_time + timedelta(days=2))
+
+    response = get_list(api_client, data={'max_duration': '1h'})
+    assert_events_in_response([short_event], response)
+    response = get_list(api_client, data={'min_duration': '30m'})
+    assert_events_in_response([short_event, long_event], response)
+    response = get_list(api_client, data={'min_duration': '1d', 'max_duration': '2d'})
+    assert_events_in_response([long_event], response)
+    response = get_list(api_client, data={'sort': '-duration'})
+    assert [entry['id'] for entry in response.data['data']] == [long_event.id, short_event.id]
+
+    # the duration follows the saved times
+    short_event.end_time = start_time + timedelta(days=3)
+    short_event.save(update_fields=['end_time'])
+    response = get_list(api_client, data={'max_duration': '1h'})
+    assert_events_in_response([], response)
+    response = get_list(api_client, data={'sort': 'duration'})
+    assert [entry['id'] for entry in response.data['data']] == [long_event.id, short_event.id]
+
+
 @pytest.mark.django_db
 def test_get_event_list_verify_keyword_filter(api_client, keyword, event):
     event.keywords.add(keyword)
@@ -364,6 +450,35 @@ def test_get_event_list_verify_replaced_keyword_filter(api_client, keyword, keyw
     assert event.id not in [entry['id'] for entry in response.data['data']]
 
 
+@pytest.mark.django_db
+def test_get_event_list_verify_replaced_keyword_chain_filters(
+        api_client, keyword, keyword2, keyword3, event, event2):
+    event.keywords.add(keyword3)
+    event2.keywords.add(keyword2)
+    keyword2.replace(keyword3)
+    keyword.replace(keyword2)
+
+    assert keyword_replacements.resolve([keyword.id, keyword2.id, 'unknown_keyword']) == {
+        keyword.id: keyword3.id, keyword2.id: keyword3.id}
+    with CaptureQueriesContext(connection) as queries:
+        keyword_replacements.resolve([keyword.id, keyword2.id])
+    assert not queries.captured_queries
+
+    # keyword2 has been remapped to keyword3 in event2 as well
+    for param in ('keyword', 'keyword_OR', 'keyword_AND'):
+        response = get_list(api_client, data={param: keyword.id})
+        assert {entry['id'] for entry in response.data['data']} == {event.id, event2.id}
+    response = get_list(api_client, data={'keyword_AND': ','.join([keyword.id, 'unknown_keyword'])})
+    assert not response.data['data']
+    response = get_list(api_client, data={'keyword!': ','.join([keyword.id, 'unknown_keyword'])})
+    assert not response.data['data']
+
+    # saving a keyword clears the memo
+    keyword.replace(None)
+    response = get_list(api_client, data={'keyword': keyword.id})
+    assert not response.data['data']
+
+
 @pytest.mark.django_db
 def test_get_event_list_verify_division_filter(api_client, event, event2, event3, administrative_division,
                                                administrative_division2):
@@ -511,6 +626,29 @@ def test_language_filter(api_client, event, event2, event3):
     assert ids == {event3.id}
 
 
+@pytest.mark.django_db
+def test_translation_and_in_language_filters_follow_changes(api_client, event, event2):
+    estonian = Language.objects.get_or_create(id='et')[0]
+    event.short_description_sv = 'kort'
+    event.save(update_fields=['short_description_sv'])
+    event2.in_language.add(estonian)
+
+    response = get_list(api_client, query_string='translation=sv,ru')
+    assert_events_in_response([event], response)
+    response = get_list(api_client, query_string='translation=et')
+    assert_events_in_response([], response)
+    response = get_list(api_client, query_string='in_language=et')
+    assert_events_in_response([event2], response)
+
+    event.short_description_sv = None
+    event.save()
+    estonian.events.remove(event2)
+    response = get_list(api_client, query_string='translation=sv')
+    assert_events_in_response([], response)
+    response = get_list(api_client, query_string='language=et')
+    assert_events_in_response([], response)
+
+
 @pytest.mark.django_db
 def test_event_list_filters(api_client, event, event2):
     filters = (
@@ -690,6 +828,63 @@ def test_get_event_list_deleted_sub_events(api_client, event, event2):
     assert not response.data['sub_events']
 
 
+def _make_series(make_event, origin_id, sub_event_count):
+    start_time = timezone.now() + timedelta(days=1)
+    super_event = make_event(origin_id, start_time, start_time + timedelta(days=sub_event_count))
+    super_event.super_event_type = Event.SuperEventType.RECURRING
+    super_event.save()
+    for i in range(sub_event_count):
+        sub_event = make_event('%s-%d' % (origin_id, i), start_time + timedelta(days=i),
+                               start_time + timedelta(days=i, hours=1))
+        sub_event.super_event = super_event
+        sub_event.save()
+    return super_event
+
+
+@pytest.mark.django_db
+def test_get_event_list_sub_events_are_prefetched(api_client, make_event):
+    _make_series(make_event, 'series-1', 3)
+    # the admin only user fields are fetched for each event, keep them out of the count
+    Event.objects.update(last_modified_by=None)
+    with CaptureQueriesContext(connection) as one_series:
+        get_list(api_client)
+
+    _make_series(make_event, 'series-2', 3)
+    _make_series(make_event, 'series-3', 3)
+    Event.objects.update(last_modified_by=None)
+    with CaptureQueriesContext(connection) as three_series:
+        get_list(api_client)
+    assert len(three_series.captured_queries) == len(one_series.captured_queries)
+
+
+@pytest.mark.django_db
+def test_get_event_list_sub_events_summary(api_client, make_event):
+    super_event = _make_series(make_event, 'series', 3)
+    deleted_sub_event = super_event.sub_events.order_by('start_time').last()
+    deleted_sub_event.soft_delete()
+    sub_events = list(super_event.sub_events.filter(deleted=False).order_by('start_time'))
+
+    response = get_list(api_client, query_string='super_event_type=recurring')
+    data = response.data['data'][0]
+    assert sorted(sub_event['@id'] for sub_event in data['sub_events']) == sorted(
+        reverse('event-detail', kwargs={'pk': sub_event.pk}) for sub_event in sub_events)
+    assert all(set(sub_event) == {'@id'} for sub_event in data['sub_events'])
+
+    response = get_list(api_client, query_string='super_event_type=recurring&sub_events_summary=true')
+    data = response.data['data'][0]
+    summaries = sorted(data['sub_events'], key=lambda sub_event: sub_event['start_time'])
+    assert [summary['id'] for summary in summaries] == [sub_event.id for sub_event in sub_events]
+    assert set(summaries[0]) == {'@id', 'id', 'start_time', 'end_time'}
+    assert dateutil.parser.parse(summaries[0]['start_time']) == sub_events[0].start_time
+
+    # the detail view displays the same summary without the prefetch
+    response = get_detail(api_client, super_event.pk, data={'sub_events_summary': 'true'})
+    assert sorted(response.data['sub_events'], key=lambda sub_event: sub_event['start_time']) == summaries
+
+    response = get_list_no_code_assert(api_client, query_string='sub_events_summary=maybe')
+    assert response.status_code == 400
+
+
 @pytest.mark.django_db
 def test_event_list_show_deleted_param(api_client, event, event2, user):
     api_client.force_authenticate(user=user)
@@ -751,6 +946,42 @@ def test_event_list_is_free_filter(api_client, event, event2, event3, offer):
     assert {event.id, event3.id} == {e['id'] for e in response.data['data']}
 
 
+@pytest.mark.django_db
+def test_event_list_price_max_filter(api_client, event, event2, event3, offer):
+    Offer.objects.create(event=event, price_fi='Aikuiset 15 €, lapset 5 €', price_en='5-15 €', is_free=False)
+    Offer.objects.create(event=event3, price_fi='Liput myydään ovelta', is_free=False)
+    event.refresh_from_db()
+    event3.refresh_from_db()
+    assert (event.price_min, event.price_max) == (Decimal(5), Decimal(15))
+    assert (event3.price_min, event3.price_max) == (None, None)
+
+    response = get_list(api_client, query_string='price_max=4,50')
+    assert {event2.id} == {e['id'] for e in response.data['data']}
+
+    response = get_list(api_client, query_string='price_max=5')
+    assert {event.id, event2.id} == {e['id'] for e in response.data['data']}
+
+    response = get_list_no_code_assert(api_client, query_string='price_max=cheap')
+    assert response.status_code == 400
+
+    # the summary follows the offers, however they are changed
+    event.offers.all().delete()
+    response = get_list(api_client, query_string='price_max=5')
+    assert {event2.id} == {e['id'] for e in response.data['data']}
+
+
+@pytest.mark.django_db
+def test_bulk_offer_writes_update_the_summary_once(event):
+    with CaptureQueriesContext(connection) as queries:
+        with bulk_offer_writes(event):
+            event.offers.all().delete()
+            for price in ('5 €', '10 €', '15 €'):
+                Offer.objects.create(event=event, price_fi=price, is_free=False)
+    assert len([q for q in queries if q['sql'].startswith('UPDATE "events_event"')]) == 1
+    event.refresh_from_db()
+    assert (event.price_min, event.price_max) == (Decimal(5), Decimal(15))
+
+
 @pytest.mark.django_db
 def test_start_end_iso_date(api_client, make_event):
     parse_date = dateutil.parser.parse
@@ -965,6 +1196,40 @@ def test_start_end_events_without_endtime(api_client, make_event):
     assert_events_in_response(expected_events, response)
 
 
+@pytest.mark.django_db
+def test_start_end_follow_updated_times(api_client, make_event):
+    parse_date = dateutil.parser.parse
+    event1 = make_event('1', parse_date('2020-02-19 10:00:00+02'), parse_date('2020-02-19 12:00:00+02'))
+    event2 = make_event('2', parse_date('2020-02-19 11:00:00+02'), parse_date('2020-02-19 12:00:00+02'))
+
+    response = get_list(api_client, query_string='start=2020-02-20')
+    assert_events_in_response([], response)
+
+    # the occurrence of the event is updated when only the times are saved
+    event1.start_time = parse_date('2020-02-20 10:00:00+02')
+    event1.end_time = parse_date('2020-02-20 12:00:00+02')
+    event1.save(update_fields=['start_time', 'end_time'])
+    response = get_list(api_client, query_string='start=2020-02-20')
+    assert_events_in_response([event1], response)
+
+    # with start after end, the events overlapping both are returned
+    response = get_list(api_client, query_string='start=2020-02-20T11:00:00&end=2020-02-20T10:30:00')
+    assert_events_in_response([event1], response)
+
+    # postponed events are included if end is not given, whatever their times
+    event2.event_status = Event.Status.POSTPONED
+    event2.save(update_fields=['event_status'])
+    response = get_list(api_client, query_string='start=2020-02-20')
+    assert_events_in_response([event1, event2], response)
+    response = get_list(api_client, query_string='end=2020-02-18')
+    assert_events_in_response([], response)
+    # bounded windows match the times of postponed events like those of any other event
+    response = get_list(api_client, query_string='start=2020-02-20&end=2020-02-21')
+    assert_events_in_response([event1], response)
+    response = get_list(api_client, query_string='start=2020-02-19&end=2020-02-19')
+    assert_events_in_response([event2], response)
+
+
 @pytest.mark.django_db
 def test_keyword_and_text(api_client, event, event2, keyword):
     keyword.name_fi = 'lappset'
@@ -1044,3 +1309,132 @@ def test_custom_data_filter(api_client, event, event2):
     ids = {e['id'] for e in response.data['data']}
     assert event.id in ids
     assert event2.id in ids
+
+    response = get_list(api_client, query_string='custom_data=test:testvalue,test:testvalue2')
+    assert len(response.data['data']) == 0
+
+    response = get_list(api_client, query_string='custom_data_OR=test:testvalue,test3:testvalue3')
+    assert {event.id, event2.id} == {e['id'] for e in response.data['data']}
+
+    response = get_list(api_client, query_string='custom_data_has_key=test,test3')
+    assert {event2.id} == {e['id'] for e in response.data['data']}
+
+    response = get_list(api_client, query_string='custom_data_has_any_key=test3,test4')
+    assert {event2.id} == {e['id'] for e in response.data['data']}
+
+    response = get_list_no_code_assert(api_client, query_string='custom_data=test')
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_custom_data_ids(api_client, event, event2, event3):
+    event.custom_data = {'partner_id': '1', 'partner': 'a'}
+    event.save()
+    event2.custom_data = {'partner_id': '2', 'partner': 'a'}
+    event2.save()
+    event3.custom_data = {'partner_id': '1', 'partner': 'b'}
+    event3.save()
+    url = reverse('event-custom-data-ids')
+
+    data = get(api_client, url, data={'key': 'partner_id', 'value': '1,2,3'}).json()['data']
+    assert list(data) == ['1', '2', '3']
+    assert set(data['1']) == {event.id, event3.id}
+    assert data['2'] == [event2.id]
+    assert data['3'] == []
+
+    response = get(api_client, url, data={'key': 'partner_id', 'value': '1', 'custom_data': 'partner:b'})
+    assert response.json()['data'] == {'1': [event3.id]}
+
+    response = api_client.get(url, data={'key': 'partner_id'})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_get_event_list_compiles_serializer_fields_once(api_client, event, event2, keyword, keyword2, monkeypatch):
+    from events.api import LinkedEventsSerializer
+
+    compiled = []
+    compile_fields = LinkedEventsSerializer.compile_fields
+
+    def counting_compile_fields(self):
+        compiled.append(type(self).__name__)
+        return compile_fields(self)
+    monkeypatch.setattr(LinkedEventsSerializer, '_field_plans', {})
+    monkeypatch.setattr(LinkedEventsSerializer, 'compile_fields', counting_compile_fields)
+    event.keywords.set([keyword, keyword2])
+    event2.keywords.set([keyword])
+
+    response = get_list(api_client, query_string='include=location,keywords')
+    assert sorted(compiled) == sorted(set(compiled))
+    assert {'EventSerializer', 'PlaceSerializer', 'KeywordSerializer'} <= set(compiled)
+    data = {entry['id']: entry for entry in response.data['data']}
+    assert {kw['id'] for kw in data[event.id]['keywords']} == {keyword.id, keyword2.id}
+    assert data[event.id]['keywords'][0]['@context'] == 'http://schema.org'
+    assert data[event2.id]['location']['id'] == event2.location.id
+
+    compiled_once = list(compiled)
+    second_response = get_list(api_client, query_string='include=location,keywords')
+    assert compiled == compiled_once
+    assert second_response.data == response.data
+
+
+def _entry_fields(entry):
+    return set(entry) - {'@id', '@type', '@context'}
+
+
+@pytest.mark.django_db
+def test_get_event_list_sparse_fieldset(api_client, event, event2, keyword):
+    event.keywords.set([keyword])
+
+    response = get_list(api_client, data={'fields': 'name,start_time,keywords'})
+    data = {entry['id']: entry for entry in response.data['data']}
+    assert all(_entry_fields(entry) == {'id', 'name', 'start_time', 'keywords'} for entry in data.values())
+    assert data[event.id]['name']['fi'] == event.name_fi
+    assert data[event.id]['keywords'] == [{'@id': reverse('keyword-detail', kwargs={'pk': keyword.id})}]
+
+    response = get_list(api_client, data={'omit': 'description,keywords,offers,id'})
+    for entry in response.data['data']:
+        fields = _entry_fields(entry)
+        assert {'id', 'name', 'location', 'sub_events'} <= fields
+        assert not {'description', 'keywords', 'offers'} & fields
+
+    # nested objects are displayed in full
+    response = get_list(api_client, data={'fields': 'location', 'include': 'location'})
+    assert all('name' in entry['location'] for entry in response.data['data'])
+
+
+@pytest.mark.django_db
+def test_get_event_list_sparse_fieldset_reads_only_needed_columns(api_client, event, event2):
+    with CaptureQueriesContext(connection) as full:
+        get_list(api_client)
+    with CaptureQueriesContext(connection) as sparse:
+        get_list(api_client, data={'fields': 'name,start_time'})
+    assert len(sparse.captured_queries) < len(full.captured_queries)
+    event_queries = [query['sql'] for query in sparse.captured_queries
+                     if 'FROM "events_event"' in query['sql'] and '"events_event"."name_fi"' in query['sql']]
+    assert event_queries
+    assert all('"events_event"."description_fi"' not in sql for sql in event_queries)
+    assert all('"events_event"."location_id"' not in sql for sql in event_queries)
+
+
+@pytest.mark.django_db
+def test_get_event_list_output_language(api_client, event, event2):
+    event.name_sv = 'Evenemang'
+    event.name_en = 'Event'
+    event.save()
+
+    with CaptureQueriesContext(connection) as queries:
+        response = get_list(api_client, data={'output_language': 'fi,sv'})
+    data = {entry['id']: entry for entry in response.data['data']}
+    assert data[event.id]['name'] == {'fi': event.name_fi, 'sv': 'Evenemang'}
+    assert all(set(entry['name'] or {}) <= {'fi', 'sv'} for entry in data.values())
+    event_queries = [query['sql'] for query in queries.captured_queries
+                     if 'FROM "events_event"' in query['sql'] and '"events_event"."name_fi"' in query['sql']]
+    assert event_queries
+    assert all('"events_event"."name_en"' not in sql for sql in event_queries)
+
+    response = get_list(api_client, data={'output_language': 'en', 'fields': 'name'})
+    assert {entry['id']: entry['name'] for entry in response.data['data']}[event.id] == {'en': 'Event'}
+
+    response = get_list_no_code_assert(api_client, data={'output_language': 'xx'})
+    assert response.status_code == 400
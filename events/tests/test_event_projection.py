@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from events.models import Event
+
+from .test_event_get import get_list, get_list_no_code_assert
+
+
+def _data(response):
+    # the paging links contain the projection parameter, the events themselves must be identical
+    return json.dumps(response.json()['data'])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('version', ['v1', 'v0.1'])
+@pytest.mark.parametrize('query_string', [
+    '',
+    'sub_events_summary=true',
+    'sort=start_time',
+    'sort=duration',
+    'page_size=2&page=2',
+    'cursor=&page_size=3&sort=-start_time',
+    'text=tapahtuma',
+    'keyword_OR={keyword}',
+    'show_deleted=true',
+    'fields=name,start_time,end_time,keywords,sub_events',
+    'omit=offers,images,description&sub_events_summary=true',
+])
+def test_event_list_values_projection_is_identical(api_client, event_dataset, keyword, version, query_string):
+    query_string = query_string.format(keyword=keyword.id)
+    response = get_list(api_client, version=version, query_string=query_string)
+    assert response.json()['data']
+    projected_query_string = '&'.join(param for param in (query_string, 'projection=values') if param)
+    projected_response = get_list(api_client, version=version, query_string=projected_query_string)
+    assert _data(projected_response) == _data(response)
+    assert projected_response.json()['meta']['count'] == response.json()['meta']['count']
+
+
+@pytest.mark.django_db
+def test_event_list_values_projection_does_not_create_events(api_client, event_dataset, monkeypatch):
+    created = []
+    from_db = Event.from_db.__func__
+
+    def counting_from_db(cls, *args, **kwargs):
+        created.append(cls)
+        return from_db(cls, *args, **kwargs)
+    monkeypatch.setattr(Event, 'from_db', classmethod(counting_from_db))
+
+    response = get_list(api_client, query_string='projection=values')
+    assert len(response.json()['data']) == event_dataset.filter(deleted=False).count()
+    assert not created
+
+    get_list(api_client)
+    assert created
+
+
+@pytest.mark.django_db
+def test_event_list_values_projection_is_not_used_with_includes(api_client, event_dataset, user):
+    response = get_list(api_client, query_string='projection=values&include=location')
+    assert all(isinstance(entry['location'], dict) and 'name' in entry['location']
+               for entry in response.json()['data'])
+
+    api_client.force_authenticate(user=user)
+    response = get_list(api_client, query_string='projection=values')
+    assert response.json()['data']
+
+
+@pytest.mark.django_db
+def test_event_list_invalid_projection(api_client, event):
+    response = get_list_no_code_assert(api_client, query_string='projection=dicts')
+    assert response.status_code == 400
@@ -235,6 +235,21 @@ def test__update_an_event_with_put(api_client, complex_event_dict, user):
     assert_event_data_is_equal(data2, response2.data)
 
 
+@pytest.mark.django_db
+def test__update_an_event_offers_updates_prices(api_client, minimal_event_dict, user):
+    api_client.force_authenticate(user=user)
+    minimal_event_dict['offers'] = [{'is_free': False, 'price': {'fi': '10-20 €'}}]
+    response = create_with_post(api_client, minimal_event_dict)
+    event = Event.objects.get(id=response.data['id'])
+    assert (event.has_free_offer, event.price_min, event.price_max) == (False, 10, 20)
+
+    data2 = response.data
+    data2['offers'] = [{'is_free': True}, {'is_free': False, 'price': {'fi': 'Liput ovelta'}}]
+    update_with_put(api_client, data2.pop('@id'), data2)
+    event.refresh_from_db()
+    assert (event.has_free_offer, event.price_min, event.price_max) == (True, 0, 0)
+
+
 @pytest.mark.django_db
 def test__update_an_event_with_naive_datetime(api_client, minimal_event_dict, user):
 
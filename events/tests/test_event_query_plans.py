@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+import pytest
+from django.http import QueryDict
+from django.utils import timezone
+
+from events.api import _filter_event_queryset, filter_division
+from events.models import Event, Language, Offer
+from events.sql import explain
+
+EVENT_COUNT = 30
+
+
+def _deduplicating_nodes(node):
+    if node['Node Type'] in ('Unique', 'Aggregate', 'SetOp'):
+        yield node
+    for child in node.get('Plans', ()):
+        yield from _deduplicating_nodes(child)
+
+
+def _relations(node):
+    relations = {node['Relation Name']} if 'Relation Name' in node else set()
+    for child in node.get('Plans', ()):
+        relations |= _relations(child)
+    return relations
+
+
+def assert_events_not_deduplicated(queryset):
+    """
+    Check that the events are not made distinct, which the join filters needed with wide event rows.
+
+    The subqueries of semi-joins may still be deduplicated, as long as they do not contain the events.
+    """
+    sql, params = queryset.query.sql_with_params()
+    assert 'DISTINCT' not in sql
+    plan = explain(queryset)
+    for node in _deduplicating_nodes(plan):
+        assert 'events_event' not in _relations(node)
+
+
+@pytest.fixture
+def plan_events(make_event, place, administrative_division, keyword, keyword2, keyword3):
+    place.divisions.set([administrative_division])
+    languages = [Language.objects.get_or_create(id=lang)[0] for lang in ('fi', 'sv')]
+    start_time = timezone.now() + timedelta(days=1)
+    for i in range(EVENT_COUNT):
+        event = make_event('plan-%d' % i, start_time, start_time + timedelta(hours=1))
+        # every event matches the filters below through several rows, which joins would duplicate
+        event.keywords.set([keyword, keyword2])
+        event.audience.set([keyword, keyword3])
+        event.in_language.set(languages)
+        Offer.objects.create(event=event, is_free=True)
+        Offer.objects.create(event=event, is_free=True)
+    return Event.objects.filter(id__contains=':plan-')
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query_string', [
+    'keyword={keyword},{keyword2},{keyword3}',
+    'keyword_OR={keyword},{keyword2}',
+    'keyword_AND={keyword},{keyword3}',
+    'language=fi,sv',
+    'in_language=fi,sv',
+    'is_free=true',
+    'publisher={publisher}',
+])
+def test_event_filters_use_semi_joins(plan_events, keyword, keyword2, keyword3, organization, query_string):
+    params = QueryDict(query_string.format(keyword=keyword.id, keyword2=keyword2.id, keyword3=keyword3.id,
+                                           publisher=organization.id))
+    queryset = _filter_event_queryset(plan_events.order_by('-last_modified_time'), params)
+    assert_events_not_deduplicated(queryset)
+    ids = list(queryset.values_list('id', flat=True))
+    assert len(ids) == len(set(ids)) == EVENT_COUNT
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query_string', [
+    'keyword!={keyword2}',
+    'is_free=false',
+])
+def test_event_negative_filters_use_semi_joins(plan_events, keyword2, query_string):
+    params = QueryDict(query_string.format(keyword2=keyword2.id))
+    queryset = _filter_event_queryset(plan_events.order_by('-last_modified_time'), params)
+    assert_events_not_deduplicated(queryset)
+    assert not queryset.exists()
+
+
+@pytest.mark.django_db
+def test_event_division_filter_uses_semi_join(plan_events, administrative_division):
+    queryset = filter_division(plan_events.order_by('-last_modified_time'), 'location__divisions',
+                               [administrative_division.ocd_id, 'Test Division'])
+    assert_events_not_deduplicated(queryset)
+    ids = list(queryset.values_list('id', flat=True))
+    assert len(ids) == len(set(ids)) == EVENT_COUNT
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 import pytest
+from django.db import connection
 
+from events.api import KeywordListViewSet
 from events.models import Keyword
+from events.sql import get_similar_keywords
 
 from .utils import get
 from .utils import versioned_reverse as reverse
@@ -120,7 +123,7 @@ def test_get_keyword_with_upcoming_events(api_client, keyword, keyword2, event,
 
 
 @pytest.mark.django_db
-def test_get_keyword_free_search(api_client, keyword, keyword2, keyword3):
+def test_get_keyword_free_search(api_client, monkeypatch, keyword, keyword2, keyword3):
     keyword.name_fi = 'cheese'
     keyword2.name_en = 'blue cheese'
     keyword3.name_sv = 'chess'
@@ -131,3 +134,52 @@ def test_get_keyword_free_search(api_client, keyword, keyword2, keyword3):
     response = get_list(api_client, data={'free_text': 'cheeese'})
     ids = [entry['id'] for entry in response.data['data']]
     assert ids == [keyword.id, keyword2.id, keyword3.id]
+
+    # only the most similar keywords are returned
+    monkeypatch.setattr(KeywordListViewSet, 'free_text_max_results', 2)
+    response = get_list(api_client, data={'free_text': 'cheeese'})
+    ids = [entry['id'] for entry in response.data['data']]
+    assert ids == [keyword.id, keyword2.id]
+
+
+@pytest.mark.django_db
+def test_get_similar_keywords(keyword, keyword2, keyword3):
+    keyword.name_fi = 'cheese'
+    keyword2.name_en = 'blue cheese'
+    keyword3.name_sv = 'chess'
+    keyword.save()
+    keyword2.save()
+    keyword3.save()
+
+    similar = get_similar_keywords(['cheeese', 'chess', 'zzzz'], limit=3)
+    assert similar['cheeese'] == [keyword.id, keyword2.id, keyword3.id]
+    assert similar['chess'][0] == keyword3.id
+    assert similar['zzzz'] == []
+    assert len(get_similar_keywords(['cheeese'], limit=1)['cheeese']) == 1
+
+    # english names are not compared to terms with accented letters
+    similar = get_similar_keywords(['blue chéése'])
+    assert keyword2.id not in similar['blue chéése']
+
+
+@pytest.mark.django_db(transaction=True)  # the threshold is reset when the transaction of the search ends
+def test_keyword_free_search_does_not_change_session_threshold(api_client, keyword):
+    with connection.cursor() as cursor:
+        cursor.execute('SHOW pg_trgm.similarity_threshold;')
+        threshold = cursor.fetchone()[0]
+    get_list(api_client, data={'free_text': 'cheese'})
+    get_similar_keywords(['cheese'])
+    with connection.cursor() as cursor:
+        cursor.execute('SHOW pg_trgm.similarity_threshold;')
+        assert cursor.fetchone()[0] == threshold
+
+
+@pytest.mark.django_db
+def test_get_keyword_list_sparse_fieldset(api_client, keyword, keyword2):
+    response = get_list(api_client, data={'show_all_keywords': 1, 'fields': 'name'})
+    data = {entry['id']: entry for entry in response.data['data']}
+    assert set(data) == {keyword.id, keyword2.id}
+    for entry in data.values():
+        assert set(entry) - {'@id', '@type', '@context'} == {'id', 'name'}
+    full_data = {entry['id']: entry for entry in get_list(api_client, data={'show_all_keywords': 1}).data['data']}
+    assert data[keyword.id]['name'] == full_data[keyword.id]['name']
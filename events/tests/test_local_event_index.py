@@ -0,0 +1,54 @@
+import pytest
+
+from events import local_event_index
+
+from .test_event_get import get_list
+
+
+@pytest.fixture
+def index_cache(locmem_caches):
+    return local_event_index.get_cache()
+
+
+def test_search_matches_word_beginnings_of_all_words_of_a_term(index_cache):
+    assert local_event_index.search(['konsertti']) is None
+
+    local_event_index.build_index({
+        'event-1': {'<p>Lasten konsertti</p>', 'Puistolava'},
+        'event-2': {'Konsertti aikuisille', None},
+        'event-3': {'Teatteria lapsille'},
+    })
+    assert local_event_index.search(['konsert']) == {'event-1', 'event-2'}
+    assert local_event_index.search(['konsertti puisto']) == {'event-1'}
+    assert local_event_index.search(['konsertti puisto', 'lapsi']) == {'event-1', 'event-3'}
+    assert local_event_index.search(['sertti']) == set()
+    assert local_event_index.search(['p']) == {'event-1'}
+    assert local_event_index.search(['', '!']) == set()
+
+
+def test_shards_are_split_into_chunks(index_cache, monkeypatch):
+    monkeypatch.setattr(local_event_index, 'MAX_CHUNK_SIZE', 100)
+    event_texts = {'event-%d' % i: {'kala%d kalastus' % i} for i in range(50)}
+    local_event_index.build_index(event_texts)
+    manifest = index_cache.get(local_event_index.CURRENT_KEY)['shards']
+    assert manifest['ka'] > 1
+    assert local_event_index.search(['kalastus']) == set(event_texts)
+    assert local_event_index.search(['kala7']) == {'event-7'}
+
+
+def test_rebuild_replaces_index(index_cache):
+    local_event_index.build_index({'event-1': {'konsertti'}})
+    local_event_index.build_index({'event-2': {'konsertti'}})
+    assert local_event_index.search(['konsertti']) == {'event-2'}
+
+
+@pytest.mark.django_db
+def test_combined_local_ongoing_filter(api_client, index_cache, event, event2):
+    response = get_list(api_client, data={'combined_local_ongoing': 'konsertti'})
+    assert not response.data['data']
+
+    local_event_index.build_index({event.id: {'Konsertti'}, event2.id: {'Teatteri'}})
+    response = get_list(api_client, data={'combined_local_ongoing': 'konsertti'})
+    assert [entry['id'] for entry in response.data['data']] == [event.id]
+    response = get_list(api_client, data={'combined_local_ongoing': 'konsertti,teatteri'})
+    assert {entry['id'] for entry in response.data['data']} == {event.id, event2.id}
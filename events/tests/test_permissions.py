@@ -1,10 +1,11 @@
 from unittest.mock import MagicMock
 
+import pytest
 from django.test import TestCase
 from django_orghierarchy.models import Organization
 
 from ..models import DataSource, Event, PublicationStatus
-from ..permissions import UserModelPermissionMixin
+from ..permissions import UserModelPermissionMixin, get_permission_context
 from helevents.models import User
 
 
@@ -133,3 +134,61 @@ class TestUserModelPermissions(TestCase):
         self.instance.organization_memberships.remove(self.org)
         qs = self.instance.get_editable_events(total_qs)
         self.assertQuerysetEqual(qs, [])
+
+    def test_admin_tree_ranges(self):
+        org3 = Organization.objects.create(
+            name='org3',
+            origin_id='org3',
+            data_source=self.data_source,
+        )
+        replaced_org = Organization.objects.create(
+            name='replaced-org',
+            origin_id='replaced-org',
+            data_source=self.data_source,
+            replaced_by=org3,
+        )
+        self.instance.admin_organizations.add(self.org, self.org2, replaced_org)
+
+        # the nested admin organization is covered by its parent, and the replacing organization is included
+        with self.assertNumQueries(3):
+            context = self.instance.get_permission_context()
+        self.assertEqual(len(context.admin_tree_ranges), 3)
+        self.assertEqual(context.admin_tree_ids, {self.org.tree_id, replaced_org.tree_id, org3.tree_id})
+        with self.assertNumQueries(0):
+            self.assertTrue(self.instance.is_admin(self.org2))
+            self.assertTrue(self.instance.is_admin(org3))
+            self.assertTrue(self.instance.can_edit_event(self.org, PublicationStatus.PUBLIC))
+            self.assertFalse(self.instance.is_regular_user(self.org))
+        self.assertQuerysetEqual(self.instance.get_admin_organizations_and_descendants(),
+                                 [repr(self.org), repr(self.org2), repr(org3), repr(replaced_org)],
+                                 ordered=False)
+
+        # changing the admin organizations clears the cached ranges
+        self.instance.admin_organizations.remove(self.org, replaced_org)
+        self.assertTrue(self.instance.is_admin(self.org2))
+        self.assertFalse(self.instance.is_admin(self.org))
+        self.assertFalse(self.instance.is_admin(org3))
+
+
+@pytest.fixture
+def permission_cache_settings(locmem_caches):
+    locmem_caches.PERMISSION_CONTEXT_CACHE_TIMEOUT = 60
+    return locmem_caches
+
+
+@pytest.mark.django_db(transaction=True)  # transaction is needed for the invalidation on commit
+def test_permission_context_is_cached_across_requests(permission_cache_settings, django_assert_num_queries,
+                                                      user, organization, organization2):
+    context = get_permission_context(user)
+    assert context.admin_organization_ids == {organization.id}
+    assert not context.member_organization_ids
+    with django_assert_num_queries(0):
+        assert get_permission_context(user) == context
+
+    organization2.regular_users.add(user)
+    context = get_permission_context(user)
+    assert context.member_organization_ids == {organization2.id}
+
+    organization2.parent = organization
+    organization2.save()
+    assert get_permission_context(user).is_admin(Organization.objects.get(id=organization2.id))
@@ -165,3 +165,29 @@ def test_get_place_with_upcoming_events(api_client, place, place2, event, past_e
     ids = [entry['id'] for entry in response.data['data']]
     assert place.id in ids
     assert place2.id in ids
+
+
+@pytest.mark.django_db
+def test_get_place_list_sparse_fieldset(api_client, place, place2):
+    response = get_list(api_client, data={'show_all_places': 1, 'fields': 'name,street_address'})
+    assert response.data['data']
+    for entry in response.data['data']:
+        assert set(entry) - {'@id', '@type', '@context'} == {'id', 'name', 'street_address'}
+
+    response = get_list(api_client, data={'show_all_places': 1, 'omit': 'position,divisions'})
+    for entry in response.data['data']:
+        assert 'name' in entry
+        assert 'position' not in entry
+        assert 'divisions' not in entry
+
+
+@pytest.mark.django_db
+def test_get_place_list_output_language(api_client, place):
+    place.name_sv = 'Plats 1'
+    place.save()
+    response = get_list(api_client, data={'show_all_places': 1, 'output_language': 'sv'})
+    data = {entry['id']: entry for entry in response.data['data']}
+    assert data[place.id]['name'] == {'sv': 'Plats 1'}
+
+    response = get_detail(api_client, place.pk, data={'output_language': 'fi'})
+    assert response.data['name'] == {'fi': 'Paikka 1'}
@@ -0,0 +1,109 @@
+import pytest
+from django.core.management import call_command
+
+from events import response_cache
+
+from .utils import versioned_reverse as reverse
+
+
+@pytest.mark.django_db(transaction=True)  # transaction is needed for the invalidation on commit
+def test_event_list_is_cached_and_invalidated_on_save(api_client, cache_settings, event):
+    url = reverse('event-list')
+    response = api_client.get(url)
+    assert response.status_code == 200
+    assert response['X-Cache'] == 'MISS'
+    etag = response['ETag']
+
+    response = api_client.get(url)
+    assert response.status_code == 200
+    assert response['X-Cache'] == 'HIT'
+    assert response.json()['data'][0]['id'] == event.id
+    # the validators are cached with the response
+    assert response['ETag'] == etag
+
+    # query parameters are normalized
+    response = api_client.get(url + '?page_size=5&sort=-last_modified_time')
+    assert response['X-Cache'] == 'MISS'
+    response = api_client.get(url + '?sort=-last_modified_time&page_size=5')
+    assert response['X-Cache'] == 'HIT'
+
+    event.name_fi = 'muutettu'
+    event.save()
+    response = api_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['data'][0]['name']['fi'] == 'muutettu'
+
+    assert response_cache.get_statistics() == {'hits': 2, 'misses': 3}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_event_detail_is_invalidated_only_by_its_event(api_client, cache_settings, event, event2):
+    url = reverse('event-detail', kwargs={'pk': event.id})
+    assert api_client.get(url)['X-Cache'] == 'MISS'
+    assert api_client.get(url)['X-Cache'] == 'HIT'
+
+    event2.save()
+    assert api_client.get(url)['X-Cache'] == 'HIT'
+
+    event.save()
+    assert api_client.get(url)['X-Cache'] == 'MISS'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_responses_are_cached_per_scheme(api_client, cache_settings, event):
+    url = reverse('event-list')
+    assert api_client.get(url)['X-Cache'] == 'MISS'
+    response = api_client.get(url, secure=True)
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['data'][0]['@id'].startswith('https://')
+    assert api_client.get(url, secure=True)['X-Cache'] == 'HIT'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_super_event_detail_is_invalidated_when_sub_event_leaves(api_client, cache_settings, event, event2):
+    event2.super_event = event
+    event2.save()
+    url = reverse('event-detail', kwargs={'pk': event.id})
+    assert api_client.get(url)['X-Cache'] == 'MISS'
+    assert api_client.get(url)['X-Cache'] == 'HIT'
+
+    event2.super_event = None
+    event2.save()
+    response = api_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['sub_events'] == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_place_and_keyword_lists_are_cached(api_client, cache_settings, place, keyword):
+    for view_name, obj in (('place-list', place), ('keyword-list', keyword)):
+        url = reverse(view_name) + '?show_all_places=1&show_all_keywords=1'
+        assert api_client.get(url)['X-Cache'] == 'MISS'
+        assert api_client.get(url)['X-Cache'] == 'HIT'
+        obj.save()
+        assert api_client.get(url)['X-Cache'] == 'MISS'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_authenticated_requests_are_not_cached(api_client, cache_settings, event, user):
+    api_client.force_authenticate(user=user)
+    url = reverse('event-list')
+    assert api_client.get(url).status_code == 200
+    assert 'X-Cache' not in api_client.get(url)
+    assert response_cache.get_statistics() == {'hits': 0, 'misses': 0}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_streamed_requests_bypass_cache(api_client, cache_settings, event):
+    url = reverse('event-list') + '?stream=true'
+    for i in range(2):
+        response = api_client.get(url)
+        assert response.streaming
+        assert 'X-Cache' not in response
+    assert response_cache.get_statistics() == {'hits': 0, 'misses': 0}
+
+
+@pytest.mark.django_db
+def test_response_cache_stats_command(cache_settings, capsys):
+    call_command('response_cache_stats', '--reset')
+    assert 'hits: 0, misses: 0' in capsys.readouterr().out
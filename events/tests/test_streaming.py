@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from events.models import Image
+
+from .test_event_get import get_list, get_list_no_code_assert
+from .utils import get
+from .utils import versioned_reverse as reverse
+
+
+def _streamed_json(response):
+    assert response.status_code == 200
+    assert response.streaming
+    return json.loads(b''.join(response.streaming_content).decode('utf-8'))
+
+
+@pytest.fixture
+def small_chunks(settings):
+    settings.STREAM_CHUNK_SIZE = 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query_string', [
+    '',
+    'page_size=3&page=2',
+    'cursor=&page_size=3&sort=-start_time',
+    'include=location,keywords',
+    'sub_events_summary=true',
+    'projection=values',
+    'fields=name,keywords&output_language=fi',
+])
+def test_event_list_stream_is_identical(api_client, event_dataset, small_chunks, query_string):
+    response = get_list(api_client, query_string=query_string)
+    streamed_query_string = '&'.join(param for param in (query_string, 'stream=true') if param)
+    streamed = _streamed_json(get_list_no_code_assert(api_client, query_string=streamed_query_string))
+    assert streamed['data'] == response.json()['data']
+    assert streamed['data']
+    assert streamed['meta']['count'] == response.json()['meta']['count']
+    assert bool(streamed['meta']['next']) == bool(response.json()['meta']['next'])
+
+
+@pytest.mark.django_db
+def test_image_list_stream(api_client, organization, small_chunks):
+    for i in range(5):
+        Image.objects.create(name='kuva %d' % i, url='http://example.com/kuva%d.png' % i, publisher=organization)
+    url = reverse('image-list')
+    response = get(api_client, url)
+    streamed = _streamed_json(api_client.get(url, data={'stream': 'true'}))
+    assert streamed == response.json()
+
+
+@pytest.mark.django_db
+def test_event_list_stream_invalid_value(api_client, event):
+    response = get_list_no_code_assert(api_client, query_string='stream=yes')
+    assert response.status_code == 400
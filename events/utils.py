@@ -8,7 +8,8 @@ from django.conf import settings
 from dateutil.parser import parse as dateutil_parse
 from rest_framework.exceptions import ParseError
 
-from events.models import Keyword, Place
+from events import response_cache
+from events.models import Change, Keyword, Place
 from events.sql import count_events_for_keywords, count_events_for_places
 
 
@@ -62,13 +63,20 @@ def recache_n_events(keyword_ids, all=False):
     # needed so we don't empty the blasted iterator mid-operation
     keyword_ids = tuple(set(keyword_ids))
     with transaction.atomic():
+        keywords = Keyword.objects.all() if all else Keyword.objects.filter(id__in=keyword_ids)
+        # needed to record the changes of the keywords whose count actually changes
+        old_counts = dict(keywords.values_list('id', 'n_events'))
         if all:
             Keyword.objects.update(n_events=0)
         else:
             # set the flag to false here, so zero-event keywords will get it too
             Keyword.objects.filter(id__in=keyword_ids).update(n_events=0, n_events_changed=False)
-        for keyword_id, n_events in count_events_for_keywords(keyword_ids, all=all).items():
+        counts = count_events_for_keywords(keyword_ids, all=all)
+        for keyword_id, n_events in counts.items():
             Keyword.objects.filter(id=keyword_id).update(n_events=n_events)
+        Change.objects.record('keyword', [keyword_id for keyword_id, n_events in old_counts.items()
+                                          if counts.get(keyword_id, 0) != n_events])
+    response_cache.bump_generation('keyword')
 
 
 def recache_n_events_in_locations(place_ids, all=False):
@@ -82,13 +90,23 @@ def recache_n_events_in_locations(place_ids, all=False):
     # needed so we don't empty the blasted iterator mid-operation
     place_ids = tuple(set(place_ids))
     with transaction.atomic():
+        places = Place.objects.all() if all else Place.objects.filter(id__in=place_ids)
+        # needed to record the changes of the places whose count actually changes
+        old_counts = {place_id: (n_events, deleted)
+                      for place_id, n_events, deleted in places.values_list('id', 'n_events', 'deleted')}
         if all:
             Place.objects.update(n_events=0)
         else:
             # set the flag to false here, so zero-event places will get it too
             Place.objects.filter(id__in=place_ids).update(n_events=0, n_events_changed=False)
-        for place_id, n_events in count_events_for_places(place_ids, all=all).items():
+        counts = count_events_for_places(place_ids, all=all)
+        for place_id, n_events in counts.items():
             Place.objects.filter(id=place_id).update(n_events=n_events)
+        changed = [(place_id, deleted) for place_id, (n_events, deleted) in old_counts.items()
+                   if counts.get(place_id, 0) != n_events]
+        Change.objects.record('place', [place_id for place_id, deleted in changed if not deleted])
+        Change.objects.record('place', [place_id for place_id, deleted in changed if deleted], Change.DELETED)
+    response_cache.bump_generation('place')
 
 
 def parse_time(time_str, is_start):
@@ -22,7 +22,7 @@ class User(AbstractUser, UserModelPermissionMixin):
         return admin_org or regular_org
 
     def is_admin(self, publisher):
-        return publisher in self.get_admin_organizations_and_descendants()
+        return self.is_admin_of_tree(publisher)
 
     def is_regular_user(self, publisher):
-        return self.organization_memberships.filter(id=publisher.id).exists()
+        return self.get_permission_context().is_member(publisher)
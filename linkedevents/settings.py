@@ -66,7 +66,15 @@ env = environ.Env(
     MAIL_MAILGUN_KEY=(str, ''),
     MAIL_MAILGUN_DOMAIN=(str, ''),
     MAIL_MAILGUN_API=(str, ''),
-    LIPPUPISTE_EVENT_API_URL=(str, None)
+    LIPPUPISTE_EVENT_API_URL=(str, None),
+    PAGINATION_DEFAULT_COUNT=(str, 'exact'),
+    PAGINATION_COUNT_ESTIMATE_THRESHOLD=(int, 10000),
+    RESPONSE_CACHE_ENABLED=(bool, True),
+    RESPONSE_CACHE_TIMEOUT=(int, 60),
+    KEYWORD_REPLACEMENT_CACHE_TIMEOUT=(int, 300),
+    PERMISSION_CONTEXT_CACHE_TIMEOUT=(int, 0),
+    STREAM_CHUNK_SIZE=(int, 100),
+    CHANGE_RETENTION_DAYS=(int, 30),
 )
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -438,6 +446,31 @@ AUTO_ENABLED_EXTENSIONS = env('AUTO_ENABLED_EXTENSIONS')
 # shown in the browsable API
 INSTANCE_NAME = env('INSTANCE_NAME')
 
+# how list pages count their results by default, one of exact, estimate or none.
+# clients may override this with the count query parameter
+PAGINATION_DEFAULT_COUNT = env('PAGINATION_DEFAULT_COUNT')
+# with count=estimate, results are counted exactly up to this number
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = env('PAGINATION_COUNT_ESTIMATE_THRESHOLD')
+
+# anonymous event, place and keyword reads are cached in the default cache, and invalidated when
+# the models are saved. The timeout bounds the staleness caused by updates bypassing save()
+RESPONSE_CACHE_ENABLED = env('RESPONSE_CACHE_ENABLED')
+RESPONSE_CACHE_TIMEOUT = env('RESPONSE_CACHE_TIMEOUT')
+
+# keyword replacements are memoized in each process for the keyword filters. Saving a keyword clears
+# the memo of the saving process only, so the timeout bounds the staleness in the other processes
+KEYWORD_REPLACEMENT_CACHE_TIMEOUT = env('KEYWORD_REPLACEMENT_CACHE_TIMEOUT')
+
+# the organizations of users are resolved for permission checks once per request. If the timeout is
+# set, they are also cached in the default cache, and invalidated when organizations or their users change
+PERMISSION_CONTEXT_CACHE_TIMEOUT = env('PERMISSION_CONTEXT_CACHE_TIMEOUT')
+
+# streamed lists (stream=true) fetch, serialize and encode this many objects at a time
+STREAM_CHUNK_SIZE = env('STREAM_CHUNK_SIZE')
+
+# the change feed keeps the changes of this many days, when pruned with the prune_changes command
+CHANGE_RETENTION_DAYS = env('CHANGE_RETENTION_DAYS')
+
 # local_settings.py can be used to override environment-specific settings
 # like database and email that differ between development and production.
 f = os.path.join(BASE_DIR, "local_settings.py")
@@ -492,12 +525,10 @@ CACHES = {
         'LOCATION': '127.0.0.1:11211',
         'TIMEOUT': 300,
     },
+    # the local event index is stored in chunks below the default item size limit of memcached
     'ongoing_local': {
         'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
         'LOCATION': '127.0.0.1:11211',
         'TIMEOUT': None,
-        'OPTIONS': {
-            'server_max_value_length': 1024 * 1024 * 500,
-        }
     }
 }
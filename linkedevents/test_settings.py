@@ -15,3 +15,6 @@ def dummy_haystack_connection_without_warnings_for_lang(language_code):
 for language in [l[0] for l in LANGUAGES]:
     connection = dummy_haystack_connection_without_warnings_for_lang(language)
     HAYSTACK_CONNECTIONS.update(connection)
+
+# responses are cached only in tests that enable the cache explicitly
+RESPONSE_CACHE_ENABLED = False